@@ -0,0 +1,126 @@
+import os
+import glob
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+
+def collect_batch_inputs(batch_source):
+    if os.path.isdir(batch_source):
+        paths = []
+        for root, _, files in os.walk(batch_source):
+            for name in sorted(files):
+                paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    if glob.has_magic(batch_source):
+        return sorted(p for p in glob.glob(batch_source, recursive=True) if os.path.isfile(p))
+
+    if os.path.isfile(batch_source):
+        manifest_dir = os.path.dirname(os.path.abspath(batch_source))
+        paths = []
+        with open(batch_source, 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = line.strip()
+                if not entry or entry.startswith("#"):
+                    continue
+                if not os.path.isabs(entry):
+                    entry = os.path.join(manifest_dir, entry)
+                paths.append(entry)
+        return paths
+
+    print(f"BatchRunner: Batch source '{batch_source}' is not a directory, glob pattern or manifest file.")
+    return []
+
+
+class BatchRunner:
+    def __init__(self, classifier_factory, max_workers=8, pdf_processes=None, llm_batch_size=1):
+        self.classifier_factory = classifier_factory
+        self.max_workers = max(1, max_workers)
+        self.pdf_processes = pdf_processes
+        self.llm_batch_size = max(1, llm_batch_size)
+        self._classifier = None
+        self._classifier_lock = threading.Lock()
+        self._pdf_executor = None
+
+    def _get_classifier(self):
+        # One ClassifierAgent is shared by every worker thread of a run; it keeps per-document state
+        # in the document it passes between stages, not on the instance.
+        with self._classifier_lock:
+            if self._classifier is None:
+                self._classifier = self.classifier_factory(pdf_executor=self._pdf_executor)
+            return self._classifier
+
+    def _process_chunk(self, input_paths):
+        started = time.perf_counter()
+        try:
+            classifier = self._get_classifier()
+            if len(input_paths) == 1:
+                chunk_results = [classifier.process_input(input_paths[0], input_is_path=True)]
+            else:
+                chunk_results = classifier.process_inputs([(input_path, True) for input_path in input_paths])
+        except Exception as e:
+            print(f"BatchRunner: Unexpected error processing {input_paths}: {e}")
+            chunk_results = [
+                {"status": "Failed_BatchWorkerError", "message": str(e), "format": None, "intent": None, "conversation_id": None}
+                for _ in input_paths
+            ]
+        elapsed = time.perf_counter() - started
+        for input_path, result in zip(input_paths, chunk_results):
+            result["input"] = input_path
+            result["elapsed_seconds"] = elapsed
+        return chunk_results
+
+    def run(self, input_paths, on_result=None):
+        input_paths = list(input_paths)
+        results = []
+        started = time.perf_counter()
+
+        if self.pdf_processes != 0:
+            self._pdf_executor = ProcessPoolExecutor(max_workers=self.pdf_processes)
+        try:
+            # Bounded submission: at most 2x workers chunks are in flight at once,
+            # so a huge manifest never turns into a huge backlog of pending futures.
+            max_in_flight = self.max_workers * 2
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch-worker") as pool:
+                pending = set()
+                for chunk_start in range(0, len(input_paths), self.llm_batch_size):
+                    chunk = input_paths[chunk_start:chunk_start + self.llm_batch_size]
+                    pending.add(pool.submit(self._process_chunk, chunk))
+                    if len(pending) >= max_in_flight:
+                        done = next(as_completed(pending))
+                        pending.remove(done)
+                        self._collect(done.result(), results, on_result)
+                for future in as_completed(pending):
+                    self._collect(future.result(), results, on_result)
+        finally:
+            with self._classifier_lock:
+                if self._classifier is not None and hasattr(self._classifier, "close"):
+                    self._classifier.close()
+                self._classifier = None
+            if self._pdf_executor:
+                self._pdf_executor.shutdown()
+                self._pdf_executor = None
+
+        elapsed = time.perf_counter() - started
+        return results, summarize_batch(results, elapsed)
+
+    def _collect(self, chunk_results, results, on_result):
+        for result in chunk_results:
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+
+def summarize_batch(results, elapsed_seconds):
+    status_counts = {}
+    for result in results:
+        status = result.get("status")
+        status_counts[status] = status_counts.get(status, 0) + 1
+    total = len(results)
+    return {
+        "documents": total,
+        "elapsed_seconds": elapsed_seconds,
+        "docs_per_second": (total / elapsed_seconds) if elapsed_seconds > 0 else 0.0,
+        "status_counts": status_counts,
+    }
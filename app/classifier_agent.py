@@ -1,145 +1,294 @@
-import google.generativeai as genai
+import io
+import asyncio
+import time
 import uuid
 import json
 import os
 import re 
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pdf_parser import extract_text_from_pdf
+from intent_cache import make_intent_cache_key
+from shared_memory import utc_timestamp
+from format_sniffer import sniff_file, sniff_string, sniff_text, _parses_as_json
+from rate_limiter import is_throttle_error
+from metrics import PipelineMetrics
+from json_stream import iter_json_array, iter_ndjson, JSONStreamError
+
+# Bump whenever the intent prompt below changes so cached intents from the old prompt are not reused.
+INTENT_PROMPT_VERSION = "intent-v1"
+GEMINI_MODEL_NAME = "gemini-1.5-flash-latest"
+POSSIBLE_INTENTS = ["Invoice", "RFQ", "Complaint", "Regulation", "Other"]
+INTENT_TEXT_LIMIT = 8000
+BATCH_DOCUMENT_CHAR_LIMIT = INTENT_TEXT_LIMIT
+JSON_STREAM_FORMATS = ("JSONArray", "NDJSON")
+STREAM_LOG_BATCH_SIZE = 500
+# Emails attached to emails are followed at most this deep.
+MAX_ATTACHMENT_DEPTH = 3
+ATTACHMENT_EXTENSIONS = (".pdf", ".json", ".ndjson", ".jsonl", ".eml")
+ATTACHMENT_CONTENT_TYPES = {
+    "application/pdf": ".pdf",
+    "application/json": ".json",
+    "application/x-ndjson": ".ndjson",
+    "message/rfc822": ".eml",
+}
+
+def _strip_code_fences(response_text):
+    cleaned_response_text = response_text.strip()
+    if cleaned_response_text.startswith("```json"):
+        cleaned_response_text = cleaned_response_text[7:]
+        if cleaned_response_text.endswith("```"):
+            cleaned_response_text = cleaned_response_text[:-3]
+    elif cleaned_response_text.startswith("```"):
+        cleaned_response_text = cleaned_response_text[3:]
+        if cleaned_response_text.endswith("```"):
+            cleaned_response_text = cleaned_response_text[:-3]
+    return cleaned_response_text.strip()
+
+
+def _estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _attachment_suffix(filename, content_type):
+    # The temp file keeps a meaningful extension so format sniffing treats it like any other input file.
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in ATTACHMENT_EXTENSIONS:
+        return extension
+    return ATTACHMENT_CONTENT_TYPES.get(content_type)
+
+
+def _pack_intent_batches(items, token_budget, max_batch_size):
+    batch = []
+    batch_tokens = 0
+    for index, text_content in items:
+        item_tokens = _estimate_tokens(text_content[:BATCH_DOCUMENT_CHAR_LIMIT]) + 16
+        if batch and (batch_tokens + item_tokens > token_budget or len(batch) >= max_batch_size):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append((index, text_content))
+        batch_tokens += item_tokens
+    if batch:
+        yield batch
+
+
+def _parse_batch_intents(response_text, expected_count):
+    cleaned_response_text = _strip_code_fences(response_text)
+    try:
+        items = json.loads(cleaned_response_text)
+    except json.JSONDecodeError:
+        match = re.search(r'\[.*\]', cleaned_response_text, re.DOTALL)
+        if not match:
+            print(f"ClassifierAgent: No JSON array found in batched LLM response: '{cleaned_response_text[:200]}'")
+            return {}
+        try:
+            items = json.loads(match.group(0))
+        except json.JSONDecodeError as e:
+            print(f"ClassifierAgent: Error decoding batched LLM response: {e}")
+            return {}
+    if not isinstance(items, list):
+        print(f"ClassifierAgent: Batched LLM response is not a JSON array: '{cleaned_response_text[:200]}'")
+        return {}
+
+    intents = {}
+    seen_indexes = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        intent = item.get("intent")
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < expected_count:
+            continue
+        if index in seen_indexes:
+            # Conflicting answers for one index are dropped so that item falls back to a single call.
+            intents.pop(index, None)
+            continue
+        seen_indexes.add(index)
+        if intent in POSSIBLE_INTENTS:
+            intents[index] = intent
+    return intents
+
 
 class ClassifierAgent:
-    def __init__(self, gemini_api_key, json_agent, email_agent, shared_memory):
+    def __init__(self, gemini_api_key, json_agent, email_agent, shared_memory, pdf_executor=None, intent_cache=None, model=None, fast_path=None,
+                 pdf_max_chars=INTENT_TEXT_LIMIT, pdf_processes=None, pdf_cache_dir=None, call_scheduler=None,
+                 metrics=None, format_debug=True, attachment_workers=4):
         self.json_agent = json_agent
         self.email_agent = email_agent
         self.shared_memory = shared_memory
-        self.conversation_id = None
-        self.model = None
+        self.pdf_executor = pdf_executor
+        # Intent detection only reads the first INTENT_TEXT_LIMIT characters, so PDF extraction stops there by default.
+        self.pdf_max_chars = pdf_max_chars
+        self.pdf_processes = pdf_processes
+        self.pdf_cache_dir = pdf_cache_dir
+        self.intent_cache = intent_cache
+        self.fast_path = fast_path
+        # Optional GeminiCallScheduler (rate limits, retry with backoff, adaptive concurrency); shared across workers.
+        self.call_scheduler = call_scheduler
+        # Stage timings and document counters; pass one PipelineMetrics to every worker to aggregate them.
+        self.metrics = metrics if metrics is not None else PipelineMetrics()
+        self.format_debug = format_debug
+        # PDF, JSON and email attachments are processed as child documents on a shared pool of this size.
+        self.attachment_workers = attachment_workers
+        self._attachment_executor = None
+        self._attachment_executor_lock = threading.Lock()
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._model_init_failed = False
+        self._gemini_api_key = None
+        self.model_name = None
+
+        if model is not None:
+            self._model = model
+            self.model_name = getattr(model, "model_name", type(model).__name__)
+            print(f"ClassifierAgent: Using provided model '{self.model_name}'.")
+            return
 
         if not gemini_api_key:
             print("ClassifierAgent ERROR: Gemini API key is required but not provided.")
             return
 
+        # The Gemini SDK import and model construction are deferred to the first intent request (see `model`),
+        # so inputs that never reach the LLM (empty, unreadable, failed format checks) do not pay for them.
+        self._gemini_api_key = gemini_api_key
+        self.model_name = GEMINI_MODEL_NAME
+        self.safety_settings = [
+            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+        ]
+        self.generation_config = {
+            "temperature": 0.2,
+            "top_p": 1.0,
+            "top_k": 1,
+            "max_output_tokens": 256,
+        }
+
+    @property
+    def model(self):
+        if self._model is None and self._gemini_api_key and not self._model_init_failed:
+            with self._model_lock:
+                if self._model is None and not self._model_init_failed:
+                    self._model = self._build_gemini_model()
+                    self._model_init_failed = self._model is None
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    @property
+    def model_available(self):
+        # True when a model exists or can still be built, without building it.
+        return self._model is not None or (bool(self._gemini_api_key) and not self._model_init_failed)
+
+    def _build_gemini_model(self):
         try:
-            genai.configure(api_key=gemini_api_key)
-            model_to_use = "gemini-1.5-flash-latest"
-            print(f"ClassifierAgent: Attempting to initialize with model: '{model_to_use}'")
-
-            self.safety_settings = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-            ]
-            self.generation_config = {
-                "temperature": 0.2,
-                "top_p": 1.0,
-                "top_k": 1,
-                "max_output_tokens": 256,
-            }
-            self.model = genai.GenerativeModel(
-                model_name=model_to_use,
+            import google.generativeai as genai
+            genai.configure(api_key=self._gemini_api_key)
+            print(f"ClassifierAgent: Attempting to initialize with model: '{GEMINI_MODEL_NAME}'")
+            model = genai.GenerativeModel(
+                model_name=GEMINI_MODEL_NAME,
                 generation_config=self.generation_config,
                 safety_settings=self.safety_settings
             )
-            print(f"ClassifierAgent: Model '{model_to_use}' initialized successfully.")
+            print(f"ClassifierAgent: Model '{GEMINI_MODEL_NAME}' initialized successfully.")
+            return model
         except Exception as e:
-            print(f"ClassifierAgent CRITICAL ERROR: Failed to initialize model '{model_to_use}': {e}")
-            self.model = None
-
-    def _determine_format(self, raw_input_data, input_is_path=False):
-        print(f"\nDEBUG_DETERMINE_FORMAT --- Start ---")
-        print(f"DEBUG_DETERMINE_FORMAT: Input `raw_input_data` (type: {type(raw_input_data)}): '{str(raw_input_data)[:150]}...'")
-        print(f"DEBUG_DETERMINE_FORMAT: Input `input_is_path`: {input_is_path}")
-
-        content_for_analysis = ""
-        file_path_for_logging = None 
-
-        if input_is_path:
-            file_path = raw_input_data
-            file_path_for_logging = file_path
-            print(f"DEBUG_DETERMINE_FORMAT: Processing as FILE PATH: '{file_path}'")
-
-            if not os.path.exists(file_path):
-                print(f"DEBUG_DETERMINE_FORMAT: File NOT FOUND: '{file_path}'")
-                return "Error_FileNotFound", None, f"File not found: {file_path}"
-            print(f"DEBUG_DETERMINE_FORMAT: File EXISTS: '{file_path}'")
-
-            is_pdf_extension = file_path.lower().endswith(".pdf")
-            print(f"DEBUG_DETERMINE_FORMAT: Checking for .pdf extension: {is_pdf_extension}")
-            if is_pdf_extension:
-                print(f"DEBUG_DETERMINE_FORMAT: Path has .pdf extension. Attempting PDF processing.")
-                try:
-                    text_content = extract_text_from_pdf(file_path) 
-                    print(f"DEBUG_DETERMINE_FORMAT: `extract_text_from_pdf` returned (type: {type(text_content)}): '{str(text_content)[:100] if text_content else 'None or Empty'}'")
-                    if text_content is None: 
-                        print(f"DEBUG_DETERMINE_FORMAT: PDF parser returned None. Classifying as Error_PDFParsing.")
-                        return "Error_PDFParsing", None, f"Critical error parsing PDF (parser returned None): {file_path}"
-
-                    print(f"DEBUG_DETERMINE_FORMAT: Successfully processed as PDF. Returning 'PDF'.")
-                    return "PDF", text_content, None
-                except Exception as e:
-                    print(f"DEBUG_DETERMINE_FORMAT: EXCEPTION during PDF processing for '{file_path}': {e}")
-                    return "Error_PDFParsing", None, f"Error during PDF processing for {file_path}: {e}"
-            else: 
-                print(f"DEBUG_DETERMINE_FORMAT: Path does NOT have .pdf extension. Reading content as plain text.")
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content_for_analysis = f.read()
-                    print(f"DEBUG_DETERMINE_FORMAT: Successfully read content from non-PDF file (length: {len(content_for_analysis)}). Snippet: '{content_for_analysis[:150]}...'")
-                except Exception as e:
-                    print(f"DEBUG_DETERMINE_FORMAT: EXCEPTION reading non-PDF file '{file_path}': {e}")
-                    return "Error_FileRead", None, f"Error reading content from file {file_path}: {e}"
-        else: 
+            print(f"ClassifierAgent CRITICAL ERROR: Failed to initialize model '{GEMINI_MODEL_NAME}': {e}")
+            return None
+
+    def _debug_format(self, message):
+        if self.format_debug:
+            print(message)
+
+    def _determine_format(self, raw_input_data, input_is_path=False, conversation_id=None):
+        self._debug_format(f"\nDEBUG_DETERMINE_FORMAT --- Start ---")
+        self._debug_format(f"DEBUG_DETERMINE_FORMAT: Input `raw_input_data` (type: {type(raw_input_data)}): '{str(raw_input_data)[:150]}...'")
+        self._debug_format(f"DEBUG_DETERMINE_FORMAT: Input `input_is_path`: {input_is_path}")
+
+        if not input_is_path:
             content_for_analysis = raw_input_data
-            print(f"DEBUG_DETERMINE_FORMAT: Processing as RAW STRING data (length: {len(content_for_analysis)}). Snippet: '{content_for_analysis[:150]}...'")
-
-        print(f"DEBUG_DETERMINE_FORMAT: Proceeding to common content checks.")
-        if not content_for_analysis.strip():
-            print(f"DEBUG_DETERMINE_FORMAT: Content for analysis is EMPTY or WHITESPACE.")
-            if input_is_path:
-                print(f"DEBUG_DETERMINE_FORMAT: Empty content from a non-PDF file. Returning 'TextFile'.")
-                return "TextFile", "", f"Empty text content from non-PDF file: {file_path_for_logging or 'unknown path'}"
-            print(f"DEBUG_DETERMINE_FORMAT: Empty content from raw input. Returning 'Unknown_EmptyInput'.")
-            return "Unknown_EmptyInput", "", "Input content is empty or whitespace."
-
-        stripped_content = content_for_analysis.strip()
-        print(f"DEBUG_DETERMINE_FORMAT: Content for JSON/Email check (length {len(stripped_content)}): '{stripped_content[:100]}...'")
-
-        is_json_shape = (stripped_content.startswith("{") and stripped_content.endswith("}")) or \
-                       (stripped_content.startswith("[") and stripped_content.endswith("]"))
-        print(f"DEBUG_DETERMINE_FORMAT: Checking for JSON shape: {is_json_shape}")
-        if is_json_shape:
+            sniffed_kind = sniff_string(content_for_analysis)
+            self._debug_format(f"DEBUG_DETERMINE_FORMAT: Processing as RAW STRING data (length: {len(content_for_analysis)}). Sniffed as: {sniffed_kind}")
+            if sniffed_kind == "Empty":
+                return "Unknown_EmptyInput", "", "Input content is empty or whitespace."
+            if sniffed_kind in ("JSON", "Email") or sniffed_kind in JSON_STREAM_FORMATS:
+                return sniffed_kind, content_for_analysis, None
+            return "Text", content_for_analysis, None
+
+        file_path = raw_input_data
+        self._debug_format(f"DEBUG_DETERMINE_FORMAT: Processing as FILE PATH: '{file_path}'")
+        if not os.path.exists(file_path):
+            self._debug_format(f"DEBUG_DETERMINE_FORMAT: File NOT FOUND: '{file_path}'")
+            return "Error_FileNotFound", None, f"File not found: {file_path}"
+
+        # Only a bounded prefix/suffix window is read to decide the format; the full file is read
+        # later only when the routed agent needs it (JSON and Email).
+        try:
+            sniffed_kind, prefix_text, file_size = sniff_file(file_path)
+        except Exception as e:
+            self._debug_format(f"DEBUG_DETERMINE_FORMAT: EXCEPTION reading file '{file_path}': {e}")
+            return "Error_FileRead", None, f"Error reading content from file {file_path}: {e}"
+        self._debug_format(f"DEBUG_DETERMINE_FORMAT: File sniffed as: {sniffed_kind} (size: {file_size} bytes)")
+
+        if sniffed_kind == "PDF" or file_path.lower().endswith(".pdf"):
             try:
-                json.loads(stripped_content)
-                print(f"DEBUG_DETERMINE_FORMAT: Successfully parsed as JSON. Returning 'JSON'.")
-                return "JSON", stripped_content, None
-            except json.JSONDecodeError:
-                print(f"DEBUG_DETERMINE_FORMAT: Content has JSON-like shape but FAILED to parse as JSON.")
-                pass 
-            
-        print(f"DEBUG_DETERMINE_FORMAT: Checking for Email format.")
-        content_lower = content_for_analysis.lower()
-        has_from = "from:" in content_lower
-        has_subject = "subject:" in content_lower
-        has_to = "to:" in content_lower
-        has_date = "date:" in content_lower
-        has_message_id = "message-id:" in content_lower
-        has_mime_version = "mime-version:" in content_lower
-        print(f"DEBUG_DETERMINE_FORMAT: Email heuristic checks: from:{has_from}, subject:{has_subject}, to:{has_to}, date:{has_date}, msg_id:{has_message_id}, mime:{has_mime_version}")
-
-        if has_from and (has_subject or has_to or has_date or has_message_id or has_mime_version):
-            print(f"DEBUG_DETERMINE_FORMAT: Classified as Email. Returning 'Email'.")
-            return "Email", content_for_analysis, None
-        else:
-            print(f"DEBUG_DETERMINE_FORMAT: Did NOT meet Email classification criteria.")
-
-        if input_is_path:
-            print(f"DEBUG_DETERMINE_FORMAT: Input was a file path, not PDF/JSON/Email by content. Returning 'TextFile'.")
-            return "TextFile", content_for_analysis, None
-
-        print(f"DEBUG_DETERMINE_FORMAT: Input was raw string, not JSON/Email by content. Returning 'Text'.")
-        print(f"DEBUG_DETERMINE_FORMAT --- End ---")
-        return "Text", content_for_analysis, None
-
-    def _classify_intent_with_gemini(self, text_content):
+                with self.metrics.span("pdf_extract", conversation_id):
+                    if self.pdf_executor:
+                        text_content = self.pdf_executor.submit(
+                            extract_text_from_pdf, file_path, max_chars=self.pdf_max_chars, cache_dir=self.pdf_cache_dir
+                        ).result()
+                    else:
+                        text_content = extract_text_from_pdf(
+                            file_path, max_chars=self.pdf_max_chars, processes=self.pdf_processes, cache_dir=self.pdf_cache_dir
+                        )
+                if text_content is None: 
+                    self._debug_format(f"DEBUG_DETERMINE_FORMAT: PDF parser returned None. Classifying as Error_PDFParsing.")
+                    return "Error_PDFParsing", None, f"Critical error parsing PDF (parser returned None): {file_path}"
+                self._debug_format(f"DEBUG_DETERMINE_FORMAT: Successfully processed as PDF. Returning 'PDF'.")
+                return "PDF", text_content, None
+            except Exception as e:
+                self._debug_format(f"DEBUG_DETERMINE_FORMAT: EXCEPTION during PDF processing for '{file_path}': {e}")
+                return "Error_PDFParsing", None, f"Error during PDF processing for {file_path}: {e}"
+
+        if sniffed_kind == "Empty":
+            self._debug_format(f"DEBUG_DETERMINE_FORMAT: Empty content from a non-PDF file. Returning 'TextFile'.")
+            return "TextFile", "", f"Empty text content from non-PDF file: {file_path}"
+
+        if sniffed_kind in JSON_STREAM_FORMATS:
+            # Records are streamed from the file at routing time; the sniffed prefix is enough for intent.
+            self._debug_format(f"DEBUG_DETERMINE_FORMAT: Returning '{sniffed_kind}' (records will be streamed).")
+            return sniffed_kind, prefix_text, None
+
+        if sniffed_kind == "Email":
+            # The message is parsed incrementally from the file once the document starts (see _parse_email).
+            self._debug_format(f"DEBUG_DETERMINE_FORMAT: Returning 'Email'.")
+            return "Email", prefix_text, None
+
+        if sniffed_kind == "JSON":
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content_for_analysis = f.read()
+            except Exception as e:
+                self._debug_format(f"DEBUG_DETERMINE_FORMAT: EXCEPTION reading file '{file_path}': {e}")
+                return "Error_FileRead", None, f"Error reading content from file {file_path}: {e}"
+            if _parses_as_json(content_for_analysis, sniffed_kind):
+                self._debug_format(f"DEBUG_DETERMINE_FORMAT: Returning '{sniffed_kind}'.")
+                return sniffed_kind, content_for_analysis, None
+            # Only the shape looked like JSON; the content goes through the email and text checks instead.
+            self._debug_format(f"DEBUG_DETERMINE_FORMAT: JSON-shaped content does not parse. Sniffing again without JSON shapes.")
+            if sniff_text(prefix_text, json_shapes=False) == "Email":
+                self._debug_format(f"DEBUG_DETERMINE_FORMAT: Returning 'Email'.")
+                return "Email", prefix_text, None
+
+        self._debug_format(f"DEBUG_DETERMINE_FORMAT: Not PDF/JSON/Email by content. Returning 'TextFile'.")
+        return "TextFile", prefix_text, None
+
+    def _classify_intent_with_gemini(self, text_content, conversation_id=None):
         if not self.model:
             print("ClassifierAgent: Model not available for intent classification (was not initialized).")
             return "Error_ClientNotInitialized"
@@ -147,7 +296,22 @@ class ClassifierAgent:
             print("ClassifierAgent: Content for intent classification is empty. Returning 'Unknown_EmptyContent'.")
             return "Unknown_EmptyContent"
 
-        possible_intents = ["Invoice", "RFQ", "Complaint", "Regulation", "Other"]
+        if not self.intent_cache:
+            return self._request_intent_from_gemini(text_content, conversation_id)
+
+        cache_key = make_intent_cache_key(text_content, INTENT_PROMPT_VERSION, self.model_name)
+        cached_intent = self.intent_cache.get(cache_key)
+        if cached_intent:
+            print(f"ClassifierAgent: Intent cache hit, reusing intent '{cached_intent}'.")
+            return cached_intent
+
+        intent = self._request_intent_from_gemini(text_content, conversation_id)
+        if intent in POSSIBLE_INTENTS:
+            self.intent_cache.set(cache_key, intent)
+        return intent
+
+    def _build_intent_prompt(self, text_content):
+        possible_intents = POSSIBLE_INTENTS
         prompt = f"""
         Analyze the following text to determine its primary business intent.
         Choose one intent from this list: {possible_intents}.
@@ -162,118 +326,614 @@ class ClassifierAgent:
 
         Text to analyze:
         ---
-        {text_content[:8000]}
+        {text_content[:INTENT_TEXT_LIMIT]}
         ---
         Respond now with ONLY the JSON object.
         """
+        return prompt
+
+    def _generate_content(self, prompt, max_output_tokens, **kwargs):
+        if not self.call_scheduler:
+            return self.model.generate_content(prompt, **kwargs)
+        return self.call_scheduler.call(
+            lambda: self.model.generate_content(prompt, **kwargs),
+            estimated_tokens=_estimate_tokens(prompt) + max_output_tokens
+        )
+
+    async def _agenerate_content(self, prompt, max_output_tokens, **kwargs):
+        if not self.call_scheduler:
+            return await self.model.generate_content_async(prompt, **kwargs)
+        return await self.call_scheduler.acall(
+            lambda: self.model.generate_content_async(prompt, **kwargs),
+            estimated_tokens=_estimate_tokens(prompt) + max_output_tokens
+        )
+
+    def _request_intent_from_gemini(self, text_content, conversation_id=None):
+        prompt = self._build_intent_prompt(text_content)
         response = None
         try:
             print(f"ClassifierAgent: Sending text (snippet: '{text_content[:100].replace(os.linesep, ' ')}...') to LLM for intent classification.")
-            response = self.model.generate_content(prompt)
+            with self.metrics.span("llm_request", conversation_id):
+                response = self._generate_content(prompt, max_output_tokens=256)
+            return self._parse_intent_response(response)
+        except Exception as e:
+            return self._intent_error_from_exception(e, response)
 
-            if not response or not hasattr(response, 'text') or not response.text:
-                feedback = ""
-                if response and hasattr(response, 'prompt_feedback') and response.prompt_feedback and response.prompt_feedback.block_reason:
-                    feedback = f" Prompt blocked. Reason: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}"
-                print(f"ClassifierAgent: LLM returned an empty response or no text part.{feedback}")
-                return "Error_EmptyResponseFromAPI" if not feedback else "Error_PromptBlocked"
-
-            cleaned_response_text = response.text.strip()
-            if cleaned_response_text.startswith("```json"):
-                cleaned_response_text = cleaned_response_text[7:]
-                if cleaned_response_text.endswith("```"):
-                    cleaned_response_text = cleaned_response_text[:-3]
-            elif cleaned_response_text.startswith("```"):
-                 cleaned_response_text = cleaned_response_text[3:]
-                 if cleaned_response_text.endswith("```"):
-                    cleaned_response_text = cleaned_response_text[:-3]
-            cleaned_response_text = cleaned_response_text.strip()
-            
-            try:
-                response_json = json.loads(cleaned_response_text)
-            except json.JSONDecodeError:
-                match = re.search(r'\{\s*"intent"\s*:\s*"[^"]+"\s*\}', cleaned_response_text)
-                if match:
-                    try:
-                        response_json = json.loads(match.group(0))
-                    except json.JSONDecodeError as e_inner:
-                        print(f"ClassifierAgent: Error decoding JSON even after regex match from LLM response: {e_inner}. Cleaned response was: '{cleaned_response_text}'")
-                        return "Error_ParsingResponse"
-                else:
-                    print(f"ClassifierAgent: Error decoding JSON from LLM response (no valid JSON found). Cleaned response was: '{cleaned_response_text}'")
+    async def _arequest_intent_from_gemini(self, text_content, conversation_id=None):
+        prompt = self._build_intent_prompt(text_content)
+        response = None
+        try:
+            print(f"ClassifierAgent: Sending text (snippet: '{text_content[:100].replace(os.linesep, ' ')}...') to LLM for intent classification (async).")
+            with self.metrics.span("llm_request", conversation_id):
+                response = await self._agenerate_content(prompt, max_output_tokens=256)
+            return self._parse_intent_response(response)
+        except Exception as e:
+            return self._intent_error_from_exception(e, response)
+
+    def _parse_intent_response(self, response):
+        if not response or not hasattr(response, 'text') or not response.text:
+            feedback = ""
+            if response and hasattr(response, 'prompt_feedback') and response.prompt_feedback and response.prompt_feedback.block_reason:
+                feedback = f" Prompt blocked. Reason: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}"
+            print(f"ClassifierAgent: LLM returned an empty response or no text part.{feedback}")
+            return "Error_EmptyResponseFromAPI" if not feedback else "Error_PromptBlocked"
+
+        cleaned_response_text = _strip_code_fences(response.text)
+        
+        try:
+            response_json = json.loads(cleaned_response_text)
+        except json.JSONDecodeError:
+            match = re.search(r'\{\s*"intent"\s*:\s*"[^"]+"\s*\}', cleaned_response_text)
+            if match:
+                try:
+                    response_json = json.loads(match.group(0))
+                except json.JSONDecodeError as e_inner:
+                    print(f"ClassifierAgent: Error decoding JSON even after regex match from LLM response: {e_inner}. Cleaned response was: '{cleaned_response_text}'")
                     return "Error_ParsingResponse"
+            else:
+                print(f"ClassifierAgent: Error decoding JSON from LLM response (no valid JSON found). Cleaned response was: '{cleaned_response_text}'")
+                return "Error_ParsingResponse"
 
-            intent = response_json.get("intent")
+        intent = response_json.get("intent")
 
-            if not intent:
-                print(f"ClassifierAgent: LLM JSON response missing 'intent' key. Response: {cleaned_response_text}")
-                return "Error_MalformedResponse"
-            if intent not in possible_intents:
-                print(f"ClassifierAgent: LLM returned an unexpected intent '{intent}'. Defaulting to 'Other'. Response: {cleaned_response_text}")
-                return "Other"
-            
-            print(f"ClassifierAgent: LLM classified intent as '{intent}'.")
-            return intent
+        if not intent:
+            print(f"ClassifierAgent: LLM JSON response missing 'intent' key. Response: {cleaned_response_text}")
+            return "Error_MalformedResponse"
+        if intent not in POSSIBLE_INTENTS:
+            print(f"ClassifierAgent: LLM returned an unexpected intent '{intent}'. Defaulting to 'Other'. Response: {cleaned_response_text}")
+            return "Other"
+        
+        print(f"ClassifierAgent: LLM classified intent as '{intent}'.")
+        return intent
 
-        except json.JSONDecodeError as e:
-            response_text_snippet = cleaned_response_text if 'cleaned_response_text' in locals() else (response.text[:200] if response and hasattr(response, 'text') else 'No response text.')
+    def _intent_error_from_exception(self, e, response):
+        if isinstance(e, json.JSONDecodeError):
+            response_text_snippet = response.text[:200] if response and hasattr(response, 'text') else 'No response text.'
             print(f"ClassifierAgent: Error decoding JSON from LLM response: {e}. Cleaned response was: '{response_text_snippet}'")
             return "Error_ParsingResponse"
+        feedback_message = ""
+        if response and hasattr(response, 'prompt_feedback') and response.prompt_feedback and response.prompt_feedback.block_reason:
+             feedback_message = f" Prompt blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}."
+        elif "API key not valid" in str(e) or "API_KEY_INVALID" in str(e).upper():
+             feedback_message = " Please check your GEMINI_API_KEY."
+        
+        print(f"ClassifierAgent: Error during LLM intent classification or processing its response: {e}.{feedback_message}")
+        if "ക്രമീകരണ республик" in str(e): 
+            print("ClassifierAgent: Encountered an unusual error string from API, potential API issue or misconfiguration.")
+        if is_throttle_error(e):
+            return "Error_IntentRateLimited"
+        return "Error_IntentAPI"
+
+    def classify_intents_batch(self, text_contents, token_budget=6000, max_batch_size=20, conversation_ids=None):
+        # `conversation_ids`, parallel to `text_contents`, tags the LLM request spans with their documents.
+        conversation_ids = conversation_ids or [None] * len(text_contents)
+        intents = [None] * len(text_contents)
+        cache_keys = {}
+        pending = []
+        for index, text_content in enumerate(text_contents):
+            if not self.model_available:
+                intents[index] = "Error_ClientNotInitialized"
+            elif not text_content or not text_content.strip():
+                intents[index] = "Unknown_EmptyContent"
+            elif self.intent_cache:
+                cache_key = make_intent_cache_key(text_content, INTENT_PROMPT_VERSION, self.model_name)
+                cached_intent = self.intent_cache.get(cache_key)
+                if cached_intent:
+                    intents[index] = cached_intent
+                else:
+                    cache_keys[index] = cache_key
+                    pending.append((index, text_content))
+            else:
+                pending.append((index, text_content))
+
+        # The cache was consulted once above; from here on only the uncached request path is used,
+        # so each miss is counted once.
+        for group in _pack_intent_batches(pending, token_budget, max_batch_size):
+            if len(group) == 1:
+                index, text_content = group[0]
+                intents[index] = self._request_intent_from_gemini(text_content, conversation_ids[index])
+                self._cache_intent(cache_keys.get(index), intents[index])
+                continue
+
+            batch_results = self._request_intents_batch_from_gemini(
+                [text for _, text in group], [conversation_ids[index] for index, _ in group]
+            )
+            for position, (index, text_content) in enumerate(group):
+                intent = batch_results.get(position)
+                if intent is None:
+                    print(f"ClassifierAgent: Batched classification gave no valid intent for item {position}. Falling back to a single call.")
+                    intent = self._request_intent_from_gemini(text_content, conversation_ids[index])
+                self._cache_intent(cache_keys.get(index), intent)
+                intents[index] = intent
+        return intents
+
+    def _cache_intent(self, cache_key, intent):
+        if self.intent_cache and cache_key and intent in POSSIBLE_INTENTS:
+            self.intent_cache.set(cache_key, intent)
+
+    def _request_intents_batch_from_gemini(self, text_contents, conversation_ids=None):
+        documents_block = "\n".join(
+            f"=== Document {index} ===\n{text_content[:BATCH_DOCUMENT_CHAR_LIMIT]}\n=== End of Document {index} ==="
+            for index, text_content in enumerate(text_contents)
+        )
+        prompt = f"""
+        Analyze each of the following {len(text_contents)} documents to determine its primary business intent.
+        Choose one intent per document from this list: {POSSIBLE_INTENTS}.
+        - "Invoice": Documents related to billing, payment requests, or financial statements requiring payment.
+        - "RFQ" (Request for Quotation): Communications seeking pricing, proposals for goods/services, or vendor quotes.
+        - "Complaint": Expressions of dissatisfaction, problems, issues, or grievances regarding products or services.
+        - "Regulation": Official rules, legal documents, compliance requirements, terms and conditions, or policy statements.
+        - "Other": If the text does not clearly fit any of the above categories, is too generic, or if the text is very short and lacks clear business context.
+
+        Your response MUST be a valid JSON array with exactly one object per document, each with an integer "index" and a string "intent".
+        Example: [{{"index": 0, "intent": "Invoice"}}, {{"index": 1, "intent": "RFQ"}}]
+
+        Documents to analyze:
+        {documents_block}
+        Respond now with ONLY the JSON array.
+        """
+        try:
+            print(f"ClassifierAgent: Sending batch of {len(text_contents)} documents to LLM for intent classification.")
+            max_output_tokens = 32 + 24 * len(text_contents)
+            with self.metrics.span("llm_batch_request", conversation_ids=conversation_ids):
+                response = self._generate_content(
+                    prompt,
+                    max_output_tokens=max_output_tokens,
+                    generation_config={"max_output_tokens": max_output_tokens}
+                )
+            if not response or not hasattr(response, 'text') or not response.text:
+                print("ClassifierAgent: LLM returned an empty response for the batch.")
+                return {}
+            return _parse_batch_intents(response.text, len(text_contents))
         except Exception as e:
-            feedback_message = ""
-            if response and hasattr(response, 'prompt_feedback') and response.prompt_feedback and response.prompt_feedback.block_reason:
-                 feedback_message = f" Prompt blocked due to: {response.prompt_feedback.block_reason_message or response.prompt_feedback.block_reason}."
-            elif "API key not valid" in str(e) or "API_KEY_INVALID" in str(e).upper():
-                 feedback_message = " Please check your GEMINI_API_KEY."
-            
-            print(f"ClassifierAgent: Error during LLM intent classification or processing its response: {e}.{feedback_message}")
-            if "ക്രമീകരണ республик" in str(e): 
-                print("ClassifierAgent: Encountered an unusual error string from API, potential API issue or misconfiguration.")
-            return "Error_IntentAPI"
-
-    def process_input(self, raw_input_data, input_is_path=False):
-        self.conversation_id = str(uuid.uuid4())
+            print(f"ClassifierAgent: Error during batched LLM intent classification: {e}")
+            return {}
+
+    def process_input(self, raw_input_data, input_is_path=False, log_context=None, conversation_id=None):
+        # `log_context` adds caller fields (e.g. the mailbox a message came from) to the document's first log entry.
+        # `conversation_id` lets a caller hand out the ID before processing starts (e.g. a queued service request).
+        return self._process_document(raw_input_data, input_is_path, log_context, conversation_id=conversation_id)
+
+    def _process_document(self, raw_input_data, input_is_path, log_context=None, depth=0, conversation_id=None):
+        started = time.perf_counter()
+        document = self._begin_document(raw_input_data, input_is_path, log_context, depth, conversation_id)
+        if document["result"] is None:
+            intent = self._pre_llm_intent(document)
+            if intent is None:
+                with self.metrics.span("intent", document["conversation_id"]):
+                    intent = self._classify_intent(document["text_content"], document["conversation_id"])
+            document["result"] = self._finish_document(document, intent)
+        self.metrics.observe("document", time.perf_counter() - started, document["conversation_id"])
+        return document["result"]
+
+    def _classify_intent(self, text_content, conversation_id=None):
+        if not self.fast_path:
+            return self._classify_intent_with_gemini(text_content, conversation_id)
+
+        fast_intent, guess, confidence = self.fast_path.decide(text_content)
+        if fast_intent:
+            print(f"ClassifierAgent: Fast path classified intent as '{fast_intent}' (confidence {confidence:.2f}), skipping LLM call.")
+            return fast_intent
+        intent = self._classify_intent_with_gemini(text_content, conversation_id)
+        self.fast_path.record_llm_result(guess, confidence, intent)
+        return intent
+
+    def process_inputs(self, inputs, token_budget=6000, max_batch_size=20):
+        documents = [self._begin_document(raw_input_data, input_is_path) for raw_input_data, input_is_path in inputs]
+
+        intents = [None] * len(documents)
+        fast_path_guesses = {}
+        llm_positions = []
+        for position, document in enumerate(documents):
+            if document["result"] is not None:
+                continue
+            intents[position] = self._pre_llm_intent(document)
+            if intents[position] is None and self.fast_path:
+                fast_intent, guess, confidence = self.fast_path.decide(document["text_content"])
+                intents[position] = fast_intent
+                fast_path_guesses[position] = (guess, confidence)
+            if intents[position] is None:
+                llm_positions.append(position)
+
+        if llm_positions:
+            llm_conversation_ids = [documents[position]["conversation_id"] for position in llm_positions]
+            with self.metrics.span("intent_batch", conversation_ids=llm_conversation_ids):
+                batch_intents = self.classify_intents_batch(
+                    [documents[position]["text_content"] for position in llm_positions],
+                    token_budget=token_budget,
+                    max_batch_size=max_batch_size,
+                    conversation_ids=llm_conversation_ids
+                )
+            for position, intent in zip(llm_positions, batch_intents):
+                intents[position] = intent
+                if position in fast_path_guesses:
+                    self.fast_path.record_llm_result(*fast_path_guesses[position], intent)
+
+        return [
+            document["result"] if document["result"] is not None else self._finish_document(document, intent)
+            for document, intent in zip(documents, intents)
+        ]
+
+    async def aprocess_input(self, raw_input_data, input_is_path=False, stage_timeout=None, semaphore=None):
+        if semaphore is None:
+            return await self._aprocess_input(raw_input_data, input_is_path, stage_timeout)
+        async with semaphore:
+            return await self._aprocess_input(raw_input_data, input_is_path, stage_timeout)
+
+    async def _aprocess_input(self, raw_input_data, input_is_path, stage_timeout):
+        started = time.perf_counter()
+        result = await self._aprocess_stages(raw_input_data, input_is_path, stage_timeout)
+        self.metrics.observe("document", time.perf_counter() - started, result.get("conversation_id"))
+        return result
+
+    async def _aprocess_stages(self, raw_input_data, input_is_path, stage_timeout):
+        try:
+            # File reads and PDF extraction are blocking, so the format stage runs on a worker thread.
+            document = await asyncio.wait_for(
+                asyncio.to_thread(self._begin_document, raw_input_data, input_is_path), stage_timeout
+            )
+        except asyncio.TimeoutError:
+            return self._stage_timeout_result("format", raw_input_data, input_is_path, stage_timeout)
+        if document["result"] is not None:
+            return document["result"]
+
+        intent = self._pre_llm_intent(document)
+        if intent is None:
+            try:
+                with self.metrics.span("intent", document["conversation_id"]):
+                    intent = await asyncio.wait_for(self._aclassify_intent(document["text_content"], document["conversation_id"]), stage_timeout)
+            except asyncio.TimeoutError:
+                print(f"ClassifierAgent: Intent stage timed out after {stage_timeout}s for ConvID {document['conversation_id']}.")
+                intent = "Error_IntentTimeout"
+
+        try:
+            log_entries, result = await asyncio.wait_for(
+                asyncio.to_thread(self._route_document, document, intent), stage_timeout
+            )
+        except asyncio.TimeoutError:
+            return self._stage_timeout_result("routing", raw_input_data, input_is_path, stage_timeout, document)
+        try:
+            with self.metrics.span("log", document["conversation_id"]):
+                await asyncio.wait_for(self.shared_memory.alog_many(document["conversation_id"], log_entries,
+                                                                    index_record=self._index_record(document, result)),
+                                       stage_timeout)
+        except asyncio.TimeoutError:
+            print(f"ClassifierAgent: Logging stage timed out after {stage_timeout}s for ConvID {document['conversation_id']}.")
+        self.metrics.count_document(result["format"], result["intent"], result["status"])
+        print(f"ClassifierAgent: Processing complete for ConvID {document['conversation_id']}. Status: {result['status']}")
+        return result
+
+    def _stage_timeout_result(self, stage, raw_input_data, input_is_path, stage_timeout, document=None):
+        message = f"{stage.capitalize()} stage timed out after {stage_timeout}s"
+        print(f"ClassifierAgent: {message} for input '{str(raw_input_data)[:100]}'.")
+        self.metrics.count_document(document["format"] if document else None, None, f"Failed_Timeout_{stage.capitalize()}")
+        return {
+            "status": f"Failed_Timeout_{stage.capitalize()}",
+            "message": message,
+            "format": document["format"] if document else None,
+            "intent": None,
+            "output": {},
+            "anomalies": [],
+            "conversation_id": document["conversation_id"] if document else None,
+        }
+
+    async def _aclassify_intent(self, text_content, conversation_id=None):
+        if not self.fast_path:
+            return await self._aclassify_intent_with_gemini(text_content, conversation_id)
+
+        fast_intent, guess, confidence = self.fast_path.decide(text_content)
+        if fast_intent:
+            print(f"ClassifierAgent: Fast path classified intent as '{fast_intent}' (confidence {confidence:.2f}), skipping LLM call.")
+            return fast_intent
+        intent = await self._aclassify_intent_with_gemini(text_content, conversation_id)
+        self.fast_path.record_llm_result(guess, confidence, intent)
+        return intent
+
+    async def _aclassify_intent_with_gemini(self, text_content, conversation_id=None):
+        # A first-time model build imports the Gemini SDK, so it runs off the event loop.
+        if not (self._model or await asyncio.to_thread(lambda: self.model)):
+            print("ClassifierAgent: Model not available for intent classification (was not initialized).")
+            return "Error_ClientNotInitialized"
+        if not self.intent_cache:
+            return await self._arequest_intent_from_gemini(text_content, conversation_id)
+
+        # Persistent cache tiers do blocking I/O, so they are consulted off the event loop.
+        cache_key = make_intent_cache_key(text_content, INTENT_PROMPT_VERSION, self.model_name)
+        cached_intent = await asyncio.to_thread(self.intent_cache.get, cache_key)
+        if cached_intent:
+            print(f"ClassifierAgent: Intent cache hit, reusing intent '{cached_intent}'.")
+            return cached_intent
+        intent = await self._arequest_intent_from_gemini(text_content, conversation_id)
+        if intent in POSSIBLE_INTENTS:
+            await asyncio.to_thread(self.intent_cache.set, cache_key, intent)
+        return intent
+
+    async def aprocess_inputs(self, inputs, concurrency=16, stage_timeout=None):
+        semaphore = asyncio.Semaphore(concurrency)
+        pending = set()
+        inputs_iter = iter(inputs)
+        exhausted = False
+        # Tasks are created lazily, at most 2x concurrency at a time, so huge iterables stay bounded in memory.
+        while True:
+            while not exhausted and len(pending) < concurrency * 2:
+                try:
+                    raw_input_data, input_is_path = next(inputs_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.ensure_future(
+                    self.aprocess_input(raw_input_data, input_is_path, stage_timeout=stage_timeout, semaphore=semaphore)
+                ))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+    def _begin_document(self, raw_input_data, input_is_path, log_context=None, depth=0, conversation_id=None):
+        # The document dict is the request context: everything specific to one input lives in it and is
+        # passed from stage to stage, never stored on self, so one agent can serve any number of threads.
+        conversation_id = conversation_id or str(uuid.uuid4())
         initial_log_data = {
             "input_source_type": "file_path" if input_is_path else "raw_string",
             "input_identifier": raw_input_data if input_is_path else raw_input_data[:100] + "...",
-            "conversation_id": self.conversation_id
+            "conversation_id": conversation_id
+        }
+        if log_context:
+            initial_log_data.update(log_context)
+        document = {
+            "conversation_id": conversation_id,
+            "raw_input_data": raw_input_data,
+            "input_is_path": input_is_path,
+            "initial_log_data": initial_log_data,
+            "depth": depth,
+            "result": None,
         }
 
-        doc_format, text_content_for_intent, format_error_message = self._determine_format(raw_input_data, input_is_path)
+        with self.metrics.span("format", conversation_id):
+            doc_format, text_content_for_intent, format_error_message = self._determine_format(
+                raw_input_data, input_is_path, conversation_id
+            )
+        if doc_format == "Email":
+            doc_format, text_content_for_intent, format_error_message = self._parse_email(document)
+        document.update({"format": doc_format, "text_content": text_content_for_intent, "format_error": format_error_message})
         
         if "Error_" in doc_format:
             print(f"ClassifierAgent: Error in format determination: {format_error_message}")
             initial_log_data.update({"status": "FAILED_FORMAT_DETERMINATION", "error": format_error_message, "determined_format": doc_format})
-            self.shared_memory.log(self.conversation_id, initial_log_data)
-            return {"status": "Error", "message": format_error_message, "conversation_id": self.conversation_id, "format": doc_format, "intent": None}
+            document["result"] = {"status": "Error", "message": format_error_message, "conversation_id": conversation_id, "format": doc_format, "intent": None}
+            with self.metrics.span("log", conversation_id):
+                self.shared_memory.log_many(conversation_id, [initial_log_data],
+                                            index_record=self._index_record(document, document["result"]))
+            self.metrics.count_document(doc_format, None, "Error")
+            return document
         
         if doc_format != "Unknown_EmptyInput" and not text_content_for_intent and format_error_message:
              print(f"ClassifierAgent: Format {doc_format} determined, but content is effectively empty or had issues: {format_error_message}")
         elif doc_format != "Unknown_EmptyInput" and not text_content_for_intent and not format_error_message:
             print(f"ClassifierAgent: Format {doc_format} determined, content is empty (no specific error message).")
 
-
         initial_log_data["determined_format"] = doc_format
+        return document
+
+    def _parse_email(self, document):
+        raw_input_data = document["raw_input_data"]
+        try:
+            with self.metrics.span("email_parse", document["conversation_id"]):
+                if document["input_is_path"]:
+                    message = self.email_agent.parse_file(raw_input_data)
+                else:
+                    message = self.email_agent.parse_string(raw_input_data)
+                body = self.email_agent.get_body(message)
+        except Exception as e:
+            return "Error_EmailParsing", None, f"Error parsing email {str(raw_input_data)[:100]}: {e}"
+        document["email_message"] = message
+        document["email_body"] = body
+        # Intent is classified from the decoded headers and text body, never from base64 parts or markup.
+        return "Email", self.email_agent.intent_text(message, body)[:INTENT_TEXT_LIMIT], None
+
+    def _attachment_pool(self):
+        if self.attachment_workers <= 1:
+            return None
+        with self._attachment_executor_lock:
+            if self._attachment_executor is None:
+                self._attachment_executor = ThreadPoolExecutor(
+                    max_workers=self.attachment_workers, thread_name_prefix="attachment-worker"
+                )
+            return self._attachment_executor
+
+    def close(self):
+        with self._attachment_executor_lock:
+            if self._attachment_executor is not None:
+                self._attachment_executor.shutdown(wait=True)
+                self._attachment_executor = None
+
+    def _process_attachments(self, document):
+        conversation_id = document["conversation_id"]
+        depth = document["depth"] + 1
+        # Only top-level emails fan out to the pool; nested attachments run on the calling worker so a
+        # pool thread never blocks waiting for work queued behind it.
+        executor = self._attachment_pool() if document["depth"] == 0 else None
+        children = []
+        pending = []
+        temp_paths = []
+        try:
+            for info, payload in self.email_agent.iter_attachment_payloads(document["email_message"]):
+                child = dict(info)
+                children.append(child)
+                suffix = _attachment_suffix(info["filename"], info["content_type"])
+                if suffix is None:
+                    child["status"] = "Skipped_UnsupportedAttachment"
+                    continue
+                if depth > MAX_ATTACHMENT_DEPTH:
+                    child["status"] = "Skipped_MaxAttachmentDepth"
+                    continue
+                # Payloads are spilled to disk one at a time so only the file path travels to the worker.
+                fd, temp_path = tempfile.mkstemp(prefix="attachment-", suffix=suffix)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(payload)
+                temp_paths.append(temp_path)
+                log_context = {
+                    "parent_conversation_id": conversation_id,
+                    "attachment_filename": info["filename"],
+                    "attachment_content_type": info["content_type"],
+                }
+                if executor is None:
+                    self._fill_attachment_result(child, lambda: self._process_document(temp_path, True, log_context, depth))
+                else:
+                    pending.append((child, executor.submit(self._process_document, temp_path, True, log_context, depth)))
+            for child, future in pending:
+                self._fill_attachment_result(child, future.result)
+        finally:
+            for child, future in pending:
+                future.cancel()
+            for temp_path in temp_paths:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+        print(f"ClassifierAgent: Processed {len(temp_paths)} of {len(children)} attachments for ConvID {conversation_id}.")
+        return children
+
+    def _fill_attachment_result(self, child, get_result):
+        try:
+            result = get_result()
+        except Exception as e:
+            print(f"ClassifierAgent: Error processing attachment '{child['filename']}': {e}")
+            child["status"] = "Failed_AttachmentProcessing"
+            return
+        child.update({
+            "conversation_id": result["conversation_id"],
+            "status": result["status"],
+            "format": result["format"],
+            "intent": result["intent"],
+        })
 
-        intent = "N/A" 
+    def _pre_llm_intent(self, document):
+        doc_format = document["format"]
         if doc_format == "Unknown_EmptyInput":
-            intent = "Unknown_EmptyInput" 
-        elif "Error_" in doc_format : 
-            intent = "Error_Preprocessing" 
-            initial_log_data["error_details_preprocessing"] = format_error_message 
-        else: 
-            if not self.model: 
-                intent = "Error_ModelNotInitialized" 
-                print("ClassifierAgent: LLM model not initialized, cannot classify intent.")
-            elif not text_content_for_intent.strip(): 
-                intent = "Unknown_EmptyContent"
-                print("ClassifierAgent: Content for intent classification is empty, skipping LLM call.")
-            else:
-                intent = self._classify_intent_with_gemini(text_content_for_intent) 
+            return "Unknown_EmptyInput" 
+        if "Error_" in doc_format : 
+            document["initial_log_data"]["error_details_preprocessing"] = document["format_error"] 
+            return "Error_Preprocessing" 
+        if not self.model_available: 
+            print("ClassifierAgent: LLM model not initialized, cannot classify intent.")
+            return "Error_ModelNotInitialized" 
+        if not document["text_content"].strip(): 
+            print("ClassifierAgent: Content for intent classification is empty, skipping LLM call.")
+            return "Unknown_EmptyContent"
+        return None
+
+    def _index_record(self, document, result):
+        # Summary written alongside the document's log entries and indexed by shared memory for
+        # SharedMemory.query_documents. Only schema anomalies from JSONAgent are indexed: their
+        # messages come from a fixed set per schema, unlike free-form error text.
+        output = result.get("output") or {}
+        anomalies = []
+        if result["format"] == "JSON" and result["status"] == "Processed":
+            anomalies = list(dict.fromkeys(result.get("anomalies") or []))
+        elif result["format"] in JSON_STREAM_FORMATS:
+            anomalies = list(output.get("anomaly_counts") or {})
+        initial_log_data = document["initial_log_data"]
+        record = {
+            "conversation_id": document["conversation_id"],
+            "timestamp": initial_log_data.get("timestamp") or utc_timestamp(),
+            "input_identifier": initial_log_data.get("input_identifier"),
+            "format": result["format"],
+            "intent": result["intent"],
+            "status": result["status"],
+            "sender": output.get("sender_address") if result["format"] == "Email" else None,
+            "urgent": bool(output.get("urgency")) if result["format"] == "Email" else False,
+            "anomalies": anomalies,
+        }
+        if initial_log_data.get("parent_conversation_id"):
+            record["parent_conversation_id"] = initial_log_data["parent_conversation_id"]
+        return record
+
+    def _finish_document(self, document, intent):
+        log_entries, result = self._route_document(document, intent)
+        # Both entries for the document go out together in a single append, with its index record.
+        with self.metrics.span("log", document["conversation_id"]):
+            self.shared_memory.log_many(document["conversation_id"], log_entries,
+                                        index_record=self._index_record(document, result))
+        self.metrics.count_document(result["format"], result["intent"], result["status"])
+        print(f"ClassifierAgent: Processing complete for ConvID {document['conversation_id']}. Status: {result['status']}")
+        return result
+
+    def _open_json_stream(self, document):
+        if document["input_is_path"]:
+            return open(document["raw_input_data"], 'r', encoding='utf-8')
+        return io.StringIO(document["raw_input_data"])
+
+    def _process_json_stream(self, document, intent, final_log_payload):
+        conversation_id = document["conversation_id"]
+        pending_entries = []
+        stream_errors = []
+
+        def log_record(index, output, record_anomalies):
+            pending_entries.append({"step": "record_result", "record_index": index,
+                                    "extracted_values": output, "anomalies": record_anomalies})
+            if len(pending_entries) >= STREAM_LOG_BATCH_SIZE:
+                self.shared_memory.log_many(conversation_id, pending_entries[:])
+                pending_entries.clear()
+
+        def guarded(records):
+            try:
+                yield from records
+            except (JSONStreamError, UnicodeDecodeError) as e:
+                stream_errors.append(str(e))
+
+        try:
+            with self._open_json_stream(document) as stream:
+                records = iter_ndjson(stream) if document["format"] == "NDJSON" else iter_json_array(stream)
+                summary, anomalies = self.json_agent.process_stream(guarded(records), on_record=log_record, intent=intent)
+        except OSError as e:
+            summary, anomalies = {"records_total": 0}, []
+            stream_errors.append(f"Error reading JSON stream: {e}")
+        if pending_entries:
+            self.shared_memory.log_many(conversation_id, pending_entries)
+
+        print(f"ClassifierAgent: Streamed {summary['records_total']} {document['format']} records for ConvID {conversation_id}.")
+        final_log_payload["extracted_values"] = summary
+        final_log_payload["anomalies"] = anomalies
+        if stream_errors:
+            final_log_payload["error_message"] = f"JSON stream stopped after {summary['records_total']} records: {stream_errors[0]}"
+            anomalies = anomalies + [final_log_payload["error_message"]]
+            return "Failed_JSON_Stream_Parsing", summary, anomalies
+        return "Processed", summary, anomalies
+
+    def _route_document(self, document, intent):
+        conversation_id = document["conversation_id"]
+        raw_input_data = document["raw_input_data"]
+        input_is_path = document["input_is_path"]
+        doc_format = document["format"]
+        text_content_for_intent = document["text_content"]
+        format_error_message = document["format_error"]
+        initial_log_data = document["initial_log_data"]
 
         initial_log_data["determined_intent"] = intent
-        print(f"ClassifierAgent: Format={doc_format}, Intent={intent}, ConvID={self.conversation_id}")
-        self.shared_memory.log(self.conversation_id, initial_log_data) 
+        initial_log_data["timestamp"] = utc_timestamp()
+        print(f"ClassifierAgent: Format={doc_format}, Intent={intent}, ConvID={conversation_id}")
 
         agent_output = {}
         anomalies = []
@@ -284,6 +944,7 @@ class ClassifierAgent:
             "source_input_type": doc_format, 
             "intent": intent,
         }
+        log_entries = [initial_log_data, final_log_payload]
 
         if intent and ("Error_" in intent or intent in ["Unknown_EmptyInput", "Unknown_EmptyContent", "Error_MalformedResponse", "Error_PromptBlocked", "Error_ModelNotInitialized", "Error_ParsingResponse"]):
             status = f"Failed_{intent}"
@@ -292,8 +953,9 @@ class ClassifierAgent:
         
         elif doc_format == 'JSON':
             try:
-                json_data_for_agent = json.loads(text_content_for_intent)
-                agent_output, anomalies = self.json_agent.process(json_data_for_agent)
+                with self.metrics.span("json_agent", conversation_id):
+                    json_data_for_agent = json.loads(text_content_for_intent)
+                    agent_output, anomalies = self.json_agent.process(json_data_for_agent, intent=intent)
                 final_log_payload["extracted_values"] = agent_output
                 final_log_payload["anomalies"] = anomalies
             except json.JSONDecodeError as e:
@@ -306,9 +968,31 @@ class ClassifierAgent:
                 final_log_payload["error_message"] = f"Unexpected error in JSONAgent processing: {e}"
                 final_log_payload["extracted_values"] = {"raw_json_string_snippet": text_content_for_intent[:200]}
 
+        elif doc_format in JSON_STREAM_FORMATS:
+            # Per-record entries are written while streaming, so the initial entry goes out first.
+            self.shared_memory.log(conversation_id, initial_log_data)
+            log_entries = [final_log_payload]
+            with self.metrics.span("json_agent", conversation_id):
+                status, agent_output, anomalies = self._process_json_stream(document, intent, final_log_payload)
+
         elif doc_format == 'Email':
             try:
-                agent_output = self.email_agent.extract(text_content_for_intent)
+                with self.metrics.span("email_agent", conversation_id):
+                    if "email_message" in document:
+                        # Attachments are decoded once, by the fan-out below, rather than also for their sizes here.
+                        agent_output = self.email_agent.extract_message(document["email_message"], body=document["email_body"],
+                                                                        include_attachments=False)
+                        agent_output["attachments"] = []
+                    else:
+                        agent_output = self.email_agent.extract(text_content_for_intent)
+                if "email_message" in document and next(document["email_message"].iter_attachments(), None) is not None:
+                    with self.metrics.span("attachments", conversation_id):
+                        agent_output["attachments"] = self._process_attachments(document)
+                    anomalies = [
+                        f"Attachment {child['filename']}: {child['status']}"
+                        for child in agent_output["attachments"] if child["status"].startswith(("Failed", "Error"))
+                    ]
+                    final_log_payload["anomalies"] = anomalies
                 final_log_payload["extracted_values"] = agent_output
             except Exception as e:
                 status = "Failed_Email_Processing_Unexpected"
@@ -339,7 +1023,4 @@ class ClassifierAgent:
             final_log_payload["error_message"] = f"Cannot route, unknown or unhandled format: {doc_format}"
             final_log_payload["extracted_values"] = {"raw_content_snippet": text_content_for_intent[:200] if text_content_for_intent else "N/A"}
         
-        self.shared_memory.log(self.conversation_id, final_log_payload)
-        print(f"ClassifierAgent: Processing complete for ConvID {self.conversation_id}. Status: {status}")
-
-        return {"status": status, "format": doc_format, "intent": intent, "output": agent_output, "anomalies": anomalies, "conversation_id": self.conversation_id}
\ No newline at end of file
+        return log_entries, {"status": status, "format": doc_format, "intent": intent, "output": agent_output, "anomalies": anomalies, "conversation_id": conversation_id}
\ No newline at end of file
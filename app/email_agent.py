@@ -1,39 +1,101 @@
 import re
+import html
+from email import policy
+from email.parser import BytesFeedParser, Parser
+from email.utils import parseaddr
+
+EMAIL_READ_BYTES = 64 * 1024
+URGENCY_KEYWORDS = ['urgent', 'asap', 'immediately', 'important', 'critical']
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_HTML_DROP_RE = re.compile(r'<(script|style)\b.*?</\1>', re.IGNORECASE | re.DOTALL)
+_WHITESPACE_RUN_RE = re.compile(r'[ \t]+')
+
+
+def _html_to_text(markup):
+    text = _HTML_TAG_RE.sub(" ", _HTML_DROP_RE.sub(" ", markup))
+    return _WHITESPACE_RUN_RE.sub(" ", html.unescape(text)).strip()
+
 
 class EmailAgent:
-    def extract(self, email_text): 
-        sender_match = re.search(r'From:\s*(.*)', email_text, re.IGNORECASE)
-        subject_match = re.search(r'Subject:\s*(.*)', email_text, re.IGNORECASE)
-        
-        body_start_index = -1
-        lines = email_text.splitlines()
-        for i, line in enumerate(lines):
-            if line.strip() == "": 
-                if i + 1 < len(lines):
-                    body_start_index = i + 1
-                    break
-        if body_start_index == -1 and lines: 
-            for i, line in enumerate(lines):
-                if "subject:" in line.lower():
-                    if i + 1 < len(lines):
-                        body_start_index = i + 1
-                    break
-            if body_start_index == -1 : body_start_index = 0 
-
-        body = "\n".join(lines[body_start_index:]).strip() if body_start_index !=-1 else email_text
-
-        sender = sender_match.group(1).strip() if sender_match else None
-        subject = subject_match.group(1).strip() if subject_match else None
-
-        urgency_keywords = ['urgent', 'asap', 'immediately', 'important', 'critical']
-        
-        text_to_check_urgency = (subject if subject else "") + " " + (body[:500] if body else "")
-        urgency = any(word in text_to_check_urgency.lower() for word in urgency_keywords)
-
-        return {
-            "sender": sender,
-            "subject": subject,
-            "body": body, 
-            "urgency": urgency
+    def parse_file(self, file_path, read_bytes=EMAIL_READ_BYTES):
+        # The feed parser consumes the file in fixed-size chunks instead of one large read.
+        parser = BytesFeedParser(policy=policy.default)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(read_bytes), b""):
+                parser.feed(chunk)
+        return parser.close()
+
+    def parse_string(self, email_text):
+        return Parser(policy=policy.default).parsestr(email_text)
+
+    def parse_bytes(self, email_bytes):
+        parser = BytesFeedParser(policy=policy.default)
+        parser.feed(email_bytes)
+        return parser.close()
+
+    def get_body(self, message):
+        body_part = message.get_body(preferencelist=('plain', 'html'))
+        if body_part is None:
+            return ""
+        try:
+            content = body_part.get_content()
+        except (LookupError, ValueError):
+            # Unknown charset or broken transfer encoding: fall back to a lenient decode.
+            content = (body_part.get_payload(decode=True) or b"").decode("utf-8", errors="replace")
+        if not isinstance(content, str):
+            return ""
+        if body_part.get_content_subtype() == 'html':
+            return _html_to_text(content)
+        return content.strip()
+
+    def attachment_info(self, message):
+        # Filename, content type and decoded size of each attachment, from the same single decoding pass
+        # as iter_attachment_payloads; callers that also need the bytes should iterate that instead.
+        return [info for info, _ in self.iter_attachment_payloads(message)]
+
+    def iter_attachment_payloads(self, message):
+        # Yields (info, payload_bytes) one attachment at a time; only one decoded payload is alive at once.
+        for part in message.iter_attachments():
+            content_type = part.get_content_type()
+            if content_type == 'message/rfc822':
+                attached = part.get_payload(0) if part.is_multipart() else None
+                payload = attached.as_bytes() if attached is not None else part.get_payload(decode=True)
+            else:
+                payload = part.get_payload(decode=True)
+            if payload is None:
+                continue
+            yield {"filename": part.get_filename(), "content_type": content_type, "size": len(payload)}, payload
+
+    def intent_text(self, message, body=None):
+        body = self.get_body(message) if body is None else body
+        return f"Subject: {message.get('Subject', '')}\nFrom: {message.get('From', '')}\n\n{body}"
+
+    def extract_message(self, message, body=None, include_attachments=True):
+        # include_attachments=False leaves "attachments" out, for callers that decode the attachments
+        # themselves with iter_attachment_payloads.
+        # Headers are decoded once by the `default` policy (RFC 2047 encoded words included).
+        sender = message.get('From')
+        sender_address = parseaddr(str(sender))[1].lower() if sender is not None else ""
+        subject = message.get('Subject')
+        body = self.get_body(message) if body is None else body
+
+        text_to_check_urgency = (str(subject) if subject else "") + " " + (body[:500] if body else "")
+        urgency = any(word in text_to_check_urgency.lower() for word in URGENCY_KEYWORDS)
+
+        output = {
+            "sender": str(sender) if sender is not None else None,
+            "sender_address": sender_address or None,
+            "subject": str(subject) if subject is not None else None,
+            "to": str(message.get('To')) if message.get('To') is not None else None,
+            "date": str(message.get('Date')) if message.get('Date') is not None else None,
+            "message_id": str(message.get('Message-ID')).strip() if message.get('Message-ID') is not None else None,
+            "body": body,
+            "urgency": urgency,
         }
-        
+        if include_attachments:
+            output["attachments"] = self.attachment_info(message)
+        return output
+
+    def extract(self, email_text):
+        return self.extract_message(self.parse_string(email_text))
@@ -0,0 +1,106 @@
+import re
+import json
+import time
+import asyncio
+import threading
+
+# Offline stand-in for genai.GenerativeModel. Pass it to ClassifierAgent(model=...) to exercise
+# prompt building, response parsing and fallback paths without a Gemini key or network access.
+
+_SINGLE_DOCUMENT_RE = re.compile(r'Text to analyze:\s*---\n(.*)\n\s*---\s*\n\s*Respond now', re.DOTALL)
+_BATCH_DOCUMENT_RE = re.compile(r'=== Document (\d+) ===\n(.*?)\n=== End of Document \1 ===', re.DOTALL)
+
+_KEYWORD_INTENTS = [
+    ("Invoice", ("invoice", "amount due", "payment due", "bill to")),
+    ("RFQ", ("quotation", "quote", "rfq", "pricing")),
+    ("Complaint", ("complaint", "dissatisfied", "refund", "defective", "not working")),
+    ("Regulation", ("regulation", "compliance", "pursuant", "shall comply", "terms and conditions")),
+]
+
+
+def keyword_intent(text):
+    text_lower = text.lower()
+    for intent, keywords in _KEYWORD_INTENTS:
+        if any(keyword in text_lower for keyword in keywords):
+            return intent
+    return "Other"
+
+
+class ResourceExhausted(Exception):
+    # Mirrors google.api_core.exceptions.ResourceExhausted closely enough for retry classification.
+    code = 429
+
+
+class FakeClock:
+    def __init__(self, start=0.0):
+        self.now = start
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds):
+        self.sleep(seconds)
+        await asyncio.sleep(0)
+
+
+class FakePromptFeedback:
+    def __init__(self, block_reason=None, block_reason_message=None):
+        self.block_reason = block_reason
+        self.block_reason_message = block_reason_message
+
+
+class FakeResponse:
+    def __init__(self, text, block_reason=None):
+        self.text = text
+        self.prompt_feedback = FakePromptFeedback(block_reason) if block_reason else None
+
+
+class FakeGenerativeModel:
+    def __init__(self, responses=None, latency_seconds=0.0, model_name="fake-intent-model"):
+        self.model_name = model_name
+        self.latency_seconds = latency_seconds
+        self._responses = list(responses or [])
+        self._lock = threading.Lock()
+        self.prompts = []
+        self.call_count = 0
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.call_count += 1
+            self.prompts.append(prompt)
+            scripted = self._responses.pop(0) if self._responses else None
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self._respond(prompt, scripted)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        with self._lock:
+            self.call_count += 1
+            self.prompts.append(prompt)
+            scripted = self._responses.pop(0) if self._responses else None
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return self._respond(prompt, scripted)
+
+    def _respond(self, prompt, scripted):
+        if isinstance(scripted, BaseException):
+            raise scripted
+        if isinstance(scripted, FakeResponse):
+            return scripted
+        if scripted is not None:
+            return FakeResponse(scripted)
+
+        batch_documents = _BATCH_DOCUMENT_RE.findall(prompt)
+        if batch_documents:
+            return FakeResponse(json.dumps([
+                {"index": int(index), "intent": keyword_intent(text)} for index, text in batch_documents
+            ]))
+
+        match = _SINGLE_DOCUMENT_RE.search(prompt)
+        text = match.group(1) if match else prompt
+        return FakeResponse(json.dumps({"intent": keyword_intent(text)}))
@@ -0,0 +1,95 @@
+import re
+import random
+import threading
+
+FAST_PATH_TEXT_LIMIT = 8000
+
+# (intent, pattern, weight). Weights reflect how strongly a phrase implies the intent on its own:
+# a single "invoice no" should not be enough to skip the LLM, but "invoice no" plus "amount due" is.
+DEFAULT_INTENT_RULES = [
+    ("Invoice", r'\binvoice\s*(?:no\.?|number|#|id)\b', 3.0),
+    ("Invoice", r'\bamount\s+due\b', 3.0),
+    ("Invoice", r'\b(?:total\s+due|balance\s+due|payment\s+due)\b', 2.0),
+    ("Invoice", r'\bbill\s+to\b', 1.5),
+    ("Invoice", r'\binvoice\b', 1.0),
+    ("Invoice", r'"invoice_number"\s*:', 4.0),
+    ("RFQ", r'\brequest\s+for\s+(?:a\s+)?quot(?:e|ation)\b', 4.0),
+    ("RFQ", r'\brfq\b', 3.0),
+    ("RFQ", r'\b(?:quotation|quote)\s+for\b', 2.0),
+    ("RFQ", r'\bplease\s+(?:provide|send)\s+(?:us\s+)?(?:pricing|a\s+quote|your\s+best\s+price)\b', 2.0),
+    ("Complaint", r'\b(?:formal\s+)?complaint\b', 3.0),
+    ("Complaint", r'\b(?:dissatisfied|unacceptable|defective|faulty)\b', 1.5),
+    ("Complaint", r'\b(?:refund|replacement)\b', 1.0),
+    ("Regulation", r'\b(?:regulation|directive)\s+\(?(?:eu|ec)\)?\b', 4.0),
+    ("Regulation", r'\b(?:shall\s+comply|pursuant\s+to|hereinafter)\b', 2.0),
+    ("Regulation", r'\b(?:article|section)\s+\d+', 1.0),
+    ("Regulation", r'\bcompliance\b', 1.0),
+]
+
+
+class KeywordIntentClassifier:
+    def __init__(self, threshold=0.85, rules=None, smoothing=1.0, shadow_rate=0.0):
+        self.threshold = threshold
+        self.smoothing = smoothing
+        self.shadow_rate = shadow_rate
+        self._rules = [(intent, re.compile(pattern, re.IGNORECASE), weight)
+                       for intent, pattern, weight in (rules or DEFAULT_INTENT_RULES)]
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.documents_seen = 0
+        self.fast_path_hits = 0
+        self.deferred_to_llm = 0
+        self.compared_with_llm = 0
+        self.agreed_with_llm = 0
+        self.confident_compared = 0
+        self.confident_agreed = 0
+
+    def predict(self, text_content):
+        snippet = text_content[:FAST_PATH_TEXT_LIMIT]
+        scores = {}
+        for intent, pattern, weight in self._rules:
+            if pattern.search(snippet):
+                scores[intent] = scores.get(intent, 0.0) + weight
+        if not scores:
+            return None, 0.0
+        best_intent = max(scores, key=scores.get)
+        confidence = scores[best_intent] / (sum(scores.values()) + self.smoothing)
+        return best_intent, confidence
+
+    def decide(self, text_content):
+        guess, confidence = self.predict(text_content)
+        use_fast_path = guess is not None and confidence >= self.threshold
+        with self._lock:
+            self.documents_seen += 1
+            # A sampled share of confident documents still goes to the LLM so agreement stays measured.
+            if use_fast_path and self.shadow_rate and self._random.random() < self.shadow_rate:
+                use_fast_path = False
+            if use_fast_path:
+                self.fast_path_hits += 1
+            else:
+                self.deferred_to_llm += 1
+        return (guess if use_fast_path else None), guess, confidence
+
+    def record_llm_result(self, guess, confidence, llm_intent):
+        if guess is None or not llm_intent or llm_intent.startswith(("Error_", "Unknown_")):
+            return
+        agreed = guess == llm_intent
+        with self._lock:
+            self.compared_with_llm += 1
+            self.agreed_with_llm += int(agreed)
+            if confidence >= self.threshold:
+                self.confident_compared += 1
+                self.confident_agreed += int(agreed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents_seen": self.documents_seen,
+                "fast_path_hits": self.fast_path_hits,
+                "deferred_to_llm": self.deferred_to_llm,
+                "skip_rate": (self.fast_path_hits / self.documents_seen) if self.documents_seen else 0.0,
+                "compared_with_llm": self.compared_with_llm,
+                "agreement_rate": (self.agreed_with_llm / self.compared_with_llm) if self.compared_with_llm else None,
+                "confident_compared": self.confident_compared,
+                "confident_agreement_rate": (self.confident_agreed / self.confident_compared) if self.confident_compared else None,
+            }
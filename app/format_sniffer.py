@@ -0,0 +1,105 @@
+import re
+import json
+
+SNIFF_PREFIX_BYTES = 64 * 1024
+SNIFF_SUFFIX_BYTES = 4 * 1024
+PDF_MAGIC = b"%PDF-"
+# The PDF spec allows junk before the header; readers look for it within the first 1024 bytes.
+PDF_MAGIC_WINDOW = 1024
+
+_EMAIL_HEADER_RE = re.compile(r'^(from|subject|to|date|message-id|mime-version)[ \t]*:', re.IGNORECASE | re.MULTILINE)
+_HEADER_BLOCK_END_RE = re.compile(r'\r?\n[ \t]*\r?\n')
+_JSON_CLOSERS = {"{": "}", "[": "]"}
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+
+def _first_non_space(text):
+    for char in text:
+        if not char.isspace():
+            return char
+    return ""
+
+
+def _last_non_space(text):
+    for char in reversed(text):
+        if not char.isspace():
+            return char
+    return ""
+
+
+def _header_block(text):
+    match = _HEADER_BLOCK_END_RE.search(text)
+    return text[:match.start()] if match else text
+
+
+def _looks_like_ndjson(prefix):
+    lines = []
+    for line in prefix.splitlines():
+        line = line.strip()
+        if line:
+            lines.append(line)
+            if len(lines) == 2:
+                break
+    # A pretty-printed object opens with a bare "{" line; NDJSON opens with a complete one-line object.
+    return len(lines) == 2 and lines[0].startswith("{") and lines[0].endswith("}") and lines[1].startswith("{")
+
+
+def sniff_text(prefix, suffix=None, json_shapes=True):
+    suffix = prefix if suffix is None else suffix
+    first_char = _first_non_space(prefix)
+    if not first_char:
+        return "Empty"
+    # NDJSON is recognised by its first two lines; a malformed last record must not hide it.
+    if json_shapes and first_char == "{" and _looks_like_ndjson(prefix):
+        return "NDJSON"
+    if json_shapes and first_char in _JSON_CLOSERS and _last_non_space(suffix) == _JSON_CLOSERS[first_char]:
+        return "JSONArray" if first_char == "[" else "JSON"
+
+    header_names = {name.lower() for name in _EMAIL_HEADER_RE.findall(_header_block(prefix))}
+    if "from" in header_names and len(header_names) > 1:
+        return "Email"
+    return "Text"
+
+
+def read_file_sniff_window(file_path, prefix_bytes=SNIFF_PREFIX_BYTES, suffix_bytes=SNIFF_SUFFIX_BYTES):
+    with open(file_path, 'rb') as f:
+        prefix = f.read(prefix_bytes)
+        file_size = f.seek(0, 2)
+        if file_size <= len(prefix):
+            return prefix, prefix, file_size
+        f.seek(max(len(prefix), file_size - suffix_bytes))
+        return prefix, f.read(), file_size
+
+
+def sniff_file(file_path):
+    prefix, suffix, file_size = read_file_sniff_window(file_path)
+    if PDF_MAGIC in prefix[:PDF_MAGIC_WINDOW]:
+        return "PDF", "", file_size
+    # Bounded windows can split a multi-byte character, so decoding here is lenient; full reads stay strict.
+    prefix_text = prefix.decode("utf-8", errors="ignore").lstrip("\ufeff")
+    suffix_text = suffix.decode("utf-8", errors="ignore")
+    kind = sniff_text(prefix_text, suffix_text)
+    if file_path.lower().endswith(NDJSON_EXTENSIONS) and _first_non_space(prefix_text) == "{":
+        kind = "NDJSON"
+    return kind, prefix_text, file_size
+
+
+def _parses_as_json(content, kind):
+    try:
+        if kind == "NDJSON":
+            # Later lines may be malformed (they become invalid records); the first one must parse.
+            json.loads(next(line for line in content.splitlines() if line.strip()))
+        else:
+            json.loads(content)
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+def sniff_string(content, prefix_chars=SNIFF_PREFIX_BYTES, suffix_chars=SNIFF_SUFFIX_BYTES):
+    kind = sniff_text(content[:prefix_chars], content[-suffix_chars:])
+    # A raw string is already in memory, so a JSON shape is confirmed by parsing it; one that does not
+    # parse goes through the remaining checks and normally ends up as Text.
+    if kind in ("JSON", "JSONArray", "NDJSON") and not _parses_as_json(content, kind):
+        return sniff_text(content[:prefix_chars], content[-suffix_chars:], json_shapes=False)
+    return kind
@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import uuid
+import queue
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shared_memory import to_epoch_seconds
+
+DEFAULT_MAX_BODY_BYTES = 50 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
+DEFAULT_QUERY_LIMIT = 50
+MAX_QUERY_LIMIT = 1000
+QUERY_FILTERS = {"intent": "intent", "format": "doc_format", "status": "status", "sender": "sender", "anomaly": "anomaly"}
+_SAFE_SUFFIX_CHARS = set("abcdefghijklmnopqrstuvwxyz0123456789.")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class IncompleteUploadError(Exception):
+    pass
+
+
+def _upload_suffix(filename):
+    # Only the extension of the client's file name is kept; it helps format sniffing (.pdf, .ndjson, .eml).
+    extension = os.path.splitext(os.path.basename(filename or ""))[1].lower()
+    if len(extension) > 10 or not set(extension) <= _SAFE_SUFFIX_CHARS:
+        return ""
+    return extension
+
+
+class IngestionService:
+    def __init__(self, classifier_factory, shared_memory=None, workers=4, max_queue_size=100, max_results=10000,
+                 upload_dir=None, metrics=None, fast_path=None):
+        # One ClassifierAgent is built at start() and shared by every worker thread for the life of the service.
+        self.classifier_factory = classifier_factory
+        self.shared_memory = shared_memory
+        self.workers = max(1, workers)
+        self.max_queue_size = max(1, max_queue_size)
+        self.max_results = max_results
+        self.upload_dir = upload_dir or tempfile.gettempdir()
+        self.metrics = metrics
+        self.fast_path = fast_path
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._jobs = OrderedDict()
+        self._finished = deque()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._classifier = None
+        self._busy_workers = 0
+        self._started_at = time.time()
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.status_counts = {}
+
+    def start(self):
+        self._classifier = self.classifier_factory()
+        if self._classifier is None:
+            raise RuntimeError("IngestionService: The classifier factory did not return a ClassifierAgent.")
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"ingest-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"IngestionService: {self.workers} workers ready, queue capacity {self.max_queue_size}.")
+        return self
+
+    def stop(self, wait=True):
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+            if hasattr(self._classifier, "close"):
+                self._classifier.close()
+        self._threads = []
+
+    def is_full(self):
+        return self._queue.full()
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def submit(self, stream, length, filename=None):
+        # `stream` is a binary file object (e.g. the request body) from which exactly `length` bytes are read.
+        if self._queue.full():
+            self.reject()
+            raise QueueFullError(f"Queue is full ({self.max_queue_size} documents waiting).")
+
+        # Bodies are copied to disk in fixed-size chunks, so neither the upload nor the queued document
+        # sits in memory, and every format is sniffed exactly like a file given on the command line.
+        fd, upload_path = tempfile.mkstemp(prefix="ingest-", suffix=_upload_suffix(filename), dir=self.upload_dir)
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while size < length:
+                    chunk = stream.read(min(UPLOAD_CHUNK_BYTES, length - size))
+                    if not chunk:
+                        raise IncompleteUploadError(f"Request body ended after {size} of {length} bytes.")
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(upload_path)
+            raise
+
+        conversation_id = str(uuid.uuid4())
+        job = {
+            "conversation_id": conversation_id,
+            "state": "queued",
+            "filename": filename,
+            "size": size,
+            "submitted_at": time.time(),
+            "result": None,
+        }
+        with self._lock:
+            self._jobs[conversation_id] = job
+        try:
+            self._queue.put_nowait((job, upload_path))
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(conversation_id, None)
+                self.rejected += 1
+            os.remove(upload_path)
+            raise QueueFullError(f"Queue is full ({self.max_queue_size} documents waiting).")
+        with self._lock:
+            self.submitted += 1
+        return conversation_id
+
+    def get(self, conversation_id):
+        with self._lock:
+            job = self._jobs.get(conversation_id)
+            return dict(job) if job is not None else None
+
+    def history(self, conversation_id):
+        if self.shared_memory is None:
+            return None
+        return self.shared_memory.get_history(conversation_id)
+
+    def query(self, **filters):
+        if self.shared_memory is None:
+            return None
+        return self.shared_memory.query_documents(**filters)
+
+    def status(self):
+        with self._lock:
+            status = {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self.max_queue_size,
+                "workers": self.workers,
+                "busy_workers": self._busy_workers,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "status_counts": dict(self.status_counts),
+                "uptime_seconds": time.time() - self._started_at,
+            }
+        if self.fast_path is not None:
+            status["fast_path"] = self.fast_path.stats()
+        return status
+
+    def retry_after_seconds(self):
+        # A rough hint for 429 responses: the time the current backlog needs at the recent document rate.
+        average = None
+        if self.metrics is not None:
+            average = self.metrics.stage_summary().get("document", {}).get("mean")
+        backlog = self._queue.qsize() / self.workers
+        return max(1, int(round(backlog * (average or 1.0))))
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            job, upload_path = item
+            self._run_job(self._classifier, job, upload_path)
+
+    def _run_job(self, classifier, job, upload_path):
+        with self._lock:
+            job["state"] = "processing"
+            job["started_at"] = time.time()
+            self._busy_workers += 1
+        try:
+            result = classifier.process_input(
+                upload_path, input_is_path=True, conversation_id=job["conversation_id"],
+                log_context={"input_identifier": job["filename"] or "http_upload", "input_source_type": "http_upload"}
+            )
+        except Exception as e:
+            print(f"IngestionService: Unexpected error processing {job['conversation_id']}: {e}")
+            result = {"status": "Failed_ServiceWorkerError", "message": str(e), "format": None, "intent": None,
+                      "conversation_id": job["conversation_id"]}
+        finally:
+            try:
+                os.remove(upload_path)
+            except OSError:
+                pass
+        with self._lock:
+            job["state"] = "done"
+            job["finished_at"] = time.time()
+            job["result"] = result
+            self._busy_workers -= 1
+            self.completed += 1
+            self.status_counts[result["status"]] = self.status_counts.get(result["status"], 0) + 1
+            # Only the newest max_results finished jobs are kept in memory; older results stay in shared memory.
+            self._finished.append(job["conversation_id"])
+            while len(self._finished) > self.max_results:
+                self._jobs.pop(self._finished.popleft(), None)
+
+
+def start_ingestion_server(service, host="127.0.0.1", port=8080, max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+    class IngestionHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status_code, payload, headers=None):
+            body = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path != "/documents":
+                self._send_json(404, {"error": f"Unknown path {url.path}"})
+                return
+            length = self.headers.get("Content-Length")
+            if length is None:
+                self._send_json(411, {"error": "Content-Length is required."})
+                return
+            try:
+                length = int(length)
+            except ValueError:
+                length = -1
+            if length < 0:
+                self.close_connection = True
+                self._send_json(400, {"error": "Content-Length must be a non-negative integer."})
+                return
+            if length > max_body_bytes:
+                self.close_connection = True
+                self._send_json(413, {"error": f"Document exceeds {max_body_bytes} bytes."})
+                return
+            filename = parse_qs(url.query).get("filename", [self.headers.get("X-Filename")])[0]
+            if service.is_full():
+                # Rejected before the body is read; the connection is closed instead of draining it.
+                self.close_connection = True
+                service.reject()
+                self._send_json(429, {"error": "Queue is full, retry later."},
+                                {"Retry-After": str(service.retry_after_seconds())})
+                return
+            try:
+                conversation_id = service.submit(self.rfile, length, filename=filename)
+            except QueueFullError as e:
+                self._send_json(429, {"error": str(e)}, {"Retry-After": str(service.retry_after_seconds())})
+                return
+            except IncompleteUploadError as e:
+                self.close_connection = True
+                self._send_json(400, {"error": str(e)})
+                return
+            self._send_json(202, {"conversation_id": conversation_id, "state": "queued",
+                                  "result_url": f"/documents/{conversation_id}"},
+                            {"Location": f"/documents/{conversation_id}"})
+
+        def _query_documents(self, query_string):
+            params = {name: values[0] for name, values in parse_qs(query_string).items()}
+            filters = {argument: params[name] for name, argument in QUERY_FILTERS.items() if params.get(name)}
+            try:
+                filters["urgent"] = params.get("urgent", "").lower() in ("1", "true", "yes")
+                filters["offset"] = int(params.get("offset", 0))
+                filters["limit"] = max(0, min(int(params.get("limit", DEFAULT_QUERY_LIMIT)), MAX_QUERY_LIMIT))
+                filters["newest_first"] = params.get("order", "desc") != "asc"
+                for name in ("since", "until"):
+                    if params.get(name):
+                        filters[name] = to_epoch_seconds(params[name])
+            except ValueError as e:
+                self._send_json(400, {"error": f"Invalid query parameter: {e}"})
+                return
+            page = service.query(**filters)
+            if page is None:
+                self._send_json(503, {"error": "Shared memory is not available for queries."})
+            else:
+                self._send_json(200, page)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            path = url.path.rstrip("/")
+            if path == "/documents":
+                self._query_documents(url.query)
+                return
+            if path == "/status":
+                self._send_json(200, service.status())
+                return
+            if path == "/metrics" and service.metrics is not None:
+                body = service.metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            parts = path.split("/")
+            if len(parts) in (3, 4) and parts[1] == "documents" and (len(parts) == 3 or parts[3] == "history"):
+                conversation_id = parts[2]
+                if len(parts) == 4:
+                    history = service.history(conversation_id)
+                    if not history:
+                        self._send_json(404, {"error": f"No history for conversation {conversation_id}."})
+                    else:
+                        self._send_json(200, {"conversation_id": conversation_id, "history": history})
+                    return
+                job = service.get(conversation_id)
+                if job is None:
+                    self._send_json(404, {"error": f"Unknown conversation {conversation_id}."})
+                else:
+                    self._send_json(200, job)
+                return
+            self._send_json(404, {"error": f"Unknown path {path}"})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), IngestionHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ingestion-server", daemon=True).start()
+    print(f"IngestionService: Listening on http://{host}:{server.server_address[1]}")
+    return server
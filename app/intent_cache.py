@@ -0,0 +1,149 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+INTENT_CACHE_TEXT_LIMIT = 8000
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def make_intent_cache_key(text_content, prompt_version, model_name):
+    normalized = _WHITESPACE_RE.sub(" ", text_content[:INTENT_CACHE_TEXT_LIMIT]).strip()
+    digest = hashlib.sha256()
+    digest.update(f"{prompt_version}\x00{model_name}\x00".encode("utf-8"))
+    digest.update(normalized.encode("utf-8", errors="surrogatepass"))
+    return digest.hexdigest()
+
+
+class SQLiteIntentStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS intent_cache ("
+                "cache_key TEXT PRIMARY KEY, intent TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, cache_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT intent, expires_at FROM intent_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            if not row:
+                return None
+            if row[1] <= time.time():
+                self._conn.execute("DELETE FROM intent_cache WHERE cache_key = ?", (cache_key,))
+                self._conn.commit()
+                return None
+            return row[0]
+
+    def set(self, cache_key, intent, ttl_seconds):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO intent_cache (cache_key, intent, expires_at) VALUES (?, ?, ?)",
+                (cache_key, intent, time.time() + ttl_seconds)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM intent_cache")
+            self._conn.commit()
+
+
+class RedisIntentStore:
+    def __init__(self, redis_client, key_prefix="intent_cache:"):
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+
+    def get(self, cache_key):
+        return self.redis_client.get(self.key_prefix + cache_key)
+
+    def set(self, cache_key, intent, ttl_seconds):
+        self.redis_client.set(self.key_prefix + cache_key, intent, ex=max(1, int(ttl_seconds)))
+
+    def clear(self):
+        for key in self.redis_client.scan_iter(match=self.key_prefix + "*"):
+            self.redis_client.delete(key)
+
+
+class IntentCache:
+    def __init__(self, max_entries=10000, ttl_seconds=7 * 24 * 3600, persistent_store=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent_store = persistent_store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def get(self, cache_key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                intent, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(cache_key)
+                    self.memory_hits += 1
+                    return intent
+                del self._entries[cache_key]
+
+        if self.persistent_store is not None:
+            try:
+                intent = self.persistent_store.get(cache_key)
+            except Exception as e:
+                print(f"IntentCache: Error reading persistent cache tier: {e}")
+                intent = None
+            if intent:
+                self._remember(cache_key, intent, now)
+                with self._lock:
+                    self.persistent_hits += 1
+                return intent
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, cache_key, intent):
+        self._remember(cache_key, intent, time.time())
+        with self._lock:
+            self.stores += 1
+        if self.persistent_store is not None:
+            try:
+                self.persistent_store.set(cache_key, intent, self.ttl_seconds)
+            except Exception as e:
+                print(f"IntentCache: Error writing persistent cache tier: {e}")
+
+    def _remember(self, cache_key, intent, now):
+        with self._lock:
+            self._entries[cache_key] = (intent, now + self.ttl_seconds)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.persistent_store is not None:
+            self.persistent_store.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "entries": len(self._entries),
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+            }
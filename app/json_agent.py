@@ -1,19 +1,60 @@
+from schema_validator import compile_schema
+
+ANOMALY_SAMPLE_LIMIT = 100
+
+
 class JSONAgent:
-    def __init__(self, target_schema):
+    def __init__(self, target_schema, intent_schemas=None):
+        # Schemas are compiled once here (see schema_validator.py); an intent schema replaces
+        # target_schema for documents classified with that intent.
         self.target_schema = target_schema
+        self.intent_schemas = intent_schemas or {}
+        self._validator = compile_schema(target_schema)
+        self._intent_validators = {intent: compile_schema(schema) for intent, schema in self.intent_schemas.items()}
 
-    def process(self, json_payload):
-        anomalies = []
-        output = {}
+    def process(self, json_payload, intent=None):
+        return self._intent_validators.get(intent, self._validator).validate(json_payload)
+
+    def process_stream(self, records, on_record=None, anomaly_sample_limit=ANOMALY_SAMPLE_LIMIT, intent=None):
+        # `records` yields (index, record, error) tuples, e.g. from json_stream.iter_json_array or iter_ndjson.
+        # Only counters and the first `anomaly_sample_limit` anomalies are kept, so memory stays bounded
+        # however many records pass through; per-record results go to `on_record`.
+        summary = {
+            "records_total": 0,
+            "records_valid": 0,
+            "records_with_anomalies": 0,
+            "invalid_records": 0,
+            "anomaly_counts": {},
+        }
+        anomaly_samples = []
+        anomalies_total = 0
+
+        validator = self._intent_validators.get(intent, self._validator)
+        for index, record, error in records:
+            summary["records_total"] += 1
+            if error is None and not isinstance(record, dict):
+                error = f"Record is a {type(record).__name__}, expected an object"
+            if error is not None:
+                summary["invalid_records"] += 1
+                summary["anomaly_counts"]["Invalid record"] = summary["anomaly_counts"].get("Invalid record", 0) + 1
+                output, record_anomalies = {}, [error]
+            else:
+                output, record_anomalies = validator.validate(record)
+                for anomaly in record_anomalies:
+                    summary["anomaly_counts"][anomaly] = summary["anomaly_counts"].get(anomaly, 0) + 1
 
-        for field in self.target_schema:
-            if field not in json_payload:
-                anomalies.append(f"Missing field: {field}")
-                output[field] = None
+            if record_anomalies:
+                summary["records_with_anomalies"] += 1
+                anomalies_total += len(record_anomalies)
+                for anomaly in record_anomalies:
+                    if len(anomaly_samples) < anomaly_sample_limit:
+                        anomaly_samples.append(f"Record {index}: {anomaly}")
             else:
-                output[field] = json_payload[field]
+                summary["records_valid"] += 1
 
-        return output, anomalies
-    
-    
+            if on_record:
+                on_record(index, output, record_anomalies)
 
+        if anomalies_total > len(anomaly_samples):
+            anomaly_samples.append(f"... and {anomalies_total - len(anomaly_samples)} more record anomalies (see anomaly_counts).")
+        return summary, anomaly_samples
@@ -0,0 +1,122 @@
+import json
+
+STREAM_READ_CHARS = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+_NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+class JSONStreamError(Exception):
+    pass
+
+
+def _skip_whitespace(buffer, position):
+    while position < len(buffer) and buffer[position] in _WHITESPACE:
+        position += 1
+    return position
+
+
+def _is_truncated(buffer, record, end, error):
+    # True when the value at the buffer end may simply be cut short, so reading more input could complete
+    # it; a syntax error anywhere before the buffer end is reported at once instead of reading on.
+    if error is None:
+        if end >= len(buffer):
+            return True
+        # A number followed only by number characters (e.g. "1." of "1.5") may continue in the next chunk.
+        return (isinstance(record, (int, float)) and not isinstance(record, bool)
+                and all(char in _NUMBER_CHARS for char in buffer[end:]))
+    tail = buffer[error.pos:]
+    if not tail.strip(_WHITESPACE) or error.msg.startswith("Unterminated string"):
+        return True
+    # A nested number cut short leaves only number characters after the error position.
+    if all(char in _NUMBER_CHARS for char in tail):
+        return True
+    if error.msg == "Expecting value":
+        return any(literal.startswith(tail) for literal in _LITERALS)
+    return error.msg.startswith("Invalid \\uXXXX escape") and len(tail) <= 6
+
+
+def iter_json_array(text_stream, read_chars=STREAM_READ_CHARS):
+    # Yields (index, record, None) for each element of a top-level JSON array, holding at most one
+    # element plus one read window in memory. Raises JSONStreamError on malformed or truncated input.
+    buffer = text_stream.read(read_chars).lstrip("\ufeff").lstrip(_WHITESPACE)
+    while not buffer:
+        chunk = text_stream.read(read_chars)
+        if not chunk:
+            break
+        buffer = chunk.lstrip(_WHITESPACE)
+    position = 0
+    if not buffer or buffer[position] != "[":
+        raise JSONStreamError("Input is not a top-level JSON array.")
+    position += 1
+    index = 0
+    expect_separator = False
+    exhausted = False
+    next_read = read_chars
+
+    while True:
+        position = _skip_whitespace(buffer, position)
+        if position >= len(buffer):
+            if exhausted:
+                raise JSONStreamError(f"Unexpected end of input after record {index}.")
+            chunk = text_stream.read(read_chars)
+            exhausted = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        char = buffer[position]
+        if char == "]":
+            return
+        if expect_separator:
+            if char != ",":
+                raise JSONStreamError(f"Expected ',' or ']' after record {index - 1}, found {char!r}.")
+            position += 1
+            expect_separator = False
+            continue
+
+        try:
+            record, end = _decoder.raw_decode(buffer, position)
+            decode_error = None
+        except json.JSONDecodeError as e:
+            record, end = None, None
+            decode_error = e
+        if decode_error is not None and not _is_truncated(buffer, record, end, decode_error):
+            raise JSONStreamError(f"Invalid JSON in record {index}: {decode_error}")
+        # A value that ends at the buffer end may be cut short (e.g. a number), so it is only accepted
+        # once the following character is in the buffer.
+        if decode_error is not None or _is_truncated(buffer, record, end, None):
+            if exhausted:
+                raise JSONStreamError(f"Invalid JSON in record {index}: {decode_error or 'truncated input'}")
+            chunk = text_stream.read(next_read)
+            exhausted = not chunk
+            # Records larger than the window are read with a growing window to avoid re-parsing quadratically.
+            next_read = next_read * 2 if chunk else read_chars
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        next_read = read_chars
+        yield index, record, None
+        index += 1
+        position = end
+        expect_separator = True
+        if position > read_chars:
+            buffer = buffer[position:]
+            position = 0
+
+
+def iter_ndjson(text_stream):
+    # Yields (index, record, error) per non-blank line; a malformed line is reported and skipped.
+    index = 0
+    for line in text_stream:
+        line = line.strip().lstrip("\ufeff")
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield index, None, f"Invalid JSON: {e}"
+        index += 1
@@ -0,0 +1,195 @@
+import os
+import time
+import sqlite3
+import hashlib
+import mailbox
+import threading
+from email import policy
+from email.parser import BytesHeaderParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from shared_memory import utc_timestamp
+
+DUPLICATE_STATUS = "Skipped_DuplicateMessageID"
+
+
+def open_mailbox(source):
+    # A directory with cur/ and new/ is a Maildir; anything else is read as an mbox file.
+    if os.path.isdir(source):
+        if not (os.path.isdir(os.path.join(source, "cur")) and os.path.isdir(os.path.join(source, "new"))):
+            raise ValueError(f"Directory '{source}' is not a Maildir (expected cur/ and new/ subdirectories).")
+        return mailbox.Maildir(source, factory=None, create=False)
+    if os.path.isfile(source):
+        return mailbox.mbox(source, factory=None, create=False)
+    raise ValueError(f"Mailbox source '{source}' is neither an mbox file nor a Maildir directory.")
+
+
+def message_dedupe_key(message_bytes):
+    # Only the header block is parsed; messages without a Message-ID fall back to a content hash.
+    headers = BytesHeaderParser(policy=policy.default).parsebytes(message_bytes)
+    message_id = headers.get("Message-ID")
+    message_id = str(message_id).strip() if message_id is not None else ""
+    if message_id:
+        return message_id, message_id
+    return None, "sha256:" + hashlib.sha256(message_bytes).hexdigest()
+
+
+class ImportCheckpoint:
+    def __init__(self, db_path="mailbox_import.sqlite3"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS imported_messages ("
+                "source TEXT NOT NULL, source_key TEXT NOT NULL, dedupe_key TEXT NOT NULL, "
+                "conversation_id TEXT, status TEXT NOT NULL, imported_at TEXT NOT NULL, "
+                "PRIMARY KEY (source, source_key))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_imported_messages_dedupe ON imported_messages (dedupe_key)"
+            )
+            self._conn.commit()
+
+    def status_of(self, source, source_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM imported_messages WHERE source = ? AND source_key = ?", (source, source_key)
+            ).fetchone()
+        return row[0] if row else None
+
+    def find_duplicate(self, dedupe_key, source, source_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT conversation_id FROM imported_messages WHERE dedupe_key = ? AND status != ? "
+                "AND NOT (source = ? AND source_key = ?) LIMIT 1",
+                (dedupe_key, DUPLICATE_STATUS, source, source_key)
+            ).fetchone()
+        return row
+
+    def record(self, source, source_key, dedupe_key, conversation_id, status):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO imported_messages "
+                "(source, source_key, dedupe_key, conversation_id, status, imported_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (source, source_key, dedupe_key, conversation_id, status, utc_timestamp())
+            )
+            self._conn.commit()
+
+    def stats(self, source=None):
+        query = "SELECT status, COUNT(*) FROM imported_messages"
+        params = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            params = (source,)
+        with self._lock:
+            rows = self._conn.execute(query + " GROUP BY status", params).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MailboxImporter:
+    def __init__(self, classifier_factory, checkpoint, max_workers=4, retry_failed=False):
+        self.classifier_factory = classifier_factory
+        self.checkpoint = checkpoint
+        self.max_workers = max(1, max_workers)
+        self.retry_failed = retry_failed
+        self._classifier = None
+        self._classifier_lock = threading.Lock()
+
+    def _get_classifier(self):
+        # A single ClassifierAgent serves all worker threads.
+        with self._classifier_lock:
+            if self._classifier is None:
+                self._classifier = self.classifier_factory()
+            return self._classifier
+
+    def _should_skip(self, source, source_key):
+        status = self.checkpoint.status_of(source, source_key)
+        if status is None:
+            return False
+        if self.retry_failed and status != "Processed" and status != DUPLICATE_STATUS:
+            return False
+        return True
+
+    def _process_message(self, message_bytes, log_context):
+        # Decoded the way email.parser.BytesParser does it, so 8-bit bodies round-trip to their declared charset.
+        raw_message = message_bytes.decode("ascii", errors="surrogateescape")
+        try:
+            return self._get_classifier().process_input(raw_message, input_is_path=False, log_context=log_context)
+        except Exception as e:
+            print(f"MailboxImporter: Unexpected error processing message {log_context['mailbox_key']}: {e}")
+            return {"status": "Failed_ImportWorkerError", "message": str(e), "format": None, "intent": None, "conversation_id": None}
+
+    def run(self, source, on_result=None, limit=None):
+        source = os.path.abspath(source)
+        box = open_mailbox(source)
+        counters = {"messages_seen": 0, "already_imported": 0, "duplicates": 0, "imported": 0, "status_counts": {}}
+        in_flight_keys = {}
+        started = time.perf_counter()
+
+        def collect(future):
+            source_key, dedupe_key, message_id = pending.pop(future)
+            in_flight_keys.pop(dedupe_key, None)
+            result = future.result()
+            # Each finished message is checkpointed at once, so an interrupted import redoes at most the in-flight ones.
+            self.checkpoint.record(source, source_key, dedupe_key, result.get("conversation_id"), result["status"])
+            counters["imported"] += 1
+            self._finish(counters, result, source_key, message_id, on_result)
+
+        pending = {}
+        # Bounded submission: at most 2x workers messages are held in memory at once.
+        max_in_flight = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mailbox-worker") as pool:
+            try:
+                for source_key in box.iterkeys():
+                    source_key = str(source_key)
+                    if limit is not None and counters["messages_seen"] >= limit:
+                        break
+                    counters["messages_seen"] += 1
+                    if self._should_skip(source, source_key):
+                        counters["already_imported"] += 1
+                        continue
+
+                    message_bytes = box.get_bytes(source_key if isinstance(box, mailbox.Maildir) else int(source_key))
+                    message_id, dedupe_key = message_dedupe_key(message_bytes)
+                    duplicate = self.checkpoint.find_duplicate(dedupe_key, source, source_key)
+                    if duplicate is not None or dedupe_key in in_flight_keys:
+                        duplicate_of = duplicate[0] if duplicate is not None else None
+                        self.checkpoint.record(source, source_key, dedupe_key, duplicate_of, DUPLICATE_STATUS)
+                        counters["duplicates"] += 1
+                        result = {"status": DUPLICATE_STATUS, "format": "Email", "intent": None,
+                                  "conversation_id": None, "duplicate_of": duplicate_of}
+                        self._finish(counters, result, source_key, message_id, on_result)
+                        continue
+
+                    log_context = {"mailbox_source": source, "mailbox_key": source_key, "message_id": message_id}
+                    in_flight_keys[dedupe_key] = source_key
+                    pending[pool.submit(self._process_message, message_bytes, log_context)] = (source_key, dedupe_key, message_id)
+                    del message_bytes
+                    if len(pending) >= max_in_flight:
+                        collect(next(as_completed(pending)))
+                for future in as_completed(list(pending)):
+                    collect(future)
+            finally:
+                for future in pending:
+                    future.cancel()
+                box.close()
+
+        elapsed = time.perf_counter() - started
+        counters["elapsed_seconds"] = elapsed
+        counters["messages_per_second"] = counters["imported"] / elapsed if elapsed > 0 else 0.0
+        return counters
+
+    def _finish(self, counters, result, source_key, message_id, on_result):
+        result["mailbox_key"] = source_key
+        result["message_id"] = message_id
+        status = result.get("status")
+        counters["status_counts"][status] = counters["status_counts"].get(status, 0) + 1
+        if on_result:
+            on_result(result)
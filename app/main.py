@@ -1,39 +1,184 @@
 import os
+import time
 import argparse
 from dotenv import load_dotenv
 
-from shared_memory import SharedMemory
+from shared_memory import SharedMemory, BufferedSharedMemory
+from memory_backends import create_backend, MemoryBackendError
 from classifier_agent import ClassifierAgent
 from json_agent import JSONAgent
 from email_agent import EmailAgent
+from batch_runner import BatchRunner, collect_batch_inputs
+from mailbox_import import MailboxImporter, ImportCheckpoint
+from ingest_service import IngestionService, start_ingestion_server
+from intent_cache import IntentCache, SQLiteIntentStore, RedisIntentStore
+from fast_path import KeywordIntentClassifier
+from rate_limiter import GeminiRateLimiter, RetryPolicy, AIMDConcurrencyController, GeminiCallScheduler
+from metrics import PipelineMetrics, start_metrics_server
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-def run_system(input_data_source, is_file_path_param): 
-    if not GEMINI_API_KEY:
-        print("Error: GEMINI_API_KEY not found. Please set it in .env file.")
-        return
+DEFAULT_TARGET_SCHEMA = {
+    'invoice_number': {"required": True, "type": "string"},
+    'date': {"required": True, "format": "date"},
+    'amount': {"required": True, "format": "amount"},
+    'vendor': {"required": True, "type": "string"},
+    'customer_name': False, 'item_description': False, 'complaint_details': False,
+    'line_items.*.unit_price': {"required": False, "format": "amount"},
+}
+INTENT_SCHEMAS = {
+    "RFQ": {
+        'item_description': {"required": True, "type": "string"},
+        'quantity': {"required": False, "type": "number"},
+        'customer_name': {"required": False, "type": "string"},
+        'date': {"required": False, "format": "date"},
+    },
+    "Complaint": {
+        'customer_name': {"required": True, "type": "string"},
+        'complaint_details': {"required": True, "type": "string"},
+        'date': {"required": False, "format": "date"},
+        'invoice_number': {"required": False, "type": "string"},
+    },
+}
 
-    shared_memory = SharedMemory()
-    json_agent = JSONAgent(target_schema={
-        'invoice_number': True, 'date': True, 'amount': True, 'vendor': True,
-        'customer_name': False, 'item_description': False, 'complaint_details': False
-    })
+def build_agents(write_behind_options=None, memory_options=None):
+    memory_options = dict(memory_options or {"kind": "redis"})
+    fallback_to_memory = memory_options.pop("fallback_to_memory", False)
+    backend = create_backend(**memory_options)
+    if write_behind_options:
+        shared_memory = BufferedSharedMemory(backend=backend, fallback_to_memory=fallback_to_memory, **write_behind_options)
+    else:
+        shared_memory = SharedMemory(backend=backend, fallback_to_memory=fallback_to_memory)
+    json_agent = JSONAgent(target_schema=DEFAULT_TARGET_SCHEMA, intent_schemas=INTENT_SCHEMAS)
     email_agent = EmailAgent()
+    return shared_memory, json_agent, email_agent
+
+def build_intent_cache(mode, shared_memory, sqlite_path="intent_cache.sqlite3", ttl_seconds=7 * 24 * 3600, max_entries=10000):
+    if mode == "off":
+        return None
+    persistent_store = None
+    if mode == "sqlite":
+        persistent_store = SQLiteIntentStore(sqlite_path)
+    elif mode == "redis":
+        if shared_memory.redis_client:
+            persistent_store = RedisIntentStore(shared_memory.redis_client)
+        else:
+            print("SYSTEM: Redis not available, intent cache falls back to in-process memory only.")
+    return IntentCache(max_entries=max_entries, ttl_seconds=ttl_seconds, persistent_store=persistent_store)
+
+def build_fast_path(threshold=None, shadow_rate=0.0):
+    if threshold is None:
+        return None
+    return KeywordIntentClassifier(threshold=threshold, shadow_rate=shadow_rate)
 
+def print_fast_path_stats(fast_path):
+    stats = fast_path.stats()
+    print(f"  Fast path: {stats['fast_path_hits']}/{stats['documents_seen']} documents skipped the LLM ({stats['skip_rate']:.1%})")
+    if stats["agreement_rate"] is not None:
+        print(f"  Fast path agreement with Gemini: {stats['agreement_rate']:.1%} over {stats['compared_with_llm']} compared documents")
+    if stats["confident_agreement_rate"] is not None:
+        print(f"  Fast path agreement above threshold (shadowed): {stats['confident_agreement_rate']:.1%} over {stats['confident_compared']} documents")
+
+def build_call_scheduler(requests_per_minute=None, tokens_per_minute=None, max_attempts=5, max_concurrency=None):
+    rate_limiter = None
+    if requests_per_minute or tokens_per_minute:
+        rate_limiter = GeminiRateLimiter(requests_per_minute=requests_per_minute, tokens_per_minute=tokens_per_minute)
+    concurrency = None
+    if max_concurrency:
+        concurrency = AIMDConcurrencyController(initial_limit=max_concurrency, max_limit=max_concurrency)
+    return GeminiCallScheduler(rate_limiter=rate_limiter, retry_policy=RetryPolicy(max_attempts=max_attempts),
+                               concurrency=concurrency)
+
+def print_call_scheduler_stats(call_scheduler):
+    stats = call_scheduler.stats()
+    print(f"  Gemini calls: {stats['calls']} ({stats['retries']} retries, {stats['throttled']} throttled, {stats['failures']} failed)")
+    if "rate_limit_wait_seconds" in stats:
+        print(f"  Gemini rate limiter wait: {stats['rate_limit_wait_seconds']:.2f}s")
+    if "concurrency_limit" in stats:
+        print(f"  Gemini adaptive concurrency limit: {stats['concurrency_limit']}")
+
+def build_metrics(metrics_port=None, metrics_host="127.0.0.1"):
+    metrics = PipelineMetrics()
+    if metrics_port is not None:
+        start_metrics_server(metrics, host=metrics_host, port=metrics_port)
+    return metrics
+
+def print_stage_stats(metrics):
+    for stage, stats in sorted(metrics.stage_summary().items()):
+        print(f"  Stage {stage}: n={stats['count']}, mean={stats['mean'] * 1000:.1f} ms, "
+              f"p50={stats['p50'] * 1000:.1f} ms, p95={stats['p95'] * 1000:.1f} ms, max={stats['max'] * 1000:.1f} ms")
+
+def build_classifier(shared_memory, json_agent, email_agent, pdf_executor=None, intent_cache=None, fast_path=None,
+                     pdf_options=None, call_scheduler=None, metrics=None, format_debug=True):
     try:
-        classifier_orchestrator = ClassifierAgent(
+        return ClassifierAgent(
             gemini_api_key=GEMINI_API_KEY,
             json_agent=json_agent,
             email_agent=email_agent,
-            shared_memory=shared_memory
+            shared_memory=shared_memory,
+            pdf_executor=pdf_executor,
+            intent_cache=intent_cache,
+            fast_path=fast_path,
+            call_scheduler=call_scheduler,
+            metrics=metrics,
+            format_debug=format_debug,
+            **(pdf_options or {})
         )
     except ValueError as e:
         print(f"Error initializing ClassifierAgent: {e}")
-        return
     except Exception as e:
         print(f"Critical Error: Classifier Orchestrator could not be initialized: {e}")
+    return None
+
+def build_pipeline(intent_cache_options=None, fast_path_options=None, write_behind_options=None, memory_options=None,
+                   pdf_options=None, rate_limit_options=None, metrics_options=None):
+    # Agents, the shared memory backend, the caches, the Gemini scheduler and the metrics are built once and
+    # shared by every orchestrator the returned factory creates (one per worker thread in batch, mailbox
+    # and serve modes), so the RPM/TPM budget and the adaptive concurrency limit are global.
+    try:
+        shared_memory, json_agent, email_agent = build_agents(write_behind_options, memory_options)
+    except MemoryBackendError as e:
+        print(f"Error: {e} -- start the shared memory backend, choose another with --memory-backend, "
+              f"or pass --memory-fallback to continue with in-process memory.")
+        return None
+    intent_cache = build_intent_cache(shared_memory=shared_memory, **(intent_cache_options or {"mode": "memory"}))
+    fast_path = build_fast_path(**(fast_path_options or {}))
+    call_scheduler = build_call_scheduler(**(rate_limit_options or {}))
+    metrics_options = metrics_options or {}
+    metrics = build_metrics(metrics_options.get("port"), metrics_options.get("host", "127.0.0.1"))
+
+    def classifier_factory(pdf_executor=None):
+        return build_classifier(shared_memory, json_agent, email_agent, pdf_executor=pdf_executor,
+                                intent_cache=intent_cache, fast_path=fast_path, pdf_options=pdf_options,
+                                call_scheduler=call_scheduler, metrics=metrics,
+                                format_debug=metrics_options.get("format_debug", True))
+
+    return {
+        "shared_memory": shared_memory,
+        "intent_cache": intent_cache,
+        "fast_path": fast_path,
+        "call_scheduler": call_scheduler,
+        "metrics": metrics,
+        "classifier_factory": classifier_factory,
+    }
+
+def run_system(input_data_source, is_file_path_param, intent_cache_options=None, fast_path_options=None,
+               memory_options=None, pdf_options=None, rate_limit_options=None, metrics_options=None): 
+    if not GEMINI_API_KEY:
+        print("Error: GEMINI_API_KEY not found. Please set it in .env file.")
+        return
+
+    pipeline = build_pipeline(intent_cache_options=intent_cache_options or {"mode": "off"},
+                              fast_path_options=fast_path_options, memory_options=memory_options,
+                              pdf_options=pdf_options, rate_limit_options=rate_limit_options,
+                              metrics_options=metrics_options)
+    if pipeline is None:
+        return
+    metrics_options = metrics_options or {}
+    metrics = pipeline["metrics"]
+    classifier_orchestrator = pipeline["classifier_factory"]()
+    if classifier_orchestrator is None:
         return
 
     print(f"\nSYSTEM: Processing input: '{str(input_data_source)[:100]}...' (Path: {is_file_path_param})")
@@ -46,15 +191,292 @@ def run_system(input_data_source, is_file_path_param):
     print(f"  Conversation ID: {result.get('conversation_id')}")
     if result.get('anomalies'):
         print(f"  Anomalies: {result.get('anomalies')}")
-    print("\nTo view full logs, check Redis for conversation ID:", result.get('conversation_id'))
+    print_stage_stats(metrics)
+    if metrics_options.get("json_path"):
+        metrics.write_json(metrics_options["json_path"])
+        print(f"  Metrics written to {metrics_options['json_path']}")
+    print("\nTo view full logs, check shared memory for conversation ID:", result.get('conversation_id'))
     print("--- End of Processing for this input ---")
 
 
+def run_batch(batch_source, max_workers=8, pdf_processes=None, intent_cache_options=None, llm_batch_size=1,
+              fast_path_options=None, write_behind_options=None, memory_options=None, pdf_options=None,
+              rate_limit_options=None, metrics_options=None):
+    if not GEMINI_API_KEY:
+        print("Error: GEMINI_API_KEY not found. Please set it in .env file.")
+        return None
+
+    input_paths = collect_batch_inputs(batch_source)
+    if not input_paths:
+        print(f"SYSTEM: No documents found for batch source '{batch_source}'.")
+        return None
+
+    pipeline = build_pipeline(intent_cache_options, fast_path_options, write_behind_options, memory_options,
+                              pdf_options, rate_limit_options, metrics_options)
+    if pipeline is None:
+        return None
+    shared_memory, intent_cache, fast_path = pipeline["shared_memory"], pipeline["intent_cache"], pipeline["fast_path"]
+    call_scheduler, metrics = pipeline["call_scheduler"], pipeline["metrics"]
+    metrics_options = metrics_options or {}
+
+    def print_result(result):
+        print(f"BATCH RESULT: {result.get('input')} -> Status={result.get('status')}, "
+              f"Format={result.get('format')}, Intent={result.get('intent')}, "
+              f"ConvID={result.get('conversation_id')}, Time={result.get('elapsed_seconds', 0.0):.3f}s")
+
+    print(f"\nSYSTEM: Batch processing {len(input_paths)} documents with {max_workers} workers.")
+    runner = BatchRunner(pipeline["classifier_factory"], max_workers=max_workers, pdf_processes=pdf_processes,
+                         llm_batch_size=llm_batch_size)
+    results, summary = runner.run(input_paths, on_result=print_result)
+    if isinstance(shared_memory, BufferedSharedMemory):
+        shared_memory.close()
+
+    print("\n--- Batch Processing Summary ---")
+    print(f"  Documents: {summary['documents']}")
+    print(f"  Elapsed: {summary['elapsed_seconds']:.2f}s")
+    print(f"  Throughput: {summary['docs_per_second']:.2f} docs/sec")
+    for status, count in sorted(summary["status_counts"].items(), key=lambda item: str(item[0])):
+        print(f"  {status}: {count}")
+    if intent_cache:
+        cache_stats = intent_cache.stats()
+        print(f"  Intent cache: {cache_stats['memory_hits'] + cache_stats['persistent_hits']} hits, "
+              f"{cache_stats['misses']} misses (hit rate {cache_stats['hit_rate']:.1%})")
+    if fast_path:
+        print_fast_path_stats(fast_path)
+    print_call_scheduler_stats(call_scheduler)
+    print_stage_stats(metrics)
+    if isinstance(shared_memory, BufferedSharedMemory):
+        log_stats = shared_memory.stats()
+        print(f"  Write-behind log: {log_stats['flushed_entries']} entries in {log_stats['flush_count']} flushes "
+              f"(avg {log_stats['avg_flush_seconds'] * 1000:.1f} ms, max {log_stats['max_flush_seconds'] * 1000:.1f} ms), "
+              f"{log_stats['dropped_entries']} dropped")
+    if metrics_options.get("json_path"):
+        metrics.write_json(metrics_options["json_path"])
+        print(f"  Metrics written to {metrics_options['json_path']}")
+    print("--- End of Batch Processing ---")
+    return results, summary
+
+
+def run_mailbox_import(mailbox_source, max_workers=4, checkpoint_path="mailbox_import.sqlite3", retry_failed=False,
+                       limit=None, intent_cache_options=None, fast_path_options=None, write_behind_options=None,
+                       memory_options=None, pdf_options=None, rate_limit_options=None, metrics_options=None):
+    if not GEMINI_API_KEY:
+        print("Error: GEMINI_API_KEY not found. Please set it in .env file.")
+        return None
+
+    pipeline = build_pipeline(intent_cache_options, fast_path_options, write_behind_options, memory_options,
+                              pdf_options, rate_limit_options, metrics_options)
+    if pipeline is None:
+        return None
+    shared_memory, call_scheduler, metrics = pipeline["shared_memory"], pipeline["call_scheduler"], pipeline["metrics"]
+    metrics_options = metrics_options or {}
+
+    def print_result(result):
+        line = (f"IMPORT RESULT: {result.get('mailbox_key')} {result.get('message_id') or '(no Message-ID)'} -> "
+                f"Status={result.get('status')}, Intent={result.get('intent')}, ConvID={result.get('conversation_id')}")
+        if result.get("duplicate_of"):
+            line += f", DuplicateOf={result['duplicate_of']}"
+        print(line)
+
+    checkpoint = ImportCheckpoint(checkpoint_path)
+    importer = MailboxImporter(pipeline["classifier_factory"], checkpoint, max_workers=max_workers, retry_failed=retry_failed)
+    print(f"\nSYSTEM: Importing mailbox '{mailbox_source}' with {max_workers} workers (checkpoint: {checkpoint_path}).")
+    try:
+        summary = importer.run(mailbox_source, on_result=print_result, limit=limit)
+    except ValueError as e:
+        print(f"Error: {e}")
+        checkpoint.close()
+        return None
+    if isinstance(shared_memory, BufferedSharedMemory):
+        shared_memory.close()
+
+    print("\n--- Mailbox Import Summary ---")
+    print(f"  Messages seen: {summary['messages_seen']}")
+    print(f"  Imported this run: {summary['imported']}")
+    print(f"  Already imported (checkpoint): {summary['already_imported']}")
+    print(f"  Duplicate Message-IDs skipped: {summary['duplicates']}")
+    print(f"  Elapsed: {summary['elapsed_seconds']:.2f}s ({summary['messages_per_second']:.2f} messages/sec)")
+    for status, count in sorted(summary["status_counts"].items(), key=lambda item: str(item[0])):
+        print(f"  {status}: {count}")
+    if pipeline["fast_path"]:
+        print_fast_path_stats(pipeline["fast_path"])
+    print_call_scheduler_stats(call_scheduler)
+    print_stage_stats(metrics)
+    if metrics_options.get("json_path"):
+        metrics.write_json(metrics_options["json_path"])
+        print(f"  Metrics written to {metrics_options['json_path']}")
+    checkpoint.close()
+    print("--- End of Mailbox Import ---")
+    return summary
+
+
+def run_service(host="127.0.0.1", port=8080, workers=4, max_queue_size=100, write_behind_options=None,
+                memory_options=None, intent_cache_options=None, fast_path_options=None, pdf_options=None,
+                rate_limit_options=None, metrics_options=None):
+    if not GEMINI_API_KEY:
+        print("Error: GEMINI_API_KEY not found. Please set it in .env file.")
+        return
+
+    # Everything expensive (imports, the Redis pool, Gemini configuration, agents) is built once at startup.
+    pipeline = build_pipeline(intent_cache_options, fast_path_options, write_behind_options, memory_options,
+                              pdf_options, rate_limit_options, metrics_options)
+    if pipeline is None:
+        return
+    shared_memory, fast_path = pipeline["shared_memory"], pipeline["fast_path"]
+
+    service = IngestionService(pipeline["classifier_factory"], shared_memory=shared_memory, workers=workers,
+                               max_queue_size=max_queue_size, metrics=pipeline["metrics"], fast_path=fast_path).start()
+    server = start_ingestion_server(service, host=host, port=port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\nSYSTEM: Shutting down the ingestion service.")
+    finally:
+        server.shutdown()
+        service.stop()
+        if isinstance(shared_memory, BufferedSharedMemory):
+            shared_memory.close()
+        if fast_path:
+            print_fast_path_stats(fast_path)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Multi-Agent Document Processing System")
-    parser.add_argument("input_source",
-                        help="File path (e.g., 'sample_inputs/invoice.pdf') OR raw string content.")
+    parser.add_argument("input_source", nargs="?",
+                        help="File path (e.g., 'sample_inputs/invoice.pdf') OR raw string content. "
+                             "With --batch: a directory, glob pattern or newline-delimited manifest file.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Treat input_source as a batch of documents and process them with a worker pool.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run a resident HTTP ingestion service instead of processing input_source.")
+    parser.add_argument("--service-host", default="127.0.0.1",
+                        help="Address for the ingestion service (default: 127.0.0.1).")
+    parser.add_argument("--service-port", type=int, default=8080,
+                        help="Port for the ingestion service (default: 8080).")
+    parser.add_argument("--queue-size", type=int, default=100,
+                        help="With --serve, documents that may wait for a worker before requests get HTTP 429 (default: 100).")
+    parser.add_argument("--mailbox", action="store_true",
+                        help="Treat input_source as an mbox file or Maildir directory and import every message.")
+    parser.add_argument("--import-checkpoint", default="mailbox_import.sqlite3",
+                        help="SQLite file recording imported messages, used to resume and to skip duplicate Message-IDs (with --mailbox).")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="With --mailbox, process again messages whose previous import did not end as 'Processed'.")
+    parser.add_argument("--import-limit", type=int, default=None,
+                        help="With --mailbox, stop after this many messages (useful for trial runs).")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Number of worker threads for LLM-bound processing in batch and mailbox mode (default: 8).")
+    parser.add_argument("--pdf-processes", type=int, default=None,
+                        help="Number of processes for PDF text extraction in batch mode (default: CPU count, 0 disables).")
+    parser.add_argument("--llm-batch-size", type=int, default=1,
+                        help="In batch mode, classify up to this many documents per Gemini prompt (default: 1, one prompt per document).")
+    parser.add_argument("--intent-cache", choices=["off", "memory", "sqlite", "redis"], default=None,
+                        help="Intent classification cache tier (default: 'memory' in batch mode, 'off' otherwise).")
+    parser.add_argument("--intent-cache-path", default="intent_cache.sqlite3",
+                        help="SQLite file for the persistent intent cache tier (with --intent-cache sqlite).")
+    parser.add_argument("--intent-cache-ttl", type=int, default=7 * 24 * 3600,
+                        help="Time-to-live in seconds for cached intents (default: 7 days).")
+    parser.add_argument("--fast-path-threshold", type=float, default=None,
+                        help="Enable the local keyword pre-classifier and skip Gemini when its confidence is at least this value (e.g. 0.85).")
+    parser.add_argument("--fast-path-shadow-rate", type=float, default=0.0,
+                        help="Share of confident fast-path documents still sent to Gemini to measure agreement (default: 0).")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="Queue SharedMemory log entries and flush them from a background thread in pipelined batches (batch, serve and mailbox modes).")
+    parser.add_argument("--log-queue-size", type=int, default=10000,
+                        help="Maximum number of queued log writes in write-behind mode (default: 10000).")
+    parser.add_argument("--log-full-policy", choices=["block", "drop"], default="block",
+                        help="What to do when the write-behind queue is full: block the worker or drop the entry (default: block).")
+    parser.add_argument("--memory-backend", choices=["redis", "memory", "sqlite"], default="redis",
+                        help="Shared memory backend: pooled Redis (default), in-process memory, or a local SQLite file.")
+    parser.add_argument("--redis-host", default=os.getenv("REDIS_HOST", "localhost"),
+                        help="Redis host for the redis backend (default: $REDIS_HOST or localhost).")
+    parser.add_argument("--redis-port", type=int, default=int(os.getenv("REDIS_PORT", "6379")),
+                        help="Redis port for the redis backend (default: $REDIS_PORT or 6379).")
+    parser.add_argument("--memory-sqlite-path", default="shared_memory.sqlite3",
+                        help="SQLite file for the sqlite backend (default: shared_memory.sqlite3).")
+    parser.add_argument("--memory-fallback", action="store_true",
+                        help="If the shared memory backend cannot be reached at startup, warn and keep history in "
+                             "process memory instead of exiting.")
+    parser.add_argument("--retention-hours", type=float, default=None,
+                        help="Expire document histories and their query-index entries after this many hours "
+                             "(default: keep forever).")
+    parser.add_argument("--pdf-max-chars", type=int, default=8000,
+                        help="Stop PDF text extraction once this many characters are available for classification (0 extracts the whole document; default: 8000).")
+    parser.add_argument("--pdf-page-processes", type=int, default=None,
+                        help="Extract page ranges of large PDFs in parallel with this many processes (single-document mode only).")
+    parser.add_argument("--pdf-cache-dir", default=None,
+                        help="Enable the on-disk extracted PDF text cache in this directory "
+                             "(inspect or purge it with 'python app/pdf_text_cache.py stats|purge').")
+    parser.add_argument("--gemini-rpm", type=int, default=None,
+                        help="Client-side limit on Gemini requests per minute (default: unlimited).")
+    parser.add_argument("--gemini-tpm", type=int, default=None,
+                        help="Client-side limit on estimated Gemini tokens (prompt + output) per minute (default: unlimited).")
+    parser.add_argument("--gemini-max-attempts", type=int, default=5,
+                        help="Attempts per Gemini call on 429/5xx/deadline errors, with jittered exponential backoff (default: 5).")
+    parser.add_argument("--gemini-max-concurrency", type=int, default=None,
+                        help="Upper bound for in-flight Gemini calls; halved on throttling and grown back on success (default: unbounded).")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics (/metrics) and a JSON dump (/metrics.json) on this port while running.")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="Address for the metrics endpoint (default: 127.0.0.1).")
+    parser.add_argument("--metrics-json", default=None,
+                        help="Write stage timings, document counters and recent spans to this JSON file when done.")
+    parser.add_argument("--no-format-debug", action="store_true",
+                        help="Suppress the per-document DEBUG_DETERMINE_FORMAT output.")
     args = parser.parse_args()
+    if not args.serve and args.input_source is None:
+        parser.error("input_source is required unless --serve is given.")
+
+    pdf_options = {"pdf_max_chars": args.pdf_max_chars or None, "pdf_processes": args.pdf_page_processes,
+                   "pdf_cache_dir": args.pdf_cache_dir}
+    if args.memory_backend == "redis":
+        memory_options = {"kind": "redis", "host": args.redis_host, "port": args.redis_port}
+    elif args.memory_backend == "sqlite":
+        memory_options = {"kind": "sqlite", "db_path": args.memory_sqlite_path}
+    else:
+        memory_options = {"kind": "memory"}
+    if args.retention_hours:
+        memory_options["retention_seconds"] = int(args.retention_hours * 3600)
+    if args.memory_fallback:
+        memory_options["fallback_to_memory"] = True
+    write_behind_options = None
+    if args.write_behind:
+        write_behind_options = {"max_queue_size": args.log_queue_size, "full_queue_policy": args.log_full_policy}
+    rate_limit_options = {"requests_per_minute": args.gemini_rpm, "tokens_per_minute": args.gemini_tpm,
+                          "max_attempts": args.gemini_max_attempts, "max_concurrency": args.gemini_max_concurrency}
+    metrics_options = {"port": args.metrics_port, "host": args.metrics_host, "json_path": args.metrics_json,
+                       "format_debug": not args.no_format_debug}
+    fast_path_options = {"threshold": args.fast_path_threshold, "shadow_rate": args.fast_path_shadow_rate}
+    intent_cache_options = {
+        "mode": args.intent_cache or ("memory" if args.batch or args.mailbox or args.serve else "off"),
+        "sqlite_path": args.intent_cache_path,
+        "ttl_seconds": args.intent_cache_ttl,
+    }
+
+    if args.batch:
+        run_batch(args.input_source, max_workers=args.workers, pdf_processes=args.pdf_processes,
+                  intent_cache_options=intent_cache_options, llm_batch_size=args.llm_batch_size,
+                  fast_path_options=fast_path_options, write_behind_options=write_behind_options,
+                  memory_options=memory_options, pdf_options=pdf_options, rate_limit_options=rate_limit_options,
+                  metrics_options=metrics_options)
+        raise SystemExit(0)
+
+    if args.serve:
+        run_service(host=args.service_host, port=args.service_port, workers=args.workers,
+                    max_queue_size=args.queue_size, write_behind_options=write_behind_options,
+                    memory_options=memory_options, intent_cache_options=intent_cache_options,
+                    fast_path_options=fast_path_options, pdf_options=pdf_options,
+                    rate_limit_options=rate_limit_options, metrics_options=metrics_options)
+        raise SystemExit(0)
+
+    if args.mailbox:
+        run_mailbox_import(args.input_source, max_workers=args.workers, checkpoint_path=args.import_checkpoint,
+                           retry_failed=args.retry_failed, limit=args.import_limit,
+                           intent_cache_options=intent_cache_options, fast_path_options=fast_path_options,
+                           write_behind_options=write_behind_options, memory_options=memory_options,
+                           pdf_options=pdf_options, rate_limit_options=rate_limit_options,
+                           metrics_options=metrics_options)
+        raise SystemExit(0)
 
     raw_cli_argument = args.input_source
     
@@ -82,4 +504,7 @@ if __name__ == "__main__":
             print(f"SYSTEM: Input '{raw_cli_argument[:50]}...' treated as raw string content (does not appear to be a path or file not found).")
     
     print("\n--- Running System with CLI Argument ---")
-    run_system(processed_input_for_system, is_file_path_param=is_determined_to_be_a_file)
\ No newline at end of file
+    run_system(processed_input_for_system, is_file_path_param=is_determined_to_be_a_file,
+               intent_cache_options=intent_cache_options, fast_path_options=fast_path_options,
+               memory_options=memory_options, pdf_options=pdf_options, rate_limit_options=rate_limit_options,
+               metrics_options=metrics_options)
\ No newline at end of file
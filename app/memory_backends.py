@@ -0,0 +1,625 @@
+import json
+import time
+import heapq
+import uuid
+import sqlite3
+import asyncio
+import threading
+import weakref
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# redis-py is imported by _import_redis() the first time a Redis pool or backend is created, so the
+# memory and sqlite backends (and processes that never log) do not pay for it at startup.
+redis = None
+
+
+class MemoryBackendError(Exception):
+    pass
+
+
+def _encode_entries(entries):
+    return [json.dumps(entry) for entry in entries]
+
+
+def _decode_entries(key, raw_entries):
+    history = []
+    for raw_entry in raw_entries:
+        try:
+            history.append(json.loads(raw_entry))
+        except json.JSONDecodeError:
+            print(f"Warning: Could not decode history entry for key {key}.")
+            history.append({"error": "Failed to decode history entry", "raw_data": raw_entry})
+    return history
+
+
+# Every processed document also gets a small summary record (conversation_id, timestamp, format, intent,
+# status, sender, urgent, anomalies) that the backends index at write time, so history can be queried
+# by those fields and a time range without reading every conversation.
+INDEX_FIELDS = ("intent", "format", "status", "sender", "urgent")
+ANY_ANOMALY = "*"
+RETENTION_CHECK_SECONDS = 60
+
+
+def _index_score(record):
+    timestamp = datetime.fromisoformat(record["timestamp"])
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def _index_terms(record):
+    terms = [(field, str(record[field])) for field in INDEX_FIELDS if record.get(field)]
+    anomalies = record.get("anomalies") or []
+    terms.extend(("anomaly", anomaly) for anomaly in anomalies)
+    if anomalies:
+        terms.append(("anomaly", ANY_ANOMALY))
+    return terms
+
+
+def _page_bounds(start, count):
+    start = max(0, start)
+    end = None if count is None else start + max(0, count)
+    return start, end
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+DEFAULT_REDIS_RETRIES = 3
+
+
+def _import_redis():
+    global redis
+    if redis is None:
+        import redis as redis_module
+        import redis.asyncio
+        redis = redis_module
+    return redis
+
+
+def _retry_backoff():
+    from redis.backoff import ExponentialBackoff
+    return ExponentialBackoff(cap=2.0, base=0.05)
+
+
+async def _aclose_async_client(client):
+    # redis-py before 5.0.1 names the coroutine close(); an explicitly passed pool is not closed with the client.
+    close = getattr(client, "aclose", None) or client.close
+    await close()
+    await client.connection_pool.disconnect()
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_connection_pool(host='localhost', port=6379, db=0, max_connections=50, socket_timeout=5.0,
+                        socket_connect_timeout=2.0, retries=DEFAULT_REDIS_RETRIES):
+    # One pool per (host, port, db) per process: every SharedMemory, worker thread and
+    # intent-cache tier talking to the same Redis shares its connections.
+    _import_redis()
+    from redis.retry import Retry
+    pool_key = (host, port, db)
+    with _pools_lock:
+        pool = _pools.get(pool_key)
+        if pool is None:
+            pool = redis.ConnectionPool(
+                host=host, port=port, db=db, decode_responses=True,
+                max_connections=max_connections,
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_connect_timeout,
+                health_check_interval=30,
+                retry=Retry(_retry_backoff(), retries),
+                retry_on_error=[redis.exceptions.ConnectionError, redis.exceptions.TimeoutError],
+            )
+            _pools[pool_key] = pool
+        return pool
+
+
+class RedisBackend:
+    name = "redis"
+
+    # Entries are stored append-only, one JSON document per list element, under
+    # `conversation:<id>:entries`. Older deployments stored the whole history as a single
+    # JSON array string under `conversation:<id>`; those keys are still read (and can be
+    # migrated) but are never written anymore.
+    #
+    # Document summaries live under `document:<id>`; each indexed field has a sorted set
+    # `document_index:<field>:<value>` (plus `document_index:all`) scored by the document's epoch timestamp.
+    # With retention_seconds set, every written key gets that TTL and index members older than it are
+    # trimmed whenever their set is written to.
+    def __init__(self, host='localhost', port=6379, db=0, pool=None, retention_seconds=None, **pool_options):
+        _import_redis()
+        self.retention_seconds = int(retention_seconds) if retention_seconds else None
+        self.retries = pool_options.get("retries", DEFAULT_REDIS_RETRIES)
+        self.pool = pool or get_connection_pool(host=host, port=port, db=db, **pool_options)
+        self.client = redis.Redis(connection_pool=self.pool)
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+
+    def _async_client(self):
+        # redis.asyncio connections belong to the event loop that opened them, so keep one client per loop.
+        # Its pool gets the same timeouts, health checks and retry-with-backoff policy as the sync pool.
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                from redis.asyncio.retry import Retry as AsyncRetry
+                connection_kwargs = self.pool.connection_kwargs
+                async_pool = redis.asyncio.ConnectionPool(
+                    host=connection_kwargs.get("host", "localhost"),
+                    port=connection_kwargs.get("port", 6379),
+                    db=connection_kwargs.get("db", 0),
+                    decode_responses=True,
+                    max_connections=self.pool.max_connections,
+                    socket_timeout=connection_kwargs.get("socket_timeout"),
+                    socket_connect_timeout=connection_kwargs.get("socket_connect_timeout"),
+                    health_check_interval=connection_kwargs.get("health_check_interval", 0),
+                    retry=AsyncRetry(_retry_backoff(), self.retries),
+                    retry_on_error=connection_kwargs.get("retry_on_error"),
+                )
+                client = redis.asyncio.Redis(connection_pool=async_pool)
+                self._async_clients[loop] = client
+            return client
+
+    async def aclose(self):
+        # Closes the asyncio client of the running event loop; call it before that loop ends.
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.pop(loop, None)
+        if client is not None:
+            await _aclose_async_client(client)
+
+    def close(self):
+        # The sync pool is shared by the whole process (get_connection_pool) and stays open; only this
+        # backend's asyncio clients are closed, each on its own event loop.
+        with self._async_clients_lock:
+            clients = list(self._async_clients.items())
+            self._async_clients.clear()
+        for loop, client in clients:
+            if loop.is_closed():
+                continue
+            if not loop.is_running():
+                loop.run_until_complete(_aclose_async_client(client))
+            elif _running_loop() is loop:
+                loop.create_task(_aclose_async_client(client))
+            else:
+                asyncio.run_coroutine_threadsafe(_aclose_async_client(client), loop).result(timeout=5)
+
+    @staticmethod
+    def _entries_key(conversation_id):
+        return f"conversation:{conversation_id}:entries"
+
+    @staticmethod
+    def _legacy_key(conversation_id):
+        return f"conversation:{conversation_id}"
+
+    @staticmethod
+    def _document_key(conversation_id):
+        return f"document:{conversation_id}"
+
+    @staticmethod
+    def _index_key(field=None, value=None):
+        return "document_index:all" if field is None else f"document_index:{field}:{value}"
+
+    def _queue_writes(self, pipe, items, index_records):
+        for conversation_id, entries in items:
+            entries_key = self._entries_key(conversation_id)
+            pipe.rpush(entries_key, *_encode_entries(entries))
+            if self.retention_seconds:
+                pipe.expire(entries_key, self.retention_seconds)
+        if not index_records:
+            return
+        touched_keys = set()
+        for record in index_records:
+            conversation_id = record["conversation_id"]
+            score = _index_score(record)
+            pipe.set(self._document_key(conversation_id), json.dumps(record), ex=self.retention_seconds)
+            for key in [self._index_key()] + [self._index_key(field, value) for field, value in _index_terms(record)]:
+                pipe.zadd(key, {conversation_id: score})
+                touched_keys.add(key)
+        if self.retention_seconds:
+            cutoff = time.time() - self.retention_seconds
+            for key in touched_keys:
+                pipe.zremrangebyscore(key, "-inf", f"({cutoff}")
+                pipe.expire(key, self.retention_seconds)
+
+    def ping(self):
+        try:
+            return self.client.ping()
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Error connecting to Redis: {e}") from e
+
+    def append(self, items, index_records=None):
+        try:
+            if len(items) == 1 and not index_records and not self.retention_seconds:
+                conversation_id, entries = items[0]
+                self.client.rpush(self._entries_key(conversation_id), *_encode_entries(entries))
+                return
+            # Entries, summaries and index updates for the batch share one round trip.
+            pipe = self.client.pipeline(transaction=False)
+            self._queue_writes(pipe, items, index_records)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error during log operation: {e}") from e
+
+    async def aappend(self, items, index_records=None):
+        try:
+            pipe = self._async_client().pipeline(transaction=False)
+            self._queue_writes(pipe, items, index_records)
+            await pipe.execute()
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error during log operation: {e}") from e
+
+    def _decode_legacy(self, key, data_raw):
+        if not data_raw:
+            return []
+        try:
+            history = json.loads(data_raw)
+        except json.JSONDecodeError:
+            print(f"Warning: Could not decode legacy JSON history for key {key}.")
+            return [{"error": "Failed to decode history from Redis", "raw_data": data_raw}]
+        return history if isinstance(history, list) else [history]
+
+    def read(self, conversation_id, start=0, count=None):
+        entries_key = self._entries_key(conversation_id)
+        legacy_key = self._legacy_key(conversation_id)
+        start, end = _page_bounds(start, count)
+        try:
+            # Common case (no legacy key) is answered in a single round trip.
+            pipe = self.client.pipeline(transaction=False)
+            pipe.type(legacy_key)
+            pipe.get(legacy_key)
+            pipe.lrange(entries_key, start, -1 if end is None else end - 1)
+            legacy_type, legacy_raw, raw_entries = pipe.execute(raise_on_error=False)
+            if legacy_type != "string":
+                return _decode_entries(entries_key, raw_entries)
+
+            legacy_history = self._decode_legacy(legacy_key, legacy_raw)
+            history = legacy_history[start:end]
+            if end is not None and end <= len(legacy_history):
+                return history
+            list_start = max(0, start - len(legacy_history))
+            list_end = -1 if end is None else end - len(legacy_history) - 1
+            raw_entries = self.client.lrange(entries_key, list_start, list_end)
+            return history + _decode_entries(entries_key, raw_entries)
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error during get_history operation: {e}") from e
+
+    def length(self, conversation_id):
+        legacy_key = self._legacy_key(conversation_id)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.type(legacy_key)
+            pipe.get(legacy_key)
+            pipe.llen(self._entries_key(conversation_id))
+            legacy_type, legacy_raw, entries_length = pipe.execute(raise_on_error=False)
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error during get_history_length operation: {e}") from e
+        legacy_length = len(self._decode_legacy(legacy_key, legacy_raw)) if legacy_type == "string" else 0
+        return legacy_length + (entries_length or 0)
+
+    def migrate_legacy_history(self, conversation_id):
+        legacy_key = self._legacy_key(conversation_id)
+        entries_key = self._entries_key(conversation_id)
+
+        def _migrate(pipe):
+            if pipe.type(legacy_key) != "string":
+                return 0
+            legacy_history = self._decode_legacy(legacy_key, pipe.get(legacy_key))
+            pipe.multi()
+            if legacy_history:
+                # LPUSH prepends one element at a time, so push in reverse to keep the original order.
+                pipe.lpush(entries_key, *_encode_entries(reversed(legacy_history)))
+            pipe.delete(legacy_key)
+            return len(legacy_history)
+
+        try:
+            return self.client.transaction(_migrate, legacy_key, value_from_callable=True)
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error during legacy history migration for {conversation_id}: {e}") from e
+
+    def query(self, filters, min_score=None, max_score=None, offset=0, limit=50, newest_first=True):
+        keys = [self._index_key(field, value) for field, value in sorted(filters.items())] or [self._index_key()]
+        low = "-inf" if min_score is None else min_score
+        high = "+inf" if max_score is None else max_score
+        num = -1 if limit is None else limit
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            source_key = keys[0]
+            if len(keys) > 1:
+                # Several filters: intersect their sets into a short-lived key, then page through that.
+                source_key = f"document_index:query:{uuid.uuid4().hex}"
+                pipe.zinterstore(source_key, keys, aggregate="MAX")
+            pipe.zcount(source_key, low, high)
+            if newest_first:
+                pipe.zrevrangebyscore(source_key, high, low, start=offset, num=num)
+            else:
+                pipe.zrangebyscore(source_key, low, high, start=offset, num=num)
+            if len(keys) > 1:
+                pipe.delete(source_key)
+                total, conversation_ids = pipe.execute()[1:3]
+            else:
+                total, conversation_ids = pipe.execute()
+            raw_records = self.client.mget([self._document_key(c) for c in conversation_ids]) if conversation_ids else []
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error during document query: {e}") from e
+        # A summary can expire moments before its index members are trimmed; those members are skipped.
+        documents = _decode_entries("document_index", [raw for raw in raw_records if raw is not None])
+        return total, documents
+
+    def prune(self, before_score, chunk_size=500):
+        all_key = self._index_key()
+        removed = 0
+        try:
+            while True:
+                conversation_ids = self.client.zrangebyscore(all_key, "-inf", f"({before_score}", start=0, num=chunk_size)
+                if not conversation_ids:
+                    return removed
+                raw_records = self.client.mget([self._document_key(c) for c in conversation_ids])
+                pipe = self.client.pipeline(transaction=False)
+                for conversation_id, raw_record in zip(conversation_ids, raw_records):
+                    record = _decode_entries(conversation_id, [raw_record])[0] if raw_record else {}
+                    for field, value in _index_terms(record):
+                        pipe.zrem(self._index_key(field, value), conversation_id)
+                    pipe.zrem(all_key, conversation_id)
+                    pipe.delete(self._document_key(conversation_id), self._entries_key(conversation_id),
+                                self._legacy_key(conversation_id))
+                pipe.execute()
+                removed += len(conversation_ids)
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error while pruning document history: {e}") from e
+
+    def legacy_conversation_ids(self):
+        try:
+            for key in self.client.scan_iter(match="conversation:*", _type="STRING"):
+                conversation_id = key[len("conversation:"):]
+                if not conversation_id.endswith(":entries"):
+                    yield conversation_id
+        except redis.exceptions.RedisError as e:
+            raise MemoryBackendError(f"Redis error while scanning for legacy histories: {e}") from e
+
+
+class InMemoryBackend:
+    name = "memory"
+
+    def __init__(self, retention_seconds=None):
+        self.retention_seconds = retention_seconds
+        self._entries = defaultdict(list)
+        self._documents = {}
+        self._postings = defaultdict(set)
+        self._by_age = []
+        self._lock = threading.Lock()
+
+    def ping(self):
+        return True
+
+    def append(self, items, index_records=None):
+        encoded_items = [(conversation_id, _encode_entries(entries)) for conversation_id, entries in items]
+        encoded_records = [(record, _index_score(record), json.dumps(record)) for record in index_records or ()]
+        with self._lock:
+            for conversation_id, encoded_entries in encoded_items:
+                self._entries[conversation_id].extend(encoded_entries)
+            for record, score, raw_record in encoded_records:
+                conversation_id = record["conversation_id"]
+                self._drop_document(conversation_id)
+                terms = _index_terms(record)
+                self._documents[conversation_id] = (score, raw_record, terms)
+                for term in terms:
+                    self._postings[term].add(conversation_id)
+                heapq.heappush(self._by_age, (score, conversation_id))
+            if self.retention_seconds and encoded_records:
+                self._prune_locked(time.time() - self.retention_seconds)
+
+    def _drop_document(self, conversation_id):
+        document = self._documents.pop(conversation_id, None)
+        if document is None:
+            return
+        for term in document[2]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.discard(conversation_id)
+                if not postings:
+                    del self._postings[term]
+
+    def _prune_locked(self, before_score):
+        removed = 0
+        while self._by_age and self._by_age[0][0] < before_score:
+            score, conversation_id = heapq.heappop(self._by_age)
+            document = self._documents.get(conversation_id)
+            # Re-indexed documents leave their older heap entry behind; only the current one counts.
+            if document is None or document[0] != score:
+                continue
+            self._drop_document(conversation_id)
+            self._entries.pop(conversation_id, None)
+            removed += 1
+        return removed
+
+    def query(self, filters, min_score=None, max_score=None, offset=0, limit=50, newest_first=True):
+        with self._lock:
+            if filters:
+                postings = sorted((self._postings.get(term, set()) for term in filters.items()), key=len)
+                conversation_ids = postings[0].intersection(*postings[1:])
+            else:
+                conversation_ids = self._documents.keys()
+            matches = []
+            for conversation_id in conversation_ids:
+                score, raw_record, _ = self._documents[conversation_id]
+                if (min_score is None or score >= min_score) and (max_score is None or score <= max_score):
+                    matches.append((score, conversation_id, raw_record))
+        matches.sort(reverse=newest_first)
+        start, end = _page_bounds(offset, limit)
+        return len(matches), _decode_entries("document_index", [raw_record for _, _, raw_record in matches[start:end]])
+
+    def prune(self, before_score):
+        with self._lock:
+            return self._prune_locked(before_score)
+
+    def read(self, conversation_id, start=0, count=None):
+        start, end = _page_bounds(start, count)
+        with self._lock:
+            raw_entries = self._entries.get(conversation_id, [])[start:end]
+        return _decode_entries(conversation_id, raw_entries)
+
+    def length(self, conversation_id):
+        with self._lock:
+            return len(self._entries.get(conversation_id, []))
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, db_path="shared_memory.sqlite3", retention_seconds=None):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        try:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            with self._lock:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS conversation_entries ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, entry TEXT NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_conversation_entries_conversation "
+                    "ON conversation_entries (conversation_id, id)"
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS document_index ("
+                    "conversation_id TEXT PRIMARY KEY, indexed_at REAL NOT NULL, intent TEXT, format TEXT, "
+                    "status TEXT, sender TEXT, urgent TEXT, record TEXT NOT NULL)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_document_index_time ON document_index (indexed_at)")
+                for field in INDEX_FIELDS:
+                    self._conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_document_index_{field} ON document_index ({field}, indexed_at)"
+                    )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS document_anomalies ("
+                    "anomaly TEXT NOT NULL, conversation_id TEXT NOT NULL, PRIMARY KEY (anomaly, conversation_id))"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_document_anomalies_conversation ON document_anomalies (conversation_id)"
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            raise MemoryBackendError(f"Error opening SQLite shared memory at {db_path}: {e}") from e
+
+    def ping(self):
+        return True
+
+    def append(self, items, index_records=None):
+        rows = [(conversation_id, raw_entry)
+                for conversation_id, entries in items
+                for raw_entry in _encode_entries(entries)]
+        index_rows = []
+        anomaly_rows = []
+        for record in index_records or ():
+            index_rows.append((record["conversation_id"], _index_score(record))
+                              + tuple(str(record[field]) if record.get(field) else None for field in INDEX_FIELDS)
+                              + (json.dumps(record),))
+            anomaly_rows.extend((value, record["conversation_id"]) for field, value in _index_terms(record) if field == "anomaly")
+        try:
+            with self._lock:
+                self._conn.executemany("INSERT INTO conversation_entries (conversation_id, entry) VALUES (?, ?)", rows)
+                if index_rows:
+                    self._conn.executemany(
+                        "DELETE FROM document_anomalies WHERE conversation_id = ?", [(row[0],) for row in index_rows]
+                    )
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO document_index (conversation_id, indexed_at, intent, format, status, "
+                        "sender, urgent, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", index_rows
+                    )
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO document_anomalies (anomaly, conversation_id) VALUES (?, ?)", anomaly_rows
+                    )
+                    # Expired documents are deleted at most once per RETENTION_CHECK_SECONDS, not on every write.
+                    if self.retention_seconds and time.monotonic() - self._last_prune >= RETENTION_CHECK_SECONDS:
+                        self._last_prune = time.monotonic()
+                        self._prune_locked(time.time() - self.retention_seconds)
+                self._conn.commit()
+        except sqlite3.Error as e:
+            raise MemoryBackendError(f"SQLite error during log operation: {e}") from e
+
+    def _prune_locked(self, before_score):
+        expired = "SELECT conversation_id FROM document_index WHERE indexed_at < ?"
+        self._conn.execute(f"DELETE FROM conversation_entries WHERE conversation_id IN ({expired})", (before_score,))
+        self._conn.execute(f"DELETE FROM document_anomalies WHERE conversation_id IN ({expired})", (before_score,))
+        return self._conn.execute("DELETE FROM document_index WHERE indexed_at < ?", (before_score,)).rowcount
+
+    def query(self, filters, min_score=None, max_score=None, offset=0, limit=50, newest_first=True):
+        clauses = []
+        params = []
+        for field, value in sorted(filters.items()):
+            if field == "anomaly":
+                clauses.append("conversation_id IN (SELECT conversation_id FROM document_anomalies WHERE anomaly = ?)")
+            elif field in INDEX_FIELDS:
+                clauses.append(f"{field} = ?")
+            else:
+                raise MemoryBackendError(f"Unknown document index field '{field}'.")
+            params.append(value)
+        if min_score is not None:
+            clauses.append("indexed_at >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("indexed_at <= ?")
+            params.append(max_score)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        order = "DESC" if newest_first else "ASC"
+        try:
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) FROM document_index{where}", params).fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT record FROM document_index{where} ORDER BY indexed_at {order}, conversation_id {order} "
+                    "LIMIT ? OFFSET ?", params + [-1 if limit is None else limit, offset]
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise MemoryBackendError(f"SQLite error during document query: {e}") from e
+        return total, _decode_entries("document_index", [row[0] for row in rows])
+
+    def prune(self, before_score):
+        try:
+            with self._lock:
+                removed = self._prune_locked(before_score)
+                self._conn.commit()
+                return removed
+        except sqlite3.Error as e:
+            raise MemoryBackendError(f"SQLite error while pruning document history: {e}") from e
+
+    def read(self, conversation_id, start=0, count=None):
+        start, end = _page_bounds(start, count)
+        limit = -1 if end is None else end - start
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT entry FROM conversation_entries WHERE conversation_id = ? ORDER BY id LIMIT ? OFFSET ?",
+                    (conversation_id, limit, start)
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise MemoryBackendError(f"SQLite error during get_history operation: {e}") from e
+        return _decode_entries(conversation_id, [row[0] for row in rows])
+
+    def length(self, conversation_id):
+        try:
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT COUNT(*) FROM conversation_entries WHERE conversation_id = ?", (conversation_id,)
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            raise MemoryBackendError(f"SQLite error during get_history_length operation: {e}") from e
+
+
+def create_backend(kind="redis", **options):
+    if kind == "redis":
+        return RedisBackend(**options)
+    if kind == "memory":
+        return InMemoryBackend(**options)
+    if kind == "sqlite":
+        return SQLiteBackend(**options)
+    raise ValueError(f"Unknown shared memory backend '{kind}'. Expected 'redis', 'memory' or 'sqlite'.")
@@ -0,0 +1,177 @@
+import json
+import time
+import bisect
+import threading
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = "smart_doc"
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation, as histogram_quantile()
+        # does, with the bucket narrowed to the observed min/max.
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = max(self.buckets[index - 1] if index > 0 else 0.0, self.min)
+                upper = min(self.buckets[index] if index < len(self.buckets) else self.max, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class PipelineMetrics:
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS, recent_spans=1000):
+        self.buckets = tuple(buckets)
+        self._stages = {}
+        self._documents = defaultdict(int)
+        self._recent_spans = deque(maxlen=recent_spans)
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    @contextmanager
+    def span(self, stage, conversation_id=None, conversation_ids=None):
+        # `conversation_ids` lists every document covered by a span shared between documents (batched LLM calls).
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, conversation_id, conversation_ids)
+
+    def observe(self, stage, seconds, conversation_id=None, conversation_ids=None):
+        span = {"conversation_id": conversation_id, "stage": stage, "seconds": seconds}
+        if conversation_ids is not None:
+            span["conversation_ids"] = list(conversation_ids)
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self._recent_spans.append(span)
+
+    def count_document(self, doc_format, intent, status):
+        with self._lock:
+            self._documents[(str(doc_format), str(intent), str(status))] += 1
+
+    def stage_summary(self):
+        with self._lock:
+            return {stage: histogram.to_dict() for stage, histogram in self._stages.items()}
+
+    def to_dict(self, include_spans=True):
+        with self._lock:
+            stages = {stage: histogram.to_dict() for stage, histogram in self._stages.items()}
+            documents = dict(self._documents)
+            spans = list(self._recent_spans) if include_spans else []
+        by_label = {"format": defaultdict(int), "intent": defaultdict(int), "status": defaultdict(int)}
+        for (doc_format, intent, status), count in documents.items():
+            by_label["format"][doc_format] += count
+            by_label["intent"][intent] += count
+            by_label["status"][status] += count
+        data = {
+            "uptime_seconds": time.time() - self.started_at,
+            "documents_total": sum(documents.values()),
+            "documents_by_format": dict(by_label["format"]),
+            "documents_by_intent": dict(by_label["intent"]),
+            "documents_by_status": dict(by_label["status"]),
+            "stages": stages,
+        }
+        if include_spans:
+            data["recent_spans"] = spans
+        return data
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def to_prometheus(self):
+        with self._lock:
+            stages = {stage: (list(h.bucket_counts), h.count, h.sum) for stage, h in self._stages.items()}
+            documents = dict(self._documents)
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent in each pipeline stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+        ]
+        for stage, (bucket_counts, count, total) in sorted(stages.items()):
+            stage_label = f'stage="{_label_value(stage)}"'
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{{stage_label},le="{upper_bound}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{{stage_label},le="+Inf"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{{stage_label}}} {total}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{{stage_label}}} {count}')
+
+        lines.append(f"# HELP {METRIC_PREFIX}_documents_total Documents processed, by format, intent and status.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_documents_total counter")
+        for (doc_format, intent, status), count in sorted(documents.items()):
+            lines.append(
+                f'{METRIC_PREFIX}_documents_total{{format="{_label_value(doc_format)}",'
+                f'intent="{_label_value(intent)}",status="{_label_value(status)}"}} {count}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics, host="127.0.0.1", port=9464):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = metrics.to_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path == "/metrics.json":
+                body = json.dumps(metrics.to_dict()).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Metrics: Serving /metrics and /metrics.json on http://{host}:{server.server_address[1]}")
+    return server
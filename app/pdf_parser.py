@@ -1,24 +1,136 @@
-import pdfplumber
-import os 
+import os
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_text_from_pdf(file_path):
-    text = ""
+from pdf_text_cache import get_pdf_text_cache
+
+PARALLEL_MIN_PAGES = 40
+# Part of the extraction cache key: bump when page text output changes for the same file.
+PARSER_VERSION_SUFFIX = "/1"
+
+
+@lru_cache(maxsize=1)
+def parser_version():
+    # Read from package metadata so a cache hit never has to import pdfplumber.
+    from importlib import metadata
+    return f"pdfplumber-{metadata.version('pdfplumber')}{PARSER_VERSION_SUFFIX}"
+
+
+def _open_pdf(file_path):
+    # pdfplumber (and pdfminer under it) is imported only when a PDF is actually opened.
+    import pdfplumber
+    return pdfplumber.open(file_path)
+
+
+def _extract_page(page):
+    try:
+        return page.extract_text()
+    finally:
+        # Release the page's parsed layout objects; long documents otherwise keep every page cached.
+        page.close()
+
+
+def _extract_page_range(file_path, start, stop):
+    with _open_pdf(file_path) as pdf:
+        return [_extract_page(page) for page in pdf.pages[start:stop]]
+
+
+def count_pdf_pages(file_path):
+    with _open_pdf(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_pages(file_path, max_chars=None, start_page=0, stop_page=None):
+    extracted_chars = 0
+    with _open_pdf(file_path) as pdf:
+        for page in pdf.pages[start_page:stop_page]:
+            page_text = _extract_page(page)
+            if not page_text:
+                continue
+            yield page_text
+            extracted_chars += len(page_text) + 1
+            if max_chars is not None and extracted_chars >= max_chars:
+                return
+
+
+def iter_pdf_pages_parallel(file_path, processes=None, max_chars=None, pages_per_task=None, executor=None,
+                            page_count=None):
+    # Pass `page_count` when the caller has already opened the document to count its pages.
+    if page_count is None:
+        page_count = count_pdf_pages(file_path)
+    if page_count == 0:
+        return
+    workers = processes or os.cpu_count() or 1
+    pages_per_task = pages_per_task or max(1, -(-page_count // (workers * 4)))
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    # Ranges are submitted in a sliding window and consumed strictly in order, so pages are
+    # yielded in document order and an early stop does not extract the rest of the file.
+    window = max(1, workers * 2)
+    futures = []
+    next_range = 0
+    extracted_chars = 0
+    try:
+        while next_range < len(ranges) or futures:
+            while next_range < len(ranges) and len(futures) < window:
+                start, stop = ranges[next_range]
+                futures.append(executor.submit(_extract_page_range, file_path, start, stop))
+                next_range += 1
+            for page_text in futures.pop(0).result():
+                if not page_text:
+                    continue
+                yield page_text
+                extracted_chars += len(page_text) + 1
+                if max_chars is not None and extracted_chars >= max_chars:
+                    return
+    finally:
+        for future in futures:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _limit_pages(pages, max_chars):
+    if max_chars is None:
+        return pages
+    extracted_chars = 0
+    for index, page_text in enumerate(pages):
+        extracted_chars += len(page_text) + 1
+        if extracted_chars >= max_chars:
+            return pages[:index + 1]
+    return pages
+
+
+def extract_text_from_pdf(file_path, max_chars=None, processes=None, cache_dir=None):
     if not os.path.exists(file_path):
         print(f"PDF Parser: File not found at {file_path}")
         return None
 
     try:
-        with pdfplumber.open(file_path) as pdf:
-            if not pdf.pages:
-                print(f"PDF Parser: No pages found in PDF: {file_path}")
-                return "" 
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        cache = get_pdf_text_cache(cache_dir) if cache_dir else None
+        pages = None
+        if cache:
+            digest, pages = cache.get_pages(file_path, parser_version(), max_chars=max_chars)
+            if pages is not None:
+                pages = _limit_pages(pages, max_chars)
+
+        if pages is None:
+            page_count = count_pdf_pages(file_path) if processes and processes > 1 else 0
+            if page_count >= PARALLEL_MIN_PAGES:
+                pages = list(iter_pdf_pages_parallel(file_path, processes=processes, max_chars=max_chars,
+                                                     page_count=page_count))
+            else:
+                pages = list(iter_pdf_pages(file_path, max_chars=max_chars))
+            if cache:
+                extracted_chars = sum(len(page_text) + 1 for page_text in pages)
+                cache.put_pages(digest, parser_version(), pages, complete=max_chars is None or extracted_chars < max_chars)
+        text = "".join(page_text + "\n" for page_text in pages)
         if not text.strip():
             print(f"PDF Parser: No text extracted from PDF (pages might be images or empty): {file_path}")
         return text
-    except Exception as e: 
+    except Exception as e:
         print(f"PDF Parser: Error opening or parsing PDF {file_path}: {e}")
-        raise 
\ No newline at end of file
+        raise
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "smart_doc_sorter", "pdf_text")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PDFTextCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # files: quick (path, mtime, size) -> content hash lookup so unchanged files are not re-hashed.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, digest TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "digest TEXT NOT NULL, parser_version TEXT NOT NULL, pages BLOB NOT NULL, complete INTEGER NOT NULL, "
+                "chars INTEGER NOT NULL, stored_bytes INTEGER NOT NULL, last_access REAL NOT NULL, "
+                "PRIMARY KEY (digest, parser_version))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.commit()
+
+    def _bump(self, name, amount=1):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, amount, amount)
+        )
+
+    def _digest_for(self, file_path):
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, digest FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            return row[2]
+
+        digest = file_sha256(file_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, mtime_ns, size, digest) VALUES (?, ?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size, digest)
+            )
+            self._bump("hashes_computed")
+            self._conn.commit()
+        return digest
+
+    def get_pages(self, file_path, parser_version, max_chars=None):
+        digest = self._digest_for(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pages, complete, chars FROM entries WHERE digest = ? AND parser_version = ?",
+                (digest, parser_version)
+            ).fetchone()
+            # A partial entry (extraction stopped early) only serves callers that need no more text than it has.
+            if row and (row[1] or (max_chars is not None and row[2] >= max_chars)):
+                self._conn.execute(
+                    "UPDATE entries SET last_access = ? WHERE digest = ? AND parser_version = ?",
+                    (time.time(), digest, parser_version)
+                )
+                self._bump("hits")
+                self._conn.commit()
+                return digest, json.loads(zlib.decompress(row[0]).decode("utf-8"))
+            self._bump("misses")
+            self._conn.commit()
+        return digest, None
+
+    def put_pages(self, digest, parser_version, pages, complete):
+        blob = zlib.compress(json.dumps(pages).encode("utf-8"), 6)
+        chars = sum(len(page_text) + 1 for page_text in pages)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (digest, parser_version, pages, complete, chars, stored_bytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, parser_version, blob, int(complete), chars, len(blob), time.time())
+            )
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        total_bytes = self._conn.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM entries").fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+        evicted = 0
+        for digest, parser_version, stored_bytes in self._conn.execute(
+                "SELECT digest, parser_version, stored_bytes FROM entries ORDER BY last_access").fetchall():
+            if total_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE digest = ? AND parser_version = ?", (digest, parser_version))
+            total_bytes -= stored_bytes
+            evicted += 1
+        self._bump("evictions", evicted)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, stored_bytes, complete_entries = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0), COALESCE(SUM(complete), 0) FROM entries"
+            ).fetchone()
+            tracked_files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": entries,
+            "complete_entries": complete_entries,
+            "stored_bytes": stored_bytes,
+            "max_bytes": self.max_bytes,
+            "tracked_files": tracked_files,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": (hits / (hits + misses)) if (hits + misses) else 0.0,
+            "hashes_computed": counters.get("hashes_computed", 0),
+            "evictions": counters.get("evictions", 0),
+        }
+
+    def purge(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM files")
+            self._conn.execute("DELETE FROM counters")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_pdf_text_cache(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    # One cache handle per directory per process; PDF extraction worker processes open their own.
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = PDFTextCache(cache_dir, max_bytes=max_bytes)
+            _caches[cache_dir] = cache
+        return cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or purge the extracted PDF text cache")
+    parser.add_argument("command", choices=["stats", "purge"], help="'stats' prints cache statistics, 'purge' deletes every entry.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Cache directory (default: {DEFAULT_CACHE_DIR}).")
+    args = parser.parse_args()
+
+    cache = PDFTextCache(args.cache_dir)
+    if args.command == "purge":
+        cache.purge()
+        print(f"PDF text cache at '{args.cache_dir}' purged.")
+    else:
+        for name, value in cache.stats().items():
+            print(f"  {name}: {value}")
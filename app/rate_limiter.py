@@ -0,0 +1,237 @@
+import re
+import time
+import random
+import asyncio
+import threading
+
+THROTTLE_STATUS_CODES = {429}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLE_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests"}
+RETRYABLE_ERROR_NAMES = THROTTLE_ERROR_NAMES | {
+    "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "BadGateway", "GatewayTimeout",
+}
+# Fallback for errors without a usable type or status code. Bare "429" or "quota" substrings are not
+# enough: ids, byte counts and configuration errors ("invalid quota project") contain them too.
+_THROTTLE_MESSAGE_RE = re.compile(r"\b429\b|resource[ _]?(?:has been )?exhausted|rate[ _-]?limit", re.IGNORECASE)
+
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    code = code() if callable(code) else code
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttle_error(error):
+    if type(error).__name__ in THROTTLE_ERROR_NAMES or _status_code(error) in THROTTLE_STATUS_CODES:
+        return True
+    return _THROTTLE_MESSAGE_RE.search(str(error)) is not None
+
+
+def is_retryable_error(error):
+    if is_throttle_error(error):
+        return True
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES or _status_code(error) in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_second
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class GeminiRateLimiter:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic, sleep=time.sleep):
+        self.request_bucket = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _reserve(self, estimated_tokens):
+        with self._lock:
+            wait = 0.0
+            if self.request_bucket:
+                wait = max(wait, self.request_bucket.wait_time(1))
+            if self.token_bucket:
+                wait = max(wait, self.token_bucket.wait_time(estimated_tokens))
+            if wait > 0:
+                self.waited_seconds += wait
+                return wait
+            if self.request_bucket:
+                self.request_bucket.consume(1)
+            if self.token_bucket:
+                self.token_bucket.consume(estimated_tokens)
+            return 0.0
+
+    def acquire(self, estimated_tokens=0):
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            self.sleep(wait)
+
+    async def aacquire(self, estimated_tokens=0, async_sleep=asyncio.sleep):
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            await async_sleep(wait)
+
+
+class AIMDConcurrencyController:
+    def __init__(self, initial_limit=8, min_limit=1, max_limit=64, additive_increase=1.0, multiplicative_decrease=0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.throttle_events = 0
+        self._condition = threading.Condition()
+
+    def try_acquire(self):
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def aacquire(self, poll_seconds=0.01, async_sleep=asyncio.sleep):
+        while not self.try_acquire():
+            await async_sleep(poll_seconds)
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            if throttled:
+                self.throttle_events += 1
+                self.limit = max(self.min_limit, self.limit * self.multiplicative_decrease)
+            else:
+                # Additive increase of roughly one slot per window of successful calls.
+                self.limit = min(self.max_limit, self.limit + self.additive_increase / max(1.0, self.limit))
+            self._condition.notify_all()
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt):
+        # "Full jitter": a uniform delay up to the capped exponential backoff for this attempt.
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class GeminiCallScheduler:
+    def __init__(self, rate_limiter=None, retry_policy=None, concurrency=None, sleep=time.sleep, async_sleep=asyncio.sleep):
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.concurrency = concurrency
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def _record(self, field):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _should_retry(self, error, attempt):
+        throttled = is_throttle_error(error)
+        if throttled:
+            self._record("throttled")
+        if is_retryable_error(error) and attempt + 1 < self.retry_policy.max_attempts:
+            self._record("retries")
+            return throttled, True
+        self._record("failures")
+        return throttled, False
+
+    def call(self, func, estimated_tokens=0):
+        self._record("calls")
+        attempt = 0
+        while True:
+            if self.concurrency:
+                self.concurrency.acquire()
+            throttled = False
+            try:
+                if self.rate_limiter:
+                    self.rate_limiter.acquire(estimated_tokens)
+                return func()
+            except Exception as e:
+                throttled, retry = self._should_retry(e, attempt)
+                if not retry:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                print(f"GeminiCallScheduler: Retryable error ({type(e).__name__}: {e}); retry {attempt + 1} in {delay:.2f}s.")
+            finally:
+                if self.concurrency:
+                    self.concurrency.release(throttled=throttled)
+            self.sleep(delay)
+            attempt += 1
+
+    async def acall(self, coroutine_func, estimated_tokens=0):
+        self._record("calls")
+        attempt = 0
+        while True:
+            if self.concurrency:
+                await self.concurrency.aacquire(async_sleep=self.async_sleep)
+            throttled = False
+            try:
+                if self.rate_limiter:
+                    await self.rate_limiter.aacquire(estimated_tokens, async_sleep=self.async_sleep)
+                return await coroutine_func()
+            except Exception as e:
+                throttled, retry = self._should_retry(e, attempt)
+                if not retry:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                print(f"GeminiCallScheduler: Retryable error ({type(e).__name__}: {e}); retry {attempt + 1} in {delay:.2f}s.")
+            finally:
+                if self.concurrency:
+                    self.concurrency.release(throttled=throttled)
+            await self.async_sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {"calls": self.calls, "retries": self.retries, "throttled": self.throttled, "failures": self.failures}
+        if self.concurrency:
+            stats["concurrency_limit"] = int(self.concurrency.limit)
+        if self.rate_limiter:
+            stats["rate_limit_wait_seconds"] = self.rate_limiter.waited_seconds
+        return stats
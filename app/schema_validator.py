@@ -0,0 +1,251 @@
+import re
+import math
+from datetime import date
+
+# JSONAgent schemas map a field path to either a bool (required / optional) or a rule dict:
+#   {"invoice_number": True,
+#    "amount": {"required": True, "type": "number", "format": "amount"},
+#    "vendor.address.country": {"required": False, "type": "string"},
+#    "line_items.*.unit_price": {"required": True, "format": "amount"}}
+# Paths are dotted; a "*" segment matches every element of a list. A missing field and an explicit null
+# are treated alike. compile_schema() turns the schema into a flat tuple of check closures once, so
+# validating a record never re-reads the schema.
+
+_MISSING = object()
+
+TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+}
+_TYPE_CLASSES = {"string": str, "number": (int, float), "integer": int, "boolean": bool, "object": dict, "array": list}
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}(?:[T ][\d:.]+(?:Z|[+-]\d{2}:?\d{2})?)?$')
+_AMOUNT_RE = re.compile(r'^[-+]?[$€£]?\s?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?$')
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+def _is_date(value):
+    if not isinstance(value, str) or not _DATE_RE.match(value):
+        return False
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return True
+
+
+def _is_amount(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return math.isfinite(value)
+    return isinstance(value, str) and bool(_AMOUNT_RE.match(value.strip()))
+
+
+def _is_email(value):
+    return isinstance(value, str) and bool(_EMAIL_RE.match(value))
+
+
+FORMAT_CHECKS = {
+    "date": _is_date,
+    "amount": _is_amount,
+    "email": _is_email,
+}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _normalize_rule(path, rule):
+    if isinstance(rule, bool):
+        return {"required": rule, "type": None, "format": None}
+    if not isinstance(rule, dict):
+        raise SchemaError(f"Rule for '{path}' must be a bool or a dict, got {type(rule).__name__}.")
+    unknown_keys = set(rule) - {"required", "type", "format"}
+    if unknown_keys:
+        raise SchemaError(f"Unknown rule keys for '{path}': {sorted(unknown_keys)}.")
+    if rule.get("type") is not None and rule["type"] not in TYPE_CHECKS:
+        raise SchemaError(f"Unknown type '{rule['type']}' for '{path}'. Expected one of {sorted(TYPE_CHECKS)}.")
+    if rule.get("format") is not None and rule["format"] not in FORMAT_CHECKS:
+        raise SchemaError(f"Unknown format '{rule['format']}' for '{path}'. Expected one of {sorted(FORMAT_CHECKS)}.")
+    return {"required": bool(rule.get("required", False)), "type": rule.get("type"), "format": rule.get("format")}
+
+
+def _compile_getter(keys):
+    if len(keys) == 1:
+        key = keys[0]
+
+        def get_one(value):
+            return value.get(key, _MISSING) if isinstance(value, dict) else _MISSING
+        return get_one
+
+    def get_nested(value):
+        for key in keys:
+            if not isinstance(value, dict):
+                return _MISSING
+            value = value.get(key, _MISSING)
+            if value is _MISSING:
+                return _MISSING
+        return value
+    return get_nested
+
+
+def _compile_value_check(rule):
+    type_check = TYPE_CHECKS.get(rule["type"])
+    format_check = FORMAT_CHECKS.get(rule["format"])
+    if type_check and format_check:
+        return lambda value: "type" if not type_check(value) else ("format" if not format_check(value) else None)
+    if type_check:
+        return lambda value: None if type_check(value) else "type"
+    if format_check:
+        return lambda value: None if format_check(value) else "format"
+    return None
+
+
+def _compile_presence_run(fields):
+    # Consecutive top-level fields without type/format rules share one closure and one loop.
+    fields = tuple(fields)
+
+    def check_presence_run(payload, output, anomalies):
+        get = payload.get
+        for key, required, missing_message in fields:
+            value = get(key)
+            output[key] = value
+            if value is None and required:
+                anomalies.append(missing_message)
+    return check_presence_run
+
+
+def _compile_rule(path, rule):
+    segments = path.split(".")
+    if not all(segments):
+        raise SchemaError(f"Invalid field path '{path}'.")
+    if segments.count("*") > 1:
+        raise SchemaError(f"Field path '{path}' may contain at most one '*' segment.")
+
+    required = rule["required"]
+    value_check = _compile_value_check(rule)
+    messages = {
+        "missing": f"Missing field: {path}",
+        "type": f"Invalid type for field {path}: expected {rule['type']}",
+        "format": f"Invalid format for field {path}: expected {rule['format']}",
+    }
+    missing_message = messages["missing"]
+
+    if len(segments) == 1 and segments[0] != "*":
+        key = path
+        expected_type = _TYPE_CLASSES.get(rule["type"])
+        # bool is a subclass of int, but true/false is never a valid number.
+        reject_bool = rule["type"] in ("number", "integer")
+        format_check = FORMAT_CHECKS.get(rule["format"])
+        type_message = messages["type"]
+        format_message = messages["format"]
+
+        # Top-level typed fields are the common case, so the lookup and type check are inlined.
+        def check_top_level(payload, output, anomalies):
+            value = payload.get(key)
+            output[key] = value
+            if value is None:
+                if required:
+                    anomalies.append(missing_message)
+            elif expected_type is not None and (not isinstance(value, expected_type) or (reject_bool and (value is True or value is False))):
+                anomalies.append(type_message)
+            elif format_check is not None and not format_check(value):
+                anomalies.append(format_message)
+        return check_top_level
+
+    if "*" not in segments:
+        get_value = _compile_getter(segments)
+        if value_check is None:
+            def check_presence(payload, output, anomalies):
+                value = get_value(payload)
+                if value is _MISSING or value is None:
+                    output[path] = None
+                    if required:
+                        anomalies.append(missing_message)
+                else:
+                    output[path] = value
+            return check_presence
+
+        def check_value(payload, output, anomalies):
+            value = get_value(payload)
+            if value is _MISSING or value is None:
+                output[path] = None
+                if required:
+                    anomalies.append(missing_message)
+                return
+            output[path] = value
+            problem = value_check(value)
+            if problem:
+                anomalies.append(messages[problem])
+        return check_value
+
+    star = segments.index("*")
+    get_list = _compile_getter(segments[:star]) if star else (lambda value: value)
+    get_item = _compile_getter(segments[star + 1:]) if star + 1 < len(segments) else (lambda value: value)
+
+    def check_each(payload, output, anomalies):
+        items = get_list(payload)
+        if not isinstance(items, list):
+            output[path] = None
+            if required:
+                anomalies.append(missing_message)
+            return
+        values = []
+        problems = set()
+        for item in items:
+            value = get_item(item)
+            if value is _MISSING or value is None:
+                values.append(None)
+                if required:
+                    problems.add("missing")
+                continue
+            values.append(value)
+            if value_check:
+                problem = value_check(value)
+                if problem:
+                    problems.add(problem)
+        output[path] = values
+        # One anomaly per problem kind and field, however many list elements share it.
+        for problem in ("missing", "type", "format"):
+            if problem in problems:
+                anomalies.append(messages[problem])
+    return check_each
+
+
+class CompiledSchema:
+    def __init__(self, schema):
+        self.fields = tuple(schema)
+        checks = []
+        presence_run = []
+        for path, rule in schema.items():
+            rule = _normalize_rule(path, rule)
+            if "." not in path and path not in ("", "*") and rule["type"] is None and rule["format"] is None:
+                presence_run.append((path, rule["required"], f"Missing field: {path}"))
+                continue
+            if presence_run:
+                checks.append(_compile_presence_run(presence_run))
+                presence_run = []
+            checks.append(_compile_rule(path, rule))
+        if presence_run:
+            checks.append(_compile_presence_run(presence_run))
+        self._checks = tuple(checks)
+
+    def validate(self, payload):
+        output = {}
+        anomalies = []
+        if not isinstance(payload, dict):
+            anomalies.append(f"Payload is a {type(payload).__name__}, expected an object")
+            return {field: None for field in self.fields}, anomalies
+        for check in self._checks:
+            check(payload, output, anomalies)
+        return output, anomalies
+
+
+def compile_schema(schema):
+    return CompiledSchema(schema)
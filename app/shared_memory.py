@@ -1,56 +1,353 @@
-import redis
-import json
-from datetime import datetime, timezone 
+import time
+import queue
+import asyncio
+import atexit
+import threading
+from datetime import datetime, timezone
+from email.utils import parseaddr
+
+from memory_backends import RedisBackend, InMemoryBackend, MemoryBackendError
+
+
+def utc_timestamp():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def to_epoch_seconds(value):
+    # Query bounds may be datetimes, epoch seconds or ISO-8601 strings; naive times are taken as UTC.
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def normalize_sender(sender):
+    return (parseaddr(sender)[1] or sender).strip().lower() if sender else None
+
 
 class SharedMemory:
-    def __init__(self, host='localhost', port=6379):
-        try:
-            self.redis_client = redis.Redis(host=host, port=port, db=0, decode_responses=True)
-            self.redis_client.ping()
-            print("Successfully connected to Redis.")
-        except redis.exceptions.ConnectionError as e:
-            print(f"Error connecting to Redis: {e}. SharedMemory will not function.")
-            self.redis_client = None 
-        
+    def __init__(self, host='localhost', port=6379, backend=None, fallback_to_memory=False):
+        # An unreachable backend raises MemoryBackendError instead of silently disabling logging, unless
+        # `fallback_to_memory` asks for an in-process InMemoryBackend in its place.
+        self.backend = backend if backend is not None else RedisBackend(host=host, port=port)
+        try:
+            self.backend.ping()
+        except MemoryBackendError as e:
+            if not fallback_to_memory:
+                raise
+            print(f"SharedMemory: WARNING: {e} -- falling back to the in-process memory backend. "
+                  f"History will not be shared with other processes and is lost when this one exits.")
+            self.backend = InMemoryBackend(retention_seconds=getattr(self.backend, "retention_seconds", None))
+        print(f"Successfully connected to shared memory backend '{self.backend.name}'.")
+        self.redis_client = getattr(self.backend, "client", None)
+
     def log(self, conversation_id, data):
-        if not self.redis_client:
-            print("SharedMemory: Cannot log, Redis connection not available.")
+        self.log_many(conversation_id, [data])
+
+    def log_many(self, conversation_id, entries, index_record=None):
+        # `index_record` is the document's summary for the secondary indexes (see query_documents);
+        # it is written together with the entries.
+        if not self.backend:
+            print("SharedMemory: Cannot log, shared memory backend not available.")
             return
+        if not entries:
+            return
+
+        for data in entries:
+            data.setdefault('timestamp', utc_timestamp())
+        if index_record is not None:
+            index_record.setdefault('timestamp', utc_timestamp())
+        self._append_batch([(conversation_id, entries)], [index_record] if index_record is not None else None)
 
-        key = f"conversation:{conversation_id}"
+    def _append_batch(self, items, index_records=None):
         try:
-            existing_raw = self.redis_client.get(key)
-            history = []
-            if existing_raw:
-                try:
-                    history = json.loads(existing_raw)
-                    if not isinstance(history, list):
-                       history = [history] 
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not decode existing JSON for key {key}. Starting new history.")
-                    history = [] 
-            
-            data['timestamp'] = datetime.now(timezone.utc).isoformat() 
-            history.append(data)
-            self.redis_client.set(key, json.dumps(history))
-        except redis.exceptions.RedisError as e:
-            print(f"Redis error during log operation: {e}")
-
-    def get_history(self, conversation_id):
-        if not self.redis_client:
-            print("SharedMemory: Cannot get history, Redis connection not available.")
+            if index_records:
+                self.backend.append(items, index_records=index_records)
+            else:
+                self.backend.append(items)
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+
+    async def alog_many(self, conversation_id, entries, index_record=None):
+        if not self.backend:
+            print("SharedMemory: Cannot log, shared memory backend not available.")
+            return
+        if not entries:
+            return
+
+        for data in entries:
+            data.setdefault('timestamp', utc_timestamp())
+        if index_record is not None:
+            index_record.setdefault('timestamp', utc_timestamp())
+        index_records = [index_record] if index_record is not None else None
+        if not hasattr(self.backend, "aappend"):
+            await asyncio.to_thread(self._append_batch, [(conversation_id, entries)], index_records)
+            return
+        try:
+            await self.backend.aappend([(conversation_id, entries)], index_records=index_records)
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+
+    async def aget_history(self, conversation_id, start=0, count=None):
+        return await asyncio.to_thread(self.get_history, conversation_id, start, count)
+
+    def get_history(self, conversation_id, start=0, count=None):
+        if not self.backend:
+            print("SharedMemory: Cannot get history, shared memory backend not available.")
             return []
+        try:
+            return self.backend.read(conversation_id, start=start, count=count)
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+            return []
+
+    def get_history_length(self, conversation_id):
+        if not self.backend:
+            return 0
+        try:
+            return self.backend.length(conversation_id)
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+            return 0
+
+    def query_documents(self, intent=None, doc_format=None, status=None, sender=None, urgent=None, anomaly=None,
+                        since=None, until=None, offset=0, limit=50, newest_first=True):
+        # Filters are ANDed; `anomaly="*"` matches any document with at least one JSON anomaly.
+        # Results are document summaries (not full histories), newest first unless newest_first=False.
+        page = {"total": 0, "offset": offset, "limit": limit, "documents": []}
+        if not self.backend or not hasattr(self.backend, "query"):
+            print("SharedMemory: Cannot query documents, shared memory backend not available.")
+            return page
+        filters = {"intent": intent, "format": doc_format, "status": status, "sender": normalize_sender(sender),
+                   "urgent": str(bool(urgent)) if urgent else None, "anomaly": anomaly}
+        filters = {field: value for field, value in filters.items() if value is not None}
+        try:
+            page["total"], page["documents"] = self.backend.query(
+                filters, min_score=to_epoch_seconds(since), max_score=to_epoch_seconds(until),
+                offset=max(0, offset), limit=limit, newest_first=newest_first
+            )
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+        return page
+
+    def prune_documents(self, older_than_seconds):
+        # Removes indexed documents (summary, index entries and history) older than the given age.
+        if not self.backend or not hasattr(self.backend, "prune"):
+            return 0
+        try:
+            removed = self.backend.prune(time.time() - older_than_seconds)
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+            return 0
+        print(f"SharedMemory: Pruned {removed} documents older than {older_than_seconds}s.")
+        return removed
 
-        key = f"conversation:{conversation_id}"
+    def migrate_legacy_history(self, conversation_id):
+        if not hasattr(self.backend, "migrate_legacy_history"):
+            return 0
         try:
-            data_raw = self.redis_client.get(key)
-            if data_raw:
+            return self.backend.migrate_legacy_history(conversation_id)
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+            return 0
+
+    def migrate_all_legacy_histories(self):
+        if not hasattr(self.backend, "legacy_conversation_ids"):
+            return 0
+        migrated = 0
+        try:
+            for conversation_id in list(self.backend.legacy_conversation_ids()):
+                self.migrate_legacy_history(conversation_id)
+                migrated += 1
+        except MemoryBackendError as e:
+            print(f"SharedMemory: {e}")
+        print(f"SharedMemory: Migrated {migrated} legacy conversation histories to append-only lists.")
+        return migrated
+
+
+    def close(self):
+        if hasattr(self.backend, "close"):
+            self.backend.close()
+
+    async def aclose(self):
+        # Closes what the backend opened for the running event loop (the Redis backend's asyncio client).
+        if hasattr(self.backend, "aclose"):
+            await self.backend.aclose()
+
+
+class _FlushMarker:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP_MARKER = object()
+
+
+class BufferedSharedMemory(SharedMemory):
+    def __init__(self, host='localhost', port=6379, backend=None, max_queue_size=10000, flush_batch_size=200,
+                 flush_interval_seconds=0.5, full_queue_policy="block", block_timeout_seconds=None,
+                 fallback_to_memory=False):
+        if full_queue_policy not in ("block", "drop"):
+            raise ValueError(f"full_queue_policy must be 'block' or 'drop', got '{full_queue_policy}'")
+        super().__init__(host=host, port=port, backend=backend, fallback_to_memory=fallback_to_memory)
+        self.flush_batch_size = max(1, flush_batch_size)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.full_queue_policy = full_queue_policy
+        self.block_timeout_seconds = block_timeout_seconds
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        # Held while checking `_closed` and enqueueing, and while closing, so no entry is enqueued after the
+        # final drain.
+        self._close_lock = threading.Lock()
+        self._closed = False
+        self.flushed_entries = 0
+        self.dropped_entries = 0
+        self.flush_count = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+        self._flusher = threading.Thread(target=self._flush_loop, name="shared-memory-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def log_many(self, conversation_id, entries, index_record=None):
+        if not self.backend:
+            print("SharedMemory: Cannot log, shared memory backend not available.")
+            return
+        if not entries:
+            return
+
+        for data in entries:
+            data.setdefault('timestamp', utc_timestamp())
+        if index_record is not None:
+            index_record.setdefault('timestamp', utc_timestamp())
+        with self._close_lock:
+            if not self._closed:
                 try:
-                    return json.loads(data_raw)
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not decode JSON history for key {key}.")
-                    return [{"error": "Failed to decode history from Redis", "raw_data": data_raw}]
-            return []
-        except redis.exceptions.RedisError as e:
-            print(f"Redis error during get_history operation: {e}")
-            return []
\ No newline at end of file
+                    if self.full_queue_policy == "drop":
+                        self._queue.put_nowait((conversation_id, entries, index_record))
+                    else:
+                        self._queue.put((conversation_id, entries, index_record), timeout=self.block_timeout_seconds)
+                except queue.Full:
+                    with self._stats_lock:
+                        self.dropped_entries += len(entries)
+                    print(f"SharedMemory: Write-behind queue full, dropped {len(entries)} log entries for {conversation_id}.")
+                return
+        super().log_many(conversation_id, entries, index_record=index_record)
+
+    async def alog_many(self, conversation_id, entries, index_record=None):
+        # Enqueueing can block under the "block" policy, so it is kept off the event loop.
+        await asyncio.to_thread(self.log_many, conversation_id, entries, index_record)
+
+    def _flush_loop(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            markers = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while True:
+                if item is _STOP_MARKER:
+                    stop = True
+                    break
+                if isinstance(item, _FlushMarker):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.flush_batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        started = time.perf_counter()
+        index_records = [index_record for _, _, index_record in batch if index_record is not None]
+        self._append_batch([(conversation_id, entries) for conversation_id, entries, _ in batch], index_records)
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.flushed_entries += sum(len(entries) for _, entries, _ in batch)
+            self.flush_count += 1
+            self.total_flush_seconds += elapsed
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def flush(self, timeout=None):
+        if self._closed or not self._flusher.is_alive():
+            return True
+        marker = _FlushMarker()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self):
+        self._stop_flusher()
+        super().close()
+
+    async def aclose(self):
+        await asyncio.to_thread(self._stop_flusher)
+        await super().aclose()
+
+    def _stop_flusher(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            atexit.unregister(self.close)
+            if self._flusher.is_alive():
+                self._queue.put(_STOP_MARKER)
+                self._flusher.join()
+            # Entries enqueued while the flusher was stopping are written synchronously.
+            leftovers = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, _FlushMarker):
+                    item.done.set()
+                elif item is not _STOP_MARKER:
+                    leftovers.append(item)
+            if leftovers:
+                self._write_batch(leftovers)
+
+    def get_history(self, conversation_id, start=0, count=None):
+        self.flush()
+        return super().get_history(conversation_id, start=start, count=count)
+
+    def get_history_length(self, conversation_id):
+        self.flush()
+        return super().get_history_length(conversation_id)
+
+    def query_documents(self, *args, **kwargs):
+        self.flush()
+        return super().query_documents(*args, **kwargs)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "flushed_entries": self.flushed_entries,
+                "dropped_entries": self.dropped_entries,
+                "flush_count": self.flush_count,
+                "last_flush_seconds": self.last_flush_seconds,
+                "avg_flush_seconds": (self.total_flush_seconds / self.flush_count) if self.flush_count else 0.0,
+                "max_flush_seconds": self.max_flush_seconds,
+            }
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARKS_DIR, "..", "app")
+
+# Cold-start cost of short-lived CLI invocations, each measured in a fresh interpreter.
+# "eager" reproduces the previous start-up: google.generativeai, pdfplumber and redis imported at module
+# load and the Gemini model configured before any input is looked at. "lazy" is the current code.
+EAGER_PRELUDE = (
+    "import redis, redis.asyncio, pdfplumber; "
+    "import google.generativeai as genai; "
+    "genai.configure(api_key='benchmark-key'); "
+    "genai.GenerativeModel(model_name='gemini-1.5-flash-latest'); "
+)
+IMPORT_SNIPPET = "import main"
+RUN_SNIPPET = (
+    "import runpy; sys.argv = ['main.py', {input!r}, '--memory-backend', 'memory', '--no-format-debug']; "
+    "runpy.run_path(os.path.join({app_dir!r}, 'main.py'), run_name='__main__')"
+)
+
+
+def time_snippet(snippet, repeat):
+    code = f"import os, sys; sys.path.insert(0, {APP_DIR!r}); " + snippet
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark-key"), PYTHONWARNINGS="ignore")
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def import_profile(snippet, top):
+    # The slowest modules imported directly by main.py, as reported by `python -X importtime`.
+    code = f"import os, sys; sys.path.insert(0, {APP_DIR!r}); " + snippet
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                               env=dict(os.environ, PYTHONWARNINGS="ignore"))
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nesting is shown by indentation: one space for top-level imports, three for their direct imports.
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip(" ")) == 3:
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start benchmark: eager vs lazy imports and model construction")
+    parser.add_argument("--repeat", type=int, default=7, help="Fresh interpreters per measurement (default: 7).")
+    parser.add_argument("--input", default="",
+                        help="CLI input for the end-to-end runs; the default empty string never reaches the LLM.")
+    parser.add_argument("--top", type=int, default=8, help="Slowest direct imports of main.py to list (default: 8).")
+    args = parser.parse_args()
+
+    baseline = time_snippet("pass", args.repeat)
+    run_snippet = RUN_SNIPPET.format(input=args.input, app_dir=APP_DIR)
+    measurements = [
+        ("import main (eager)", EAGER_PRELUDE + IMPORT_SNIPPET),
+        ("import main (lazy)", IMPORT_SNIPPET),
+        ("main.py run (eager)", EAGER_PRELUDE + run_snippet),
+        ("main.py run (lazy)", run_snippet),
+    ]
+    print(f"Bare interpreter start: {statistics.median(baseline) * 1000:.0f} ms (median of {args.repeat})")
+    print(f"{'measurement':<24}{'median ms':>11}{'min ms':>9}")
+    for label, snippet in measurements:
+        samples = time_snippet(snippet, args.repeat)
+        print(f"{label:<24}{statistics.median(samples) * 1000:>11.0f}{min(samples) * 1000:>9.0f}")
+
+    print("\nSlowest direct imports of main.py (lazy):")
+    for cumulative_us, name in import_profile(IMPORT_SNIPPET, args.top):
+        print(f"  {cumulative_us / 1000:>8.1f} ms  {name}")
@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from classifier_agent import ClassifierAgent
+from metrics import PipelineMetrics
+
+
+def legacy_determine_format(raw_input_data, input_is_path=False):
+    # The pre-sniffing ClassifierAgent._determine_format for non-PDF inputs, with its debug prints removed.
+    if input_is_path:
+        with open(raw_input_data, 'r', encoding='utf-8') as f:
+            content_for_analysis = f.read()
+    else:
+        content_for_analysis = raw_input_data
+
+    if not content_for_analysis.strip():
+        return ("TextFile" if input_is_path else "Unknown_EmptyInput"), "", "empty"
+
+    stripped_content = content_for_analysis.strip()
+    is_json_shape = (stripped_content.startswith("{") and stripped_content.endswith("}")) or \
+                    (stripped_content.startswith("[") and stripped_content.endswith("]"))
+    if is_json_shape:
+        try:
+            json.loads(stripped_content)
+            return "JSON", stripped_content, None
+        except json.JSONDecodeError:
+            pass
+
+    content_lower = content_for_analysis.lower()
+    has_from = "from:" in content_lower
+    has_subject = "subject:" in content_lower
+    has_to = "to:" in content_lower
+    has_date = "date:" in content_lower
+    has_message_id = "message-id:" in content_lower
+    has_mime_version = "mime-version:" in content_lower
+    if has_from and (has_subject or has_to or has_date or has_message_id or has_mime_version):
+        return "Email", content_for_analysis, None
+    return ("TextFile" if input_is_path else "Text"), content_for_analysis, None
+
+
+def build_inputs(directory, size_mb):
+    target_bytes = int(size_mb * 1024 * 1024)
+    record = {"invoice_number": "INV-2024-03-001", "date": "2024-03-18", "amount": 1250.75,
+              "vendor": "Acme Corp Solutions", "customer_name": "Beta Industries Ltd."}
+    record_json = json.dumps(record)
+    json_path = os.path.join(directory, "export.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write("[" + ",\n".join([record_json] * max(1, target_bytes // (len(record_json) + 2))) + "]")
+
+    email_path = os.path.join(directory, "archive.eml")
+    body_line = "Please find the quarterly figures below, including all line items and totals.\n"
+    with open(email_path, "w", encoding="utf-8") as f:
+        f.write("From: procurement@example.com\nTo: sales@supplier.com\nSubject: RFQ\n"
+                "Date: Mon, 1 Apr 2024 10:00:00 +0000\nMIME-Version: 1.0\n\n")
+        f.write(body_line * max(1, target_bytes // len(body_line)))
+
+    text_path = os.path.join(directory, "notes.txt")
+    text_line = "Meeting notes: discussed roadmap, staffing and the upcoming release schedule.\n"
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write(text_line * max(1, target_bytes // len(text_line)))
+
+    return [("json", json_path), ("email", email_path), ("text", text_path)]
+
+
+def time_call(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark: legacy vs sniffing format detection")
+    parser.add_argument("--size-mb", type=float, default=20.0, help="Approximate size of each generated input (default: 20 MB).")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement; the best time is reported.")
+    args = parser.parse_args()
+
+    agent = ClassifierAgent.__new__(ClassifierAgent)
+    agent.pdf_executor = None
+    agent.format_debug = False
+    agent.metrics = PipelineMetrics()
+
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = build_inputs(directory, args.size_mb)
+        print(f"{'input':<10}{'size MB':>10}{'legacy ms':>12}{'sniff ms':>12}{'speedup':>10}  formats")
+        for label, path in inputs:
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            legacy_seconds = time_call(lambda: legacy_determine_format(path, True), args.repeat)
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                sniff_seconds = time_call(lambda: agent._determine_format(path, True), args.repeat)
+                new_format = agent._determine_format(path, True)[0]
+            legacy_format = legacy_determine_format(path, True)[0]
+            print(f"{label:<10}{size_mb:>10.1f}{legacy_seconds * 1000:>12.1f}{sniff_seconds * 1000:>12.1f}"
+                  f"{legacy_seconds / sniff_seconds:>9.1f}x  {legacy_format} -> {new_format}")
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from json_agent import JSONAgent
+from schema_validator import TYPE_CHECKS, FORMAT_CHECKS
+from main import DEFAULT_TARGET_SCHEMA
+
+LEGACY_SCHEMA = {
+    'invoice_number': True, 'date': True, 'amount': True, 'vendor': True,
+    'customer_name': False, 'item_description': False, 'complaint_details': False
+}
+
+
+def legacy_process(target_schema, json_payload):
+    # JSONAgent.process before schemas were compiled: presence checks only.
+    anomalies = []
+    output = {}
+    for field in target_schema:
+        if field not in json_payload:
+            anomalies.append(f"Missing field: {field}")
+            output[field] = None
+        else:
+            output[field] = json_payload[field]
+    return output, anomalies
+
+
+def interpreted_process(target_schema, json_payload):
+    # The same typed rules as the compiled validator (without wildcard paths), re-interpreted for every
+    # record, to show what compiling the schema into closures saves.
+    anomalies = []
+    output = {}
+    for path, rule in target_schema.items():
+        if "*" in path:
+            continue
+        rule = {"required": rule} if isinstance(rule, bool) else rule
+        value = json_payload
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        output[path] = value
+        if value is None:
+            if rule.get("required"):
+                anomalies.append(f"Missing field: {path}")
+            continue
+        if rule.get("type") and not TYPE_CHECKS[rule["type"]](value):
+            anomalies.append(f"Invalid type for field {path}: expected {rule['type']}")
+        elif rule.get("format") and not FORMAT_CHECKS[rule["format"]](value):
+            anomalies.append(f"Invalid format for field {path}: expected {rule['format']}")
+    return output, anomalies
+
+
+def build_records(count, seed=1234):
+    rng = random.Random(seed)
+    records = []
+    for index in range(count):
+        record = {
+            "invoice_number": f"INV-{index:07d}",
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "amount": round(rng.uniform(10, 10000), 2),
+            "vendor": rng.choice(["Acme Corp Solutions", "Globex Industrial", "Initech Supplies"]),
+            "customer_name": "Beta Industries Ltd.",
+            "line_items": [{"unit_price": round(rng.uniform(1, 500), 2)} for _ in range(rng.randint(1, 5))],
+        }
+        if rng.random() < 0.1:
+            del record["vendor"]
+        if rng.random() < 0.05:
+            record["date"] = "18/03/2024"
+        records.append(record)
+    return records
+
+
+def time_validator(func, records, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for record in records:
+            func(record)
+        best = min(best, time.perf_counter() - started)
+    return len(records) / best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark: legacy JSONAgent loop vs compiled schema validator")
+    parser.add_argument("--records", type=int, default=200000, help="Records per measurement (default: 200000).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement; the best is reported.")
+    args = parser.parse_args()
+
+    records = build_records(args.records)
+    typed_schema = {path: rule for path, rule in DEFAULT_TARGET_SCHEMA.items() if "*" not in path}
+    measurements = [
+        ("legacy loop (presence only)", lambda record: legacy_process(LEGACY_SCHEMA, record)),
+        ("compiled (presence only)", JSONAgent(LEGACY_SCHEMA).process),
+        ("interpreted (typed rules)", lambda record: interpreted_process(typed_schema, record)),
+        ("compiled (typed rules)", JSONAgent(typed_schema).process),
+        ("compiled (typed + line_items.*)", JSONAgent(DEFAULT_TARGET_SCHEMA).process),
+    ]
+    print(f"{'validator':<32}{'records/sec':>14}")
+    for label, func in measurements:
+        print(f"{label:<32}{time_validator(func, records, args.repeat):>14,.0f}")
@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "app"))
+
+from corpus import add_corpus_arguments
+from classifier_agent import ClassifierAgent
+from fake_model import FakeGenerativeModel
+from memory_backends import InMemoryBackend
+from shared_memory import SharedMemory
+from json_agent import JSONAgent
+from email_agent import EmailAgent
+from intent_cache import IntentCache
+from metrics import PipelineMetrics
+from batch_runner import BatchRunner, collect_batch_inputs
+from main import DEFAULT_TARGET_SCHEMA, INTENT_SCHEMAS
+
+# End-to-end throughput of ClassifierAgent.process_input on a synthetic corpus, with no network:
+# Gemini is replaced by FakeGenerativeModel (keyword intents, fixed latency) and Redis by InMemoryBackend.
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def peak_rss_mb():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS.
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def generate_corpus_subprocess(directory, args):
+    # Generated in a child process so reportlab's memory does not count toward this process's peak RSS.
+    mix = ",".join(f"{kind}={weight}" for kind, weight in args.mix.items())
+    subprocess.run([
+        sys.executable, os.path.join(BENCHMARKS_DIR, "corpus.py"), directory,
+        "--count", str(args.count), "--mix", mix, "--seed", str(args.seed),
+        "--json-kb", str(args.json_kb), "--email-kb", str(args.email_kb), "--pdf-pages", str(args.pdf_pages),
+    ], check=True)
+
+
+def build_agent_factory(args, metrics):
+    shared_memory = SharedMemory(backend=InMemoryBackend())
+    json_agent = JSONAgent(target_schema=DEFAULT_TARGET_SCHEMA, intent_schemas=INTENT_SCHEMAS)
+    email_agent = EmailAgent()
+    model = FakeGenerativeModel(latency_seconds=args.latency_ms / 1000.0)
+    intent_cache = IntentCache() if args.intent_cache else None
+
+    def classifier_factory(pdf_executor=None):
+        return ClassifierAgent(None, json_agent, email_agent, shared_memory, pdf_executor=pdf_executor,
+                               intent_cache=intent_cache, model=model, metrics=metrics, format_debug=False)
+    return classifier_factory
+
+
+def run_pipeline(paths, args):
+    metrics = PipelineMetrics(recent_spans=len(paths) * 16)
+    classifier_factory = build_agent_factory(args, metrics)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        if args.workers <= 1:
+            agent = classifier_factory()
+            results = []
+            started = time.perf_counter()
+            for path in paths:
+                results.append(agent.process_input(path, input_is_path=True))
+            elapsed = time.perf_counter() - started
+        else:
+            runner = BatchRunner(classifier_factory, max_workers=args.workers, pdf_processes=0)
+            started = time.perf_counter()
+            results, _ = runner.run(paths)
+            elapsed = time.perf_counter() - started
+    return results, elapsed, metrics
+
+
+def summarize_run(paths, results, elapsed, metrics, args):
+    durations = {}
+    for span in metrics.to_dict()["recent_spans"]:
+        durations.setdefault(span["stage"], []).append(span["seconds"])
+    stages = {}
+    for stage, values in sorted(durations.items()):
+        values.sort()
+        stages[stage] = {
+            "count": len(values),
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    status_counts = {}
+    for result in results:
+        status_counts[result["status"]] = status_counts.get(result["status"], 0) + 1
+    return {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "count": len(paths), "mix": args.mix, "seed": args.seed, "json_kb": args.json_kb,
+            "email_kb": args.email_kb, "pdf_pages": args.pdf_pages, "latency_ms": args.latency_ms,
+            "workers": args.workers, "intent_cache": args.intent_cache,
+            "corpus_dir": args.corpus_dir,
+        },
+        "documents": len(results),
+        "elapsed_seconds": elapsed,
+        "docs_per_second": len(results) / elapsed if elapsed > 0 else 0.0,
+        "status_counts": status_counts,
+        "stages": stages,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"Documents: {report['documents']} in {report['elapsed_seconds']:.2f}s "
+          f"-> {report['docs_per_second']:.1f} docs/sec, peak RSS {report['peak_rss_mb']:.1f} MB")
+    if baseline:
+        print(f"Baseline ({baseline.get('label') or baseline.get('git_commit')}): "
+              f"{baseline['docs_per_second']:.1f} docs/sec ({_change(report['docs_per_second'], baseline['docs_per_second'])}), "
+              f"peak RSS {baseline['peak_rss_mb']:.1f} MB")
+    print(f"Statuses: {report['status_counts']}")
+    print(f"{'stage':<18}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" + ("  p95 vs baseline" if baseline else ""))
+    for stage, stats in report["stages"].items():
+        line = (f"{stage:<18}{stats['count']:>7}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+                f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+        baseline_stage = (baseline or {}).get("stages", {}).get(stage)
+        if baseline_stage:
+            line += f"  {baseline_stage['p95_ms']:.2f} ms ({_change(stats['p95_ms'], baseline_stage['p95_ms'])})"
+        print(line)
+
+
+def _change(current, previous):
+    if not previous:
+        return "n/a"
+    return f"{(current - previous) / previous:+.1%}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ClassifierAgent.process_input on a synthetic corpus")
+    add_corpus_arguments(parser)
+    parser.add_argument("--corpus-dir", default=None,
+                        help="Process an existing corpus (e.g. from benchmarks/corpus.py) instead of generating one.")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake model latency per call (default: 50 ms).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="1 runs process_input sequentially; more uses BatchRunner threads (default: 1).")
+    parser.add_argument("--intent-cache", action="store_true", help="Enable the in-memory intent cache.")
+    parser.add_argument("--label", default=None, help="Name stored with the saved results.")
+    parser.add_argument("--save", default=None, help="Write the results as JSON to this path.")
+    parser.add_argument("--compare", default=None, help="Compare against results saved earlier with --save.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.corpus_dir:
+            paths = collect_batch_inputs(args.corpus_dir)
+        else:
+            generate_corpus_subprocess(temp_dir, args)
+            paths = collect_batch_inputs(temp_dir)
+        results, elapsed, metrics = run_pipeline(paths, args)
+        report = summarize_run(paths, results, elapsed, metrics, args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.save}")
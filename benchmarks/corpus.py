@@ -0,0 +1,162 @@
+import os
+import json
+import random
+import argparse
+from email.message import EmailMessage
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+# Deterministic synthetic documents for benchmarks: the same seed, mix and sizes always produce
+# the same corpus, so runs on different commits or machines process identical inputs.
+
+DEFAULT_MIX = {"pdf": 0.3, "json": 0.4, "email": 0.3}
+
+_VENDORS = ["Acme Corp Solutions", "Globex Industrial", "Initech Supplies", "Umbrella Logistics", "Stark Components"]
+_CUSTOMERS = ["Beta Industries Ltd.", "Wayne Manufacturing", "Tyrell Systems", "Cyberdyne Retail", "Soylent Foods"]
+_ITEMS = ["Steel fasteners", "Hydraulic pump", "Server rack", "Safety gloves", "Packaging film", "Conveyor belt"]
+_PARAGRAPHS = {
+    "Invoice": "This invoice covers the goods delivered last month. The amount due is payable within 30 days. "
+               "Please reference the invoice number on your payment and remit to the account listed below.",
+    "RFQ": "We are requesting a quotation for the items listed below. Please include unit pricing, lead times "
+           "and any volume discounts in your quote, and send your best offer by the end of the week.",
+    "Complaint": "We are dissatisfied with the last delivery. Several units arrived defective and are not working "
+                 "as described. We request a refund or replacement and a written explanation of the issue.",
+    "Regulation": "Pursuant to the updated supplier code, all vendors shall comply with the terms and conditions "
+                  "below. Compliance with these regulation requirements is mandatory for continued business.",
+    "Other": "Thank you for the meeting yesterday. Attached are the notes on staffing, the roadmap and the "
+             "schedule for the next review. Let us know if anything needs to be corrected.",
+}
+
+
+def _intent_paragraphs(rng, intent, target_chars):
+    base = _PARAGRAPHS[intent]
+    filler = _PARAGRAPHS["Other"]
+    paragraphs = [base]
+    total = len(base)
+    while total < target_chars:
+        paragraph = base if rng.random() < 0.3 else filler
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 1
+    return paragraphs
+
+
+def _wrap(text, width=95):
+    line = ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            yield line
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        yield line
+
+
+def write_pdf(path, rng, intent, pages):
+    pdf = canvas.Canvas(path, pagesize=A4, invariant=1)
+    width, height = A4
+    for page_number in range(pages):
+        text = pdf.beginText(50, height - 60)
+        text.setFont("Helvetica", 10)
+        text.textLine(f"{intent.upper()} DOCUMENT - page {page_number + 1} of {pages}")
+        text.textLine(f"Vendor: {rng.choice(_VENDORS)}   Customer: {rng.choice(_CUSTOMERS)}")
+        text.textLine("")
+        for paragraph in _intent_paragraphs(rng, intent, 2500):
+            for line in _wrap(paragraph):
+                text.textLine(line)
+            text.textLine("")
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+
+def write_json_invoice(path, rng, index, target_bytes):
+    invoice = {
+        "invoice_number": f"INV-{2024 + index % 3}-{index:06d}",
+        "date": (datetime(2024, 1, 1) + timedelta(days=rng.randrange(365))).strftime("%Y-%m-%d"),
+        "amount": 0.0,
+        "vendor": rng.choice(_VENDORS),
+        "customer_name": rng.choice(_CUSTOMERS),
+        "line_items": [],
+    }
+    # A share of records miss a required field so the anomaly path is exercised too.
+    if rng.random() < 0.1:
+        del invoice["vendor"]
+    while len(json.dumps(invoice)) < target_bytes:
+        quantity = rng.randint(1, 50)
+        unit_price = round(rng.uniform(1, 500), 2)
+        invoice["line_items"].append({"item_description": rng.choice(_ITEMS), "quantity": quantity, "unit_price": unit_price})
+        invoice["amount"] = round(invoice["amount"] + quantity * unit_price, 2)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(invoice, f, indent=1)
+
+
+def write_email(path, rng, index, intent, target_bytes):
+    message = EmailMessage()
+    sender_domain = rng.choice(["example.com", "supplier.test", "customer.test"])
+    message["From"] = f"user{index}@{sender_domain}"
+    message["To"] = "intake@company.test"
+    message["Subject"] = f"{intent} - reference {index:06d}" + (" URGENT" if rng.random() < 0.2 else "")
+    message["Date"] = format_datetime(datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=index * 37))
+    message["Message-ID"] = f"<bench{index:06d}@{sender_domain}>"
+    message.set_content("\n\n".join(_intent_paragraphs(rng, intent, target_bytes)))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(message.as_string())
+
+
+def generate_corpus(directory, count=100, mix=None, seed=1234, json_kb=4, email_kb=4, pdf_pages=3):
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    kinds = sorted(mix)
+    weights = [mix[kind] for kind in kinds]
+    intents = sorted(_PARAGRAPHS)
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for index in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        intent = rng.choice(intents)
+        if kind == "pdf":
+            path = os.path.join(directory, f"doc{index:06d}.pdf")
+            write_pdf(path, rng, intent, pdf_pages)
+        elif kind == "json":
+            path = os.path.join(directory, f"doc{index:06d}.json")
+            write_json_invoice(path, rng, index, json_kb * 1024)
+        elif kind == "email":
+            path = os.path.join(directory, f"doc{index:06d}.eml")
+            write_email(path, rng, index, intent, email_kb * 1024)
+        else:
+            raise ValueError(f"Unknown document kind '{kind}'. Expected 'pdf', 'json' or 'email'.")
+        paths.append(path)
+    return paths
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def add_corpus_arguments(parser):
+    parser.add_argument("--count", type=int, default=100, help="Number of documents (default: 100).")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Relative weights per kind, e.g. 'pdf=0.3,json=0.4,email=0.3' (default).")
+    parser.add_argument("--seed", type=int, default=1234, help="Random seed (default: 1234).")
+    parser.add_argument("--json-kb", type=int, default=4, help="Approximate size of each JSON invoice (default: 4 KB).")
+    parser.add_argument("--email-kb", type=int, default=4, help="Approximate body size of each email (default: 4 KB).")
+    parser.add_argument("--pdf-pages", type=int, default=3, help="Pages per PDF (default: 3).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic document corpus")
+    parser.add_argument("directory", help="Output directory.")
+    add_corpus_arguments(parser)
+    args = parser.parse_args()
+    paths = generate_corpus(args.directory, count=args.count, mix=args.mix, seed=args.seed,
+                            json_kb=args.json_kb, email_kb=args.email_kb, pdf_pages=args.pdf_pages)
+    print(f"Generated {len(paths)} documents in {args.directory}")
@@ -0,0 +1,94 @@
+import io
+import os
+import sys
+import json
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from json_stream import iter_json_array, JSONStreamError, STREAM_READ_CHARS
+
+# Checks for iter_json_array: records split at every possible chunk boundary must still decode, and a
+# syntax error early in a large array must be reported without reading the rest of the stream.
+
+
+class CountingStream(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.chars_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.chars_read += len(chunk)
+        return chunk
+
+
+def build_records(count, rng):
+    records = []
+    for index in range(count):
+        records.append({
+            "invoice_number": f"INV-{index}é\"\\/\n",
+            "amount": rng.choice([index, -index, index + 0.25, 1.5e-7 * index, 12345678901234567890]),
+            "paid": rng.choice([True, False, None]),
+            "lines": [{"qty": index % 7, "note": "☃" * (index % 3)}],
+        })
+    return records
+
+
+def check_chunk_boundaries(problems, rng):
+    records = build_records(40, rng)
+    for text in (json.dumps(records), json.dumps(records, indent=2), json.dumps(records, ensure_ascii=False)):
+        for read_chars in range(1, 24):
+            try:
+                decoded = [record for _, record, _ in iter_json_array(io.StringIO(text), read_chars=read_chars)]
+            except JSONStreamError as e:
+                problems.append(f"read_chars={read_chars}: valid input rejected: {e}")
+                continue
+            if decoded != records:
+                problems.append(f"read_chars={read_chars}: decoded records differ from the input")
+
+
+def check_early_error(problems, size_mb):
+    record = json.dumps({"invoice_number": "INV-1", "date": "2024-03-18", "amount": 10.5, "vendor": "Acme"})
+    count = size_mb * 1024 * 1024 // (len(record) + 2)
+    text = "[" + ",".join([record] * 3 + ["{not json}"] + [record] * count) + "]"
+    stream = CountingStream(text)
+    seen = 0
+    try:
+        for _ in iter_json_array(stream):
+            seen += 1
+        problems.append("a malformed record was not reported")
+    except JSONStreamError as e:
+        if "record 3" not in str(e):
+            problems.append(f"error reported for the wrong record: {e}")
+    if seen != 3:
+        problems.append(f"expected 3 records before the error, got {seen}")
+    if stream.chars_read > 2 * STREAM_READ_CHARS:
+        problems.append(f"read {stream.chars_read} of {len(text)} chars before reporting the error")
+    print(f"Malformed record 3 of a {len(text) / 1e6:.0f} MB array: reported after reading {stream.chars_read} chars.")
+
+    truncated = CountingStream("[" + ",".join([record] * 3) + ',{"invoice_number": "INV')
+    try:
+        list(iter_json_array(truncated))
+        problems.append("truncated input was not reported")
+    except JSONStreamError as e:
+        if "record 3" not in str(e):
+            problems.append(f"truncation reported for the wrong record: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check iter_json_array chunk handling and early error reporting")
+    parser.add_argument("--size-mb", type=int, default=32, help="Size of the malformed array (default: 32 MB).")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the generated records.")
+    args = parser.parse_args()
+
+    problems = []
+    check_chunk_boundaries(problems, random.Random(args.seed))
+    check_early_error(problems, args.size_mb)
+    for problem in problems[:20]:
+        print(f"  MISMATCH {problem}")
+    if problems:
+        print(f"FAILED: {len(problems)} problems.")
+        raise SystemExit(1)
+    print("OK: records decode across every chunk boundary and malformed input fails fast.")
@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import random
+import argparse
+import contextlib
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from classifier_agent import ClassifierAgent
+from fake_model import FakeGenerativeModel
+from memory_backends import InMemoryBackend
+from shared_memory import SharedMemory
+from json_agent import JSONAgent
+from email_agent import EmailAgent
+from main import DEFAULT_TARGET_SCHEMA, INTENT_SCHEMAS
+
+# Concurrency stress check for a single ClassifierAgent shared by many threads: every document carries
+# a unique token, and afterwards each conversation's log must contain only that document's entries.
+
+
+class RecordingBackend(InMemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.appended = {}
+
+    def append(self, items, index_records=None):
+        super().append(items, index_records=index_records)
+        with self._lock:
+            for conversation_id, entries in items:
+                self.appended[conversation_id] = self.appended.get(conversation_id, 0) + len(entries)
+
+
+def build_document(index, rng):
+    token = f"TOKEN-{index:06d}"
+    kind = rng.choice(["json", "email", "email_attachment", "text"])
+    if kind == "json":
+        return token, kind, (f'{{"invoice_number": "{token}", "date": "2024-03-18", "amount": {index}.5, '
+                             f'"vendor": "Acme Corp Solutions"}}')
+    if kind == "text":
+        return token, kind, f"{token} Please review the attached regulation and policy update number {index}."
+    message = EmailMessage()
+    message["From"] = f"sender{index}@example.com"
+    message["To"] = "intake@example.com"
+    message["Subject"] = f"{token} request for quotation"
+    message["Message-ID"] = f"<{token}@example.com>"
+    message.set_content(f"Please send a quote for {index} widgets.")
+    if kind == "email_attachment":
+        message.add_attachment(f'{{"invoice_number": "{token}-ATT"}}'.encode("utf-8"), maintype="application",
+                               subtype="json", filename=f"{token}.json")
+    return token, kind, message.as_string()
+
+
+def check_document(shared_memory, token, kind, result, problems):
+    conversation_id = result["conversation_id"]
+    history = shared_memory.get_history(conversation_id)
+    if len(history) != 2:
+        problems.append(f"{token}: expected 2 log entries under {conversation_id}, found {len(history)}")
+        return []
+    initial_entry, final_entry = history
+    if initial_entry.get("conversation_id") != conversation_id:
+        problems.append(f"{token}: first entry belongs to {initial_entry.get('conversation_id')}")
+    if token not in initial_entry.get("input_identifier", ""):
+        problems.append(f"{token}: first entry was logged for another input: {initial_entry.get('input_identifier')[:40]}")
+    values = final_entry.get("extracted_values") or {}
+    if kind == "json" and values.get("invoice_number") != token:
+        problems.append(f"{token}: final entry holds invoice_number {values.get('invoice_number')}")
+    if kind.startswith("email") and token not in (values.get("subject") or ""):
+        problems.append(f"{token}: final entry holds subject {values.get('subject')}")
+    if kind == "text" and token not in values.get("text_content_snippet", ""):
+        problems.append(f"{token}: final entry holds another text snippet")
+
+    children = []
+    if kind == "email_attachment":
+        attachments = values.get("attachments") or []
+        if len(attachments) != 1 or not attachments[0].get("conversation_id"):
+            problems.append(f"{token}: attachment was not processed as a child document: {attachments}")
+            return []
+        child_id = attachments[0]["conversation_id"]
+        child_history = shared_memory.get_history(child_id)
+        if not child_history or child_history[0].get("parent_conversation_id") != conversation_id:
+            problems.append(f"{token}: child {child_id} is not linked to its parent")
+        elif (child_history[-1].get("extracted_values") or {}).get("invoice_number") != f"{token}-ATT":
+            problems.append(f"{token}: child {child_id} holds another attachment's values")
+        children.append(child_id)
+    return children
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    backend = RecordingBackend()
+    shared_memory = SharedMemory(backend=backend)
+    agent = ClassifierAgent(None, JSONAgent(DEFAULT_TARGET_SCHEMA, INTENT_SCHEMAS), EmailAgent(), shared_memory,
+                            model=FakeGenerativeModel(latency_seconds=args.latency_ms / 1000.0), format_debug=False)
+    documents = [build_document(index, rng) for index in range(args.documents)]
+
+    def process_one(document):
+        # A little jitter before each call shuffles how the threads interleave inside the agent.
+        time.sleep(rng.random() * args.latency_ms / 2000.0)
+        return agent.process_input(document[2])
+
+    def process_chunk(chunk):
+        return agent.process_inputs([(document[2], False) for document in chunk])
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            half = len(documents) // 2
+            # The first half goes through process_input one by one, the second through batched process_inputs.
+            single_results = list(pool.map(process_one, documents[:half]))
+            chunks = [documents[start:start + args.chunk_size] for start in range(half, len(documents), args.chunk_size)]
+            batched_results = [result for chunk_results in pool.map(process_chunk, chunks) for result in chunk_results]
+        agent.close()
+    elapsed = time.perf_counter() - started
+
+    problems = []
+    expected_conversations = set()
+    for (token, kind, _), result in zip(documents, single_results + batched_results):
+        if result["status"] != "Processed":
+            problems.append(f"{token}: status {result['status']}")
+        expected_conversations.add(result["conversation_id"])
+        expected_conversations.update(check_document(shared_memory, token, kind, result, problems))
+    stray = set(backend.appended) - expected_conversations
+    if stray:
+        problems.append(f"{len(stray)} conversations received entries that no document owns")
+
+    print(f"Processed {len(documents)} documents on {args.threads} threads sharing one agent in {elapsed:.2f}s "
+          f"({len(documents) / elapsed:.1f} docs/sec); {sum(backend.appended.values())} log entries checked.")
+    for problem in problems[:20]:
+        print(f"  MISMATCH {problem}")
+    if problems:
+        print(f"FAILED: {len(problems)} problems.")
+        return 1
+    print("OK: every log entry is under its own conversation ID.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress one shared ClassifierAgent from many threads and verify log isolation")
+    parser.add_argument("--documents", type=int, default=2000, help="Documents to process (default: 2000).")
+    parser.add_argument("--threads", type=int, default=32, help="Worker threads sharing the agent (default: 32).")
+    parser.add_argument("--chunk-size", type=int, default=8, help="Documents per process_inputs call (default: 8).")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Fake model latency per call (default: 2 ms).")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the document mix and jitter.")
+    raise SystemExit(run(parser.parse_args()))